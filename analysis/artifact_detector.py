@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+"""
+Automatic artifact detector for the generated audio corpus
+Vectorized per-file detection of clicks/pops (second-difference outliers),
+discontinuities (first-difference outliers), cracking (spectral flux outliers),
+clipping (flat-top runs at the file peak) and dropouts (digital-zero runs inside
+speech). Results are stored incrementally in corpus_store/artifacts.npz and joined
+to evaluation comments to measure how well each detector predicts the complaint
+themes evaluators write about (갈라짐, 깨짐, 튐, 끊김, 클리핑).
+
+Usage:
+  python artifact_detector.py                            # update store + correlation report
+  python artifact_detector.py --screen ../public/voices_3  # list flagged files only
+"""
+
+import argparse
+from pathlib import Path
+from typing import Dict, Tuple
+
+import numpy as np
+
+from audio_corpus import (
+    CORPUS_DIRS, EVALUATIONS_CSV, SILENCE_DB, STORE_DIR, ColumnStore, corpus_key,
+    frame_db, frame_signal, iter_corpus_files, load_evaluations, load_pcm, resolve_key, update_store,
+)
+
+ARTIFACT_STORE = STORE_DIR / 'artifacts.npz'
+
+# An impulse must exceed this multiple of the surrounding 10ms RMS of the difference
+# signal; set around the 95th percentile of per-file maxima over the current corpus
+CLICK_RATIO = 16.0
+STEP_RATIO = 18.0
+# Robust z-score above which a spectral flux frame counts as a crackle/burst
+FLUX_Z = 22.0
+# Digital-zero runs at least this long inside speech are dropouts
+DROPOUT_MS = 5.0
+# Consecutive samples pinned at the file peak that count as a flat-topped (clipped) run
+CLIP_RUN = 3
+
+# Comment keywords per complaint theme -> detector columns that should predict it
+THEMES = {
+    'popping': (['튐', '튀', '팝', 'pop', 'click'], ['clicks']),
+    'cracking': (['갈라', '깨짐', '깨져', '지직', 'crack'], ['flux_bursts', 'discontinuities']),
+    'dropouts': (['끊김', '끊겨', '끊기', 'dropout'], ['dropouts']),
+    'clipping': (['클리핑', 'clip', '찢어'], ['clipped_runs']),
+}
+DETECTORS = ['clicks', 'discontinuities', 'flux_bursts', 'clipped_runs', 'dropouts']
+
+def moving_rms(signal: np.ndarray, window: int) -> np.ndarray:
+    """Centered moving RMS with the same length as `signal` (cumulative-sum based)"""
+    window = max(1, min(window, len(signal)))
+    power = np.concatenate([[0.0], np.cumsum(signal.astype(np.float64) ** 2)])
+    rms = np.sqrt((power[window:] - power[:-window]) / window)
+    pad = len(signal) - len(rms)
+    return np.pad(rms, (pad // 2, pad - pad // 2), mode='edge')
+
+def runs(mask: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Start indices and lengths of True runs"""
+    edges = np.diff(np.concatenate([[0], mask.astype(np.int8), [0]]))
+    starts = np.flatnonzero(edges == 1)
+    return starts, np.flatnonzero(edges == -1) - starts
+
+def count_events(indices: np.ndarray, gap: int) -> int:
+    """Number of clusters when indices closer than `gap` samples are merged"""
+    if not len(indices):
+        return 0
+    return int(1 + np.count_nonzero(np.diff(indices) > gap))
+
+def outliers(diff: np.ndarray, window: int, ratio: float) -> np.ndarray:
+    """Samples far above the RMS of their neighbourhood (the sample itself excluded)"""
+    energy = moving_rms(diff, window) ** 2 * window
+    local = np.sqrt(np.maximum(energy - diff.astype(np.float64) ** 2, 0) / (window - 1))
+    return np.flatnonzero((np.abs(diff) > ratio * local) & (local > 1e-4))
+
+def speech_span(samples: np.ndarray, sample_rate: int) -> Tuple[int, int]:
+    """Sample range between the first and last non-silent 10ms frame"""
+    loud = np.flatnonzero(frame_db(samples, sample_rate) >= SILENCE_DB)
+    if not len(loud):
+        return 0, 0
+    hop = int(sample_rate * 0.01)
+    return loud[0] * hop, min(len(samples), loud[-1] * hop + 2 * hop)
+
+def spectral_flux_z(samples: np.ndarray, sample_rate: int) -> np.ndarray:
+    """Robust z-score of positive log-spectral flux per ~32ms frame"""
+    n_fft = int(2 ** np.round(np.log2(sample_rate * 0.032)))
+    frames = frame_signal(samples, n_fft, n_fft // 2) * np.hanning(n_fft).astype(np.float32)
+    log_mag = np.log1p(100 * np.abs(np.fft.rfft(frames, axis=1)))
+    flux = np.maximum(np.diff(log_mag, axis=0), 0).mean(axis=1)
+    if len(flux) < 3:
+        return np.zeros(len(flux))
+    median = np.median(flux)
+    mad = 1.4826 * np.median(np.abs(flux - median))
+    return (flux - median) / max(mad, 1e-9)
+
+def detect_artifacts(key: str) -> Dict:
+    """Artifact counts for one corpus file (top-level so the process pool can pickle it)"""
+    samples, sample_rate = load_pcm(resolve_key(key))
+    window = max(3, int(sample_rate * 0.01))
+    gap = int(sample_rate * 0.002)
+    start, end = speech_span(samples, sample_rate)
+    speech = samples[start:end]
+    if len(speech) < 3:
+        return {name: 0 for name in DETECTORS} | {'flux_max_z': 0.0, 'artifact_score': 0.0}
+
+    second = np.diff(speech, n=2)
+    clicks = outliers(second, window, CLICK_RATIO)
+    steps = outliers(np.diff(speech), window, STEP_RATIO)
+    # Steps next to a click are the click's own edges
+    if len(clicks) and len(steps):
+        nearest = np.abs(clicks[np.clip(np.searchsorted(clicks, steps), 0, len(clicks) - 1)] - steps)
+        steps = steps[nearest > gap]
+
+    flux_z = spectral_flux_z(speech, sample_rate)
+
+    peak = np.max(np.abs(speech))
+    _, run_lengths = runs(np.abs(speech) >= peak - 1.5 / 32768)
+    clipped = int(np.count_nonzero(run_lengths >= CLIP_RUN))
+
+    _, zero_lengths = runs(np.abs(speech) < 1.0 / 32768)
+    dropouts = int(np.count_nonzero(zero_lengths >= sample_rate * DROPOUT_MS / 1000))
+
+    result = {
+        'clicks': count_events(clicks, gap),
+        'discontinuities': count_events(steps, gap),
+        'flux_bursts': int(np.count_nonzero(flux_z > FLUX_Z)),
+        'flux_max_z': float(flux_z.max()) if len(flux_z) else 0.0,
+        'clipped_runs': clipped,
+        'dropouts': dropouts,
+    }
+    duration = len(samples) / sample_rate
+    result['artifact_score'] = sum(result[name] for name in DETECTORS) / max(duration, 1e-3)
+    return result
+
+def theme_labels(comments) -> Dict[str, np.ndarray]:
+    lowered = comments.str.lower()
+    return {
+        theme: lowered.str.contains('|'.join(keywords), regex=True).to_numpy()
+        for theme, (keywords, _) in THEMES.items()
+    }
+
+def correlate_with_comments(store: ColumnStore, evaluations_csv: Path):
+    """Precision/recall of each detector against evaluator complaint themes"""
+    import pandas as pd
+
+    artifacts = store.to_dataframe().set_index('path')
+    df = load_evaluations(evaluations_csv)
+    df = df[df['target_key'].isin(artifacts.index) & df['reference_key'].isin(artifacts.index)]
+    labels = theme_labels(df['comment'])
+
+    rows = []
+    for theme, (_, columns) in THEMES.items():
+        flagged = np.zeros(len(df), dtype=bool)
+        for column in columns:
+            # Evaluators hear the reference and the target, so either file can explain the complaint
+            flagged |= artifacts.loc[df['target_key'], column].to_numpy() > 0
+            flagged |= artifacts.loc[df['reference_key'], column].to_numpy() > 0
+        actual = labels[theme]
+        true_positive = int(np.count_nonzero(flagged & actual))
+        rows.append({
+            'theme': theme,
+            'complaints': int(actual.sum()),
+            'flagged': int(flagged.sum()),
+            'hits': true_positive,
+            'precision': true_positive / flagged.sum() if flagged.any() else np.nan,
+            'recall': true_positive / actual.sum() if actual.any() else np.nan,
+        })
+
+    quality = df['quality'].to_numpy(dtype=float)
+    score = (artifacts.loc[df['target_key'], 'artifact_score'].to_numpy()
+             + artifacts.loc[df['reference_key'], 'artifact_score'].to_numpy())
+    quality_corr = float(pd.Series(score).corr(pd.Series(quality), method='spearman')) if len(df) > 2 else np.nan
+    return pd.DataFrame(rows), len(df), quality_corr
+
+def screen(roots, store: ColumnStore):
+    columns = store.columns
+    index = store.row_index()
+    flagged = []
+    for path in iter_corpus_files(roots):
+        i = index.get(corpus_key(path))
+        if i is not None and any(columns[name][i] > 0 for name in DETECTORS):
+            flagged.append((columns['artifact_score'][i], corpus_key(path),
+                            {name: int(columns[name][i]) for name in DETECTORS if columns[name][i] > 0}))
+
+    for score, key, counts in sorted(flagged, reverse=True):
+        print(f"⚠️  {score:6.2f}/s  {key}  {counts}")
+    print(f"\n{len(flagged)} flagged file(s)")
+
+def main():
+    parser = argparse.ArgumentParser(description='Detect clicks, clipping, discontinuities and dropouts')
+    parser.add_argument('--roots', type=Path, nargs='+', default=CORPUS_DIRS, help='Directories to scan for WAVs')
+    parser.add_argument('--workers', type=int, help='Worker processes (default: CPU count)')
+    parser.add_argument('--rebuild', action='store_true', help='Recompute every file')
+    parser.add_argument('--evaluations', type=Path, default=EVALUATIONS_CSV, help='Evaluation export CSV')
+    parser.add_argument('--screen', type=Path, nargs='+', help='Only list flagged files under these directories')
+
+    args = parser.parse_args()
+
+    roots = args.screen or args.roots
+    print(f"🔍 Scanning {', '.join(str(r) for r in roots)}")
+    counts = update_store(ARTIFACT_STORE, detect_artifacts, roots, args.workers, args.rebuild)
+    print(f"✅ Artifact store: {ARTIFACT_STORE} (updated {counts['updated']}, total {counts['total']})")
+    store = ColumnStore(ARTIFACT_STORE)
+
+    if args.screen:
+        screen(args.screen, store)
+        return
+
+    totals = {name: int(np.count_nonzero(store.columns[name] > 0)) for name in DETECTORS}
+    print("\n📊 Files with at least one detection:")
+    for name, count in totals.items():
+        print(f"   {name:<16} {count:>5} / {len(store)}")
+
+    report, evaluated, quality_corr = correlate_with_comments(store, args.evaluations)
+    print(f"\n📝 Detector vs evaluator comments ({evaluated} evaluation rows):")
+    print(report.round(3).to_string(index=False))
+    print(f"\nSpearman(artifact score, quality rating): {quality_corr:.3f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,331 @@
+#!/usr/bin/env python3
+"""
+Shared helpers for corpus-wide audio analysis
+Locates the generated WAV corpus (public/voices, voices_2, voices_3), loads PCM
+through memory-mapped views (wav_reader), runs per-file work across a process pool
+and keeps incremental columnar stores (.npz) keyed by (path, size, mtime) so only
+changed files are recomputed
+"""
+
+import hashlib
+import json
+import os
+import struct
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from scipy.signal import lfilter
+
+from wav_reader import HeaderIndex, WavHeader, pcm_view, read_flac, to_float32
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+CORPUS_DIRS = [
+    REPO_ROOT / 'public' / 'voices',
+    REPO_ROOT / 'public' / 'voices_2',
+    REPO_ROOT / 'public' / 'voices_3',
+]
+STORE_DIR = Path(__file__).parent / 'corpus_store'
+HEADER_INDEX = STORE_DIR / 'wav_headers.json'
+EVALUATIONS_CSV = Path(__file__).parent / 'current_evaluations.csv'
+
+# Frames quieter than this are treated as silence
+SILENCE_DB = -50.0
+
+_header_index: Optional[HeaderIndex] = None
+
+def iter_corpus_files(roots: Optional[Sequence[Path]] = None) -> List[Path]:
+    """All WAV files under the corpus roots, sorted for stable ordering
+
+    Files stored only as FLAC masters are listed under their .wav name, so store
+    keys do not change when the corpus is compressed (see compress_corpus.py).
+    """
+    files = set()
+    for root in roots or CORPUS_DIRS:
+        root = Path(root)
+        found = list(root.rglob('*.wav')) + [path.with_suffix('.wav') for path in root.rglob('*.flac')]
+        # Hidden directories hold derived renditions (e.g. .normalized/), not corpus files
+        files.update(path for path in found
+                     if not any(part.startswith('.') for part in path.relative_to(root).parent.parts))
+    return sorted(files)
+
+def audio_source(path: Path) -> Path:
+    """The file actually holding a corpus entry: the WAV, or its FLAC master"""
+    path = Path(path)
+    if path.suffix == '.wav' and not path.exists():
+        flac = path.with_suffix('.flac')
+        if flac.exists():
+            return flac
+    return path
+
+def corpus_key(path: Path) -> str:
+    """Repository-relative POSIX path used as the row key in every store"""
+    path = Path(path).resolve()
+    try:
+        return path.relative_to(REPO_ROOT).as_posix()
+    except ValueError:
+        return path.as_posix()
+
+def resolve_key(key: str) -> Path:
+    path = Path(key)
+    return path if path.is_absolute() else REPO_ROOT / path
+
+def header_index() -> HeaderIndex:
+    """Per-process header cache (workers load the index saved by the parent scan)"""
+    global _header_index
+    if _header_index is None:
+        _header_index = HeaderIndex(HEADER_INDEX)
+    return _header_index
+
+def read_header(path: Path) -> WavHeader:
+    return header_index().get(corpus_key(path), Path(path))
+
+def scan_headers(roots: Optional[Sequence[Path]] = None) -> Tuple[Dict[str, WavHeader], Dict[str, str]]:
+    """Header-only pass over the corpus; refreshes and persists the header index"""
+    index = header_index()
+    headers, errors = {}, {}
+    for path in iter_corpus_files(roots):
+        if audio_source(path).suffix == '.flac':
+            continue
+        key = corpus_key(path)
+        try:
+            headers[key] = index.get(key, path)
+        except (OSError, ValueError, struct.error) as e:
+            errors[key] = str(e)
+    index.prune(key for key in index.entries if resolve_key(key).exists())
+    index.save()
+    return headers, errors
+
+def evaluation_audio_keys(session_id: str, sample_id: str) -> Tuple[str, str]:
+    """(target, reference) corpus keys for an evaluation row
+
+    sample_id looks like v002_fear_match_scale_1.0; voices_3 sessions carry the
+    version in session_id, older sessions were served from public/voices_2.
+    """
+    if 'voices_3' in session_id:
+        folder = 'public/voices_3/expressivity_0.6'
+    else:
+        expressivity = '0.6' if session_id.endswith('expressivity_0.6') else 'none'
+        folder = f'public/voices_2/expressivity_{expressivity}'
+    stem = sample_id.split('_scale_')[0]
+    return f"{folder}/{sample_id}.wav", f"{folder}/{stem}_reference.wav"
+
+def load_evaluations(path: Path = EVALUATIONS_CSV):
+    """Evaluation rows with parsed scores and the audio keys they refer to"""
+    import pandas as pd
+
+    df = pd.read_csv(path)
+    scores = df['scores'].apply(lambda s: pd.Series(json.loads(s)) if isinstance(s, str) else pd.Series(dtype=float))
+    df = pd.concat([df, scores], axis=1)
+    keys = [evaluation_audio_keys(session, sample) for session, sample in zip(df['session_id'], df['sample_id'])]
+    df['target_key'] = [target for target, _ in keys]
+    df['reference_key'] = [reference for _, reference in keys]
+    df['comment'] = df['comment'].fillna('').str.strip()
+    return df
+
+def raw_pcm(path: Path) -> Tuple[np.ndarray, int]:
+    """Integer PCM (frames, channels) and sample width, as stored (mmap view for WAV)"""
+    source = audio_source(path)
+    if source.suffix == '.flac':
+        samples, _, width = read_flac(source)
+        return samples, width
+    header = read_header(source)
+    return pcm_view(source, header), header.sample_width
+
+# Full-scale value of the integers integer_pcm returns, per WAV sample width
+FULL_SCALE = {1: 1 << 15, 2: 1 << 15, 3: 1 << 23, 4: 1 << 31}
+
+def integer_pcm(samples: np.ndarray) -> np.ndarray:
+    """Signed integer PCM in read_flac's layout: 8-bit scaled to int16, 24-bit unpacked to int32"""
+    if samples.ndim == 3:
+        # 24-bit WAV view: raw little-endian bytes per sample
+        b = samples.astype(np.int32)
+        return ((b[..., 0] | (b[..., 1] << 8) | (b[..., 2] << 16)) << 8) >> 8
+    if samples.dtype == np.uint8:
+        return (samples.astype(np.int16) - 128) << 8
+    return np.asarray(samples)
+
+def pcm_digest(path: Path) -> str:
+    """SHA-1 of the integer PCM, independent of the header and of WAV vs FLAC storage"""
+    samples, _ = raw_pcm(path)
+    # Raw WAV views are u1/byte arrays while FLAC decodes are int16/int32, so hash the
+    # integer_pcm layout as little-endian int16 (8/16-bit) or int32 (24/32-bit)
+    samples = integer_pcm(samples)
+    return hashlib.sha1(samples.astype('<i2' if samples.itemsize <= 2 else '<i4').tobytes()).hexdigest()
+
+def load_pcm(path: Path, start: int = 0, stop: Optional[int] = None) -> Tuple[np.ndarray, int]:
+    """Frames [start, stop) as float32 mono in [-1, 1], through an mmap view (or FLAC decode)"""
+    source = audio_source(path)
+    if source.suffix == '.flac':
+        samples, sample_rate, width = read_flac(source)
+        samples = samples[start:stop].astype(np.float32) / float(1 << (8 * width - 1))
+        return samples.mean(axis=1), sample_rate
+
+    header = read_header(path)
+    samples = to_float32(pcm_view(path, header, start, stop), header)
+    if header.channels > 1:
+        samples = samples.mean(axis=1)
+    else:
+        samples = samples[:, 0]
+    return samples, header.sample_rate
+
+def frame_signal(samples: np.ndarray, frame_length: int, hop_length: int) -> np.ndarray:
+    """Overlapping frames as a strided view, shape (n_frames, frame_length)"""
+    if len(samples) < frame_length:
+        samples = np.pad(samples, (0, frame_length - len(samples)))
+    return np.lib.stride_tricks.sliding_window_view(samples, frame_length)[::hop_length]
+
+def frame_db(samples: np.ndarray, sample_rate: int, frame_ms: float = 20.0,
+             hop_ms: float = 10.0) -> np.ndarray:
+    """Short-time RMS level per frame in dBFS"""
+    frame_length = max(1, int(sample_rate * frame_ms / 1000))
+    hop_length = max(1, int(sample_rate * hop_ms / 1000))
+    frames = frame_signal(samples, frame_length, hop_length)
+    rms = np.sqrt(np.mean(frames.astype(np.float64) ** 2, axis=1))
+    return 20 * np.log10(np.maximum(rms, 1e-10))
+
+def k_weighting(sample_rate: int) -> List[Tuple[np.ndarray, np.ndarray]]:
+    """ITU-R BS.1770 K-weighting as two biquads (shelf + high-pass) for any sample rate"""
+    f0, gain, q = 1681.974450955533, 3.999843853973347, 0.7071752369554196
+    k = np.tan(np.pi * f0 / sample_rate)
+    vh = 10 ** (gain / 20)
+    vb = vh ** 0.4996667741545416
+    a0 = 1 + k / q + k * k
+    shelf = (
+        np.array([(vh + vb * k / q + k * k) / a0, 2 * (k * k - vh) / a0, (vh - vb * k / q + k * k) / a0]),
+        np.array([1.0, 2 * (k * k - 1) / a0, (1 - k / q + k * k) / a0]),
+    )
+
+    f0, q = 38.13547087602444, 0.5003270373238773
+    k = np.tan(np.pi * f0 / sample_rate)
+    a0 = 1 + k / q + k * k
+    highpass = (
+        np.array([1.0, -2.0, 1.0]),
+        np.array([1.0, 2 * (k * k - 1) / a0, (1 - k / q + k * k) / a0]),
+    )
+    return [shelf, highpass]
+
+def integrated_loudness(samples: np.ndarray, sample_rate: int) -> float:
+    """Gated integrated loudness (LUFS) per ITU-R BS.1770-4, mono"""
+    weighted = samples.astype(np.float64)
+    for b, a in k_weighting(sample_rate):
+        weighted = lfilter(b, a, weighted)
+
+    block = int(0.4 * sample_rate)
+    if len(weighted) < block:
+        return float('-inf')
+    power = np.mean(frame_signal(weighted, block, block // 4) ** 2, axis=1)
+    loudness = -0.691 + 10 * np.log10(np.maximum(power, 1e-20))
+
+    gated = power[loudness > -70.0]
+    if not len(gated):
+        return float('-inf')
+    relative_gate = -0.691 + 10 * np.log10(gated.mean()) - 10.0
+    gated = power[(loudness > -70.0) & (loudness > relative_gate)]
+    return float(-0.691 + 10 * np.log10(gated.mean()))
+
+def file_signature(path: Path) -> Tuple[int, int]:
+    stat = os.stat(audio_source(path))
+    return stat.st_size, stat.st_mtime_ns
+
+def parallel_map(func: Callable, items: Sequence, workers: Optional[int] = None,
+                 chunksize: int = 8, label: str = 'files') -> List:
+    """Order-preserving map over a process pool with coarse progress output"""
+    if not items:
+        return []
+    if workers == 1:
+        return [func(item) for item in items]
+
+    results = []
+    step = max(1, len(items) // 10)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for i, result in enumerate(pool.map(func, items, chunksize=chunksize), 1):
+            results.append(result)
+            if i % step == 0 or i == len(items):
+                print(f"  Processed {i}/{len(items)} {label}")
+    return results
+
+class ColumnStore:
+    """Columnar .npz table with one row per corpus file, keyed by path"""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.columns: Dict[str, np.ndarray] = {}
+        if self.path.exists():
+            with np.load(self.path, allow_pickle=False) as data:
+                self.columns = {name: data[name] for name in data.files}
+
+    def __len__(self) -> int:
+        return len(self.columns.get('path', ()))
+
+    def signatures(self) -> Dict[str, Tuple[int, int]]:
+        if not len(self):
+            return {}
+        return {
+            path: (int(size), int(mtime))
+            for path, size, mtime in zip(self.columns['path'], self.columns['size'], self.columns['mtime'])
+        }
+
+    def row_index(self) -> Dict[str, int]:
+        return {path: i for i, path in enumerate(self.columns.get('path', ()))}
+
+    def replace_rows(self, keep: Sequence[str], rows: List[Dict]):
+        """Keep existing rows for `keep` paths, then append freshly computed rows"""
+        index = self.row_index()
+        kept = [index[path] for path in keep if path in index]
+        names = set(self.columns) | {name for row in rows for name in row}
+
+        merged = {}
+        for name in names:
+            old = self.columns.get(name)
+            new = [row[name] for row in rows]
+            parts = []
+            if old is not None and kept:
+                parts.append(old[kept])
+            if new:
+                parts.append(np.asarray(new))
+            if parts:
+                merged[name] = np.concatenate(parts) if len(parts) > 1 else parts[0]
+        self.columns = merged
+
+    def save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix('.tmp.npz')
+        np.savez_compressed(tmp_path, **self.columns)
+        os.replace(tmp_path, self.path)
+
+    def to_dataframe(self):
+        """pandas view for the analysis scripts (vector columns are split per dimension)"""
+        import pandas as pd
+
+        flat = {}
+        for name, values in self.columns.items():
+            if values.ndim == 1:
+                flat[name] = values
+            else:
+                for i in range(values.shape[1]):
+                    flat[f"{name}_{i}"] = values[:, i]
+        return pd.DataFrame(flat)
+
+def update_store(store_path: Path, extract: Callable[[str], Dict], roots: Optional[Sequence[Path]] = None,
+                 workers: Optional[int] = None, rebuild: bool = False) -> Dict[str, int]:
+    """Recompute `extract(path_key)` only for new or changed files and drop deleted ones"""
+    store = ColumnStore(store_path)
+    known = {} if rebuild else store.signatures()
+
+    current = {corpus_key(path): file_signature(path) for path in iter_corpus_files(roots)}
+    changed = [key for key in current if known.get(key) != current[key]]
+    # Rows outside the scanned roots are kept as long as their file still exists
+    removed = [key for key in known if key not in current and not audio_source(resolve_key(key)).exists()]
+    unchanged = [key for key in known if key not in removed and key not in changed]
+
+    scan_headers(roots)
+    rows = parallel_map(extract, changed, workers)
+    for key, row in zip(changed, rows):
+        row['path'] = key
+        row['size'], row['mtime'] = current[key]
+
+    store.replace_rows(unchanged, rows)
+    store.save()
+    return {'updated': len(changed), 'unchanged': len(unchanged), 'removed': len(removed), 'total': len(store)}
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Compressed corpus storage: lossless FLAC masters plus optional Opus renditions
+Writes <name>.flac (and <name>.opus) next to every corpus WAV, verifies that the
+FLAC decodes to bit-identical PCM, and can then drop the WAV. Analysis keeps
+working unchanged (audio_corpus reads FLAC masters under their .wav keys) and the
+webapp decodes or selects renditions on the fly (webapp/audio_cache.py).
+
+Requires the optional soundfile package (libsndfile >= 1.1 for Opus).
+
+By default this covers the analysis corpus (public/voices*) and the directory the
+webapp serves (tts-qa-system/data/voices).
+
+Usage:
+  python compress_corpus.py                        # FLAC masters next to the WAVs
+  python compress_corpus.py --opus --bitrate 48    # plus Opus renditions for serving
+  python compress_corpus.py --remove-wav           # keep only verified FLAC masters
+"""
+
+import argparse
+from pathlib import Path
+from typing import Dict
+
+import numpy as np
+from scipy.signal import resample_poly
+
+from audio_corpus import (
+    CORPUS_DIRS, FULL_SCALE, REPO_ROOT, audio_source, corpus_key, integer_pcm, iter_corpus_files, parallel_map,
+    raw_pcm, read_header,
+)
+from wav_reader import read_flac
+
+# libsndfile's Opus encoder only accepts these input rates
+OPUS_RATES = (8000, 12000, 16000, 24000, 48000)
+SUBTYPES = {1: 'PCM_S8', 2: 'PCM_16', 3: 'PCM_24'}
+# Directory /audio serves from (webapp/app.py VOICES_DIR)
+WEBAPP_VOICES = REPO_ROOT / 'tts-qa-system' / 'data' / 'voices'
+
+def opus_rate(sample_rate: int) -> int:
+    return sample_rate if sample_rate in OPUS_RATES else 48000
+
+def compress_file(task) -> Dict:
+    """Encode one corpus entry (top-level so the process pool can pickle it)"""
+    import soundfile
+
+    wav_path, opus, bitrate, remove_wav = task
+    wav_path = Path(wav_path)
+    flac_path = wav_path.with_suffix('.flac')
+    opus_path = wav_path.with_suffix('.opus')
+    result = {'path': corpus_key(wav_path), 'wav_bytes': 0, 'flac_bytes': 0, 'opus_bytes': 0,
+              'encoded': False, 'removed': False, 'error': None}
+
+    try:
+        source = audio_source(wav_path)
+        samples, width = raw_pcm(source)
+        samples = integer_pcm(samples)
+        if source.suffix == '.wav':
+            result['wav_bytes'] = source.stat().st_size
+            sample_rate = read_header(source).sample_rate
+            if width not in SUBTYPES:
+                raise ValueError(f'{8 * width}-bit PCM has no lossless FLAC subtype')
+            stale = not flac_path.exists() or flac_path.stat().st_mtime < source.stat().st_mtime
+            if stale:
+                try:
+                    # libsndfile expects 24-bit samples left-aligned in int32
+                    soundfile.write(str(flac_path), samples << 8 if width == 3 else samples, sample_rate,
+                                    subtype=SUBTYPES[width], format='FLAC')
+                except (RuntimeError, ValueError, TypeError):
+                    flac_path.unlink(missing_ok=True)
+                    raise
+                result['encoded'] = True
+
+            # Masters must round-trip to the exact PCM the analysis tools read
+            decoded, decoded_rate, _ = read_flac(flac_path)
+            if decoded_rate != sample_rate or not np.array_equal(decoded, samples):
+                flac_path.unlink()
+                raise ValueError('FLAC round-trip mismatch')
+            if remove_wav:
+                source.unlink()
+                result['removed'] = True
+        else:
+            _, sample_rate, _ = read_flac(source)
+        result['flac_bytes'] = flac_path.stat().st_size
+
+        if opus and (not opus_path.exists() or opus_path.stat().st_mtime < flac_path.stat().st_mtime):
+            audio = samples.astype(np.float32) / float(FULL_SCALE[width])
+            rate = opus_rate(sample_rate)
+            if rate != sample_rate:
+                divisor = np.gcd(rate, sample_rate)
+                audio = resample_poly(audio, rate // divisor, sample_rate // divisor, axis=0).astype(np.float32)
+            # libsndfile maps compression_level 0..1 onto the Opus bitrate range (high..low)
+            level = float(np.clip(1 - (bitrate - 6) / (256 - 6), 0, 1))
+            soundfile.write(str(opus_path), audio, rate, format='OGG', subtype='OPUS', compression_level=level)
+        if opus_path.exists():
+            result['opus_bytes'] = opus_path.stat().st_size
+    except (OSError, ValueError, RuntimeError) as e:
+        result['error'] = str(e)
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description='Store the corpus as FLAC masters with optional Opus renditions')
+    parser.add_argument('--roots', type=Path, nargs='+', default=[*CORPUS_DIRS, WEBAPP_VOICES],
+                        help='Directories to compress (default: public/voices* and the webapp voices)')
+    parser.add_argument('--workers', type=int, help='Worker processes (default: CPU count)')
+    parser.add_argument('--opus', action='store_true', help='Also write Opus renditions for serving')
+    parser.add_argument('--bitrate', type=int, default=48, help='Approximate Opus bitrate in kbps')
+    parser.add_argument('--remove-wav', action='store_true', help='Delete WAVs once their FLAC verifies')
+
+    args = parser.parse_args()
+
+    files = iter_corpus_files(args.roots)
+    print(f"🗜️  Compressing {len(files)} file(s)")
+    tasks = [(str(path), args.opus, args.bitrate, args.remove_wav) for path in files]
+    results = parallel_map(compress_file, tasks, args.workers)
+
+    errors = [r for r in results if r['error']]
+    wav_bytes = sum(r['wav_bytes'] for r in results)
+    flac_bytes = sum(r['flac_bytes'] for r in results)
+    opus_bytes = sum(r['opus_bytes'] for r in results)
+    print(f"✅ Encoded {sum(r['encoded'] for r in results)} FLAC master(s), "
+          f"{sum(r['removed'] for r in results)} WAV(s) removed")
+    if wav_bytes:
+        print(f"   WAV:  {wav_bytes / 1024 / 1024:7.1f} MB")
+        print(f"   FLAC: {flac_bytes / 1024 / 1024:7.1f} MB ({wav_bytes / max(flac_bytes, 1):.1f}x smaller)")
+        if opus_bytes:
+            print(f"   Opus: {opus_bytes / 1024 / 1024:7.1f} MB ({wav_bytes / opus_bytes:.1f}x smaller)")
+    for r in errors:
+        print(f"❌ {r['path']}: {r['error']}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,306 @@
+#!/usr/bin/env python3
+"""
+SQLite manifest of every audio file with a canonical sample key
+Filenames follow several schemes, all parsed here into the same fields:
+
+  voice_001_ref_styles.wav               webapp pool reference (generate_samples.py)
+  voice_001_ang_match_scale_1.5.wav      webapp pool, short emotion codes
+  v001_angry_match_scale_1.0.wav         orchestrate.py experiments
+  v001_angry_match_reference.wav
+  v001_match_emo_angry_scale_1.0.wav     expressivity comparison (public/voices)
+  v001_match_reference_angry.wav
+  test_high.wav, hd1/<stem>.wav          quality tiers (quality_tiers.py)
+
+The canonical key is version/expressivity/voice/emotion/text_type/scale[/tier], e.g.
+voices_2/0.6/v002/furious/match/1.6. Rows also carry size, duration and the PCM
+checksum; only files whose size or mtime changed are re-read on rebuild.
+
+Usage:
+  python corpus_manifest.py                                   # build / update
+  python corpus_manifest.py --query voice=v002 emotion=furious --min-scale 1.6
+  python corpus_manifest.py --sql "SELECT version, COUNT(*) FROM files GROUP BY version"
+"""
+
+import argparse
+import json
+import re
+import sqlite3
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+import yaml
+
+from audio_corpus import (
+    CORPUS_DIRS, REPO_ROOT, STORE_DIR, audio_source, corpus_key, file_signature, iter_corpus_files,
+    parallel_map, pcm_digest, read_header,
+)
+from quality_tiers import tier_of
+from wav_reader import read_flac
+
+MANIFEST_DB = STORE_DIR / 'manifest.sqlite'
+WEBAPP_VOICES = REPO_ROOT / 'tts-qa-system' / 'data' / 'voices'
+DEFAULT_ROOTS = CORPUS_DIRS + [WEBAPP_VOICES]
+# Served directories that are not orchestrate.py experiments
+EXTRA_VERSIONS = {'tts-qa-system/data/voices': 'webapp'}
+EXPERIMENTS_CONFIG = REPO_ROOT / 'tts-qa-system' / 'config' / 'experiments.yaml'
+SENTENCES_CONFIG = REPO_ROOT / 'tts-qa-system' / 'config' / 'test_sentences.json'
+
+# Short codes used by TTSSampleGenerator.generate_filename
+EMOTION_CODES = {
+    'ang': 'angry', 'hap': 'happy', 'whi': 'whisper', 'tup': 'toneup', 'tdn': 'tonedown',
+    'exc': 'excited', 'fur': 'furious', 'ter': 'terrified', 'fea': 'fear', 'sur': 'surprise',
+    'exm': 'excitement',
+}
+# Webapp pool references are per emotion type, not per emotion
+REFERENCE_TYPES = {'styles': 'style', 'audio': 'audio', 'prompt': 'prompt'}
+
+TEXT = r'(?P<text_type>match|neutral|opposite)'
+SCALE = r'_scale_(?P<scale>\d+(?:\.\d+)?)'
+NAME_PATTERNS = [
+    re.compile(rf'^ref_(?P<reference>[a-z]+)$'),
+    re.compile(rf'^{TEXT}_emo_(?P<emotion>[a-z]+){SCALE}$'),
+    re.compile(rf'^{TEXT}_(?P<reference>reference)(?:_(?P<emotion>[a-z]+))?$'),
+    re.compile(rf'^(?P<emotion>[a-z]+)_{TEXT}{SCALE}$'),
+    re.compile(rf'^(?P<emotion>[a-z]+)_{TEXT}(?:_(?P<reference>reference))?$'),
+]
+VOICE_PATTERN = re.compile(r'^(?:v|voice_)(?P<number>\d+)_(?P<rest>.+)$')
+
+COLUMNS = ['path', 'canonical_key', 'version', 'expressivity', 'voice', 'emotion', 'emotion_type', 'text_type',
+           'scale', 'is_reference', 'tier', 'size', 'mtime_ns', 'duration', 'sample_rate', 'pcm_sha1', 'indexed_at']
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    canonical_key TEXT,
+    version TEXT,
+    expressivity TEXT,
+    voice TEXT,
+    emotion TEXT,
+    emotion_type TEXT,
+    text_type TEXT,
+    scale REAL,
+    is_reference INTEGER,
+    tier TEXT,
+    size INTEGER,
+    mtime_ns INTEGER,
+    duration REAL,
+    sample_rate INTEGER,
+    pcm_sha1 TEXT,
+    indexed_at REAL
+);
+CREATE INDEX IF NOT EXISTS idx_canonical_key ON files (canonical_key);
+CREATE INDEX IF NOT EXISTS idx_voice_emotion_scale ON files (voice, emotion, scale);
+CREATE INDEX IF NOT EXISTS idx_version ON files (version, expressivity);
+CREATE INDEX IF NOT EXISTS idx_pcm_sha1 ON files (pcm_sha1);
+-- Serving-copy trim offsets in seconds of the original (trim_silence.py)
+CREATE TABLE IF NOT EXISTS trims (
+    path TEXT PRIMARY KEY,
+    start_s REAL,
+    end_s REAL,
+    original_s REAL,
+    first_speech_s REAL,
+    pad_ms INTEGER,
+    rendition TEXT,
+    trimmed_at REAL
+);
+"""
+
+def load_naming_config() -> Dict:
+    """Experiment output dirs (-> version) and emotion -> emotion type"""
+    with open(EXPERIMENTS_CONFIG, 'r') as f:
+        experiments = yaml.safe_load(f)['experiments']
+    with open(SENTENCES_CONFIG, 'r', encoding='utf-8') as f:
+        emotions = json.load(f)['emotions']
+    return {
+        'versions': {**EXTRA_VERSIONS, **{config['output_dir']: name for name, config in experiments.items()}},
+        'emotion_types': {name: 'style' if 'style_label' in config else config.get('type')
+                          for name, config in emotions.items()},
+    }
+
+def parse_sample_name(key: str, naming: Dict) -> Dict:
+    """Metadata fields for a repository-relative path; fields stay None where the name does not say"""
+    path = Path(key)
+    fields = dict.fromkeys(['version', 'expressivity', 'voice', 'emotion', 'emotion_type', 'text_type',
+                            'scale', 'tier'])
+    fields['is_reference'] = 0
+
+    stem = path.stem
+    tier = tier_of(path)
+    if tier:
+        stem, fields['tier'] = Path(tier[0]).name, tier[1]
+
+    parent = path.parent.as_posix()
+    for output_dir, name in naming['versions'].items():
+        if parent == output_dir or parent.startswith(output_dir + '/'):
+            fields['version'] = name
+            break
+    else:
+        fields['version'] = path.parent.parent.as_posix() if fields['tier'] and path.parent.name == fields['tier'] \
+            else parent
+    expressivity = re.search(r'(?:^|/)expressivity_([^/]+)', parent)
+    if expressivity:
+        fields['expressivity'] = expressivity.group(1)
+        fields['version'] = fields['version'].split('/expressivity_')[0]
+
+    voice = VOICE_PATTERN.match(stem)
+    if not voice:
+        return fields
+    fields['voice'] = f"v{int(voice['number']):03d}"
+    for pattern in NAME_PATTERNS:
+        match = pattern.match(voice['rest'])
+        if not match:
+            continue
+        found = match.groupdict()
+        reference = found.get('reference')
+        if reference and reference != 'reference':
+            # voice_001_ref_<emotion or emotion type>
+            if reference in REFERENCE_TYPES:
+                fields['emotion_type'] = REFERENCE_TYPES[reference]
+            else:
+                found['emotion'] = reference
+        fields['is_reference'] = int(reference is not None)
+        emotion = found.get('emotion')
+        if emotion:
+            fields['emotion'] = EMOTION_CODES.get(emotion, emotion)
+            fields['emotion_type'] = naming['emotion_types'].get(fields['emotion'])
+        fields['text_type'] = found.get('text_type')
+        if found.get('scale'):
+            fields['scale'] = float(found['scale'])
+        break
+    return fields
+
+def canonical_key(fields: Dict) -> Optional[str]:
+    """version/expressivity/voice/emotion/text_type/scale[/tier]; None for unparsed names"""
+    if fields['voice'] is None:
+        return None
+    parts = [
+        fields['version'],
+        fields['expressivity'] or '-',
+        fields['voice'],
+        fields['emotion'] or fields['emotion_type'] or '-',
+        fields['text_type'] or '-',
+        'reference' if fields['is_reference'] else f"{fields['scale']:g}" if fields['scale'] is not None else '-',
+    ]
+    if fields['tier']:
+        parts.append(fields['tier'])
+    return '/'.join(parts)
+
+def measure_file(task) -> Dict:
+    """Size, duration and PCM checksum for one file (top-level so the process pool can pickle it)"""
+    path = Path(task)
+    source = audio_source(path)
+    if source.suffix == '.flac':
+        samples, sample_rate, _ = read_flac(source)
+        frames = len(samples)
+    else:
+        header = read_header(path)
+        sample_rate, frames = header.sample_rate, header.frames
+    size, mtime_ns = file_signature(path)
+    return {'size': size, 'mtime_ns': mtime_ns, 'duration': frames / sample_rate if sample_rate else None,
+            'sample_rate': sample_rate, 'pcm_sha1': pcm_digest(path)}
+
+def connect(db_path: Path = MANIFEST_DB) -> sqlite3.Connection:
+    db_path.parent.mkdir(parents=True, exist_ok=True)
+    connection = sqlite3.connect(db_path)
+    connection.row_factory = sqlite3.Row
+    connection.executescript(SCHEMA)
+    return connection
+
+def update_manifest(connection: sqlite3.Connection, roots: Optional[Sequence[Path]] = None,
+                    workers: Optional[int] = None, rebuild: bool = False) -> Dict:
+    """Re-measure new or changed files under the roots and drop rows for deleted ones"""
+    roots = roots or DEFAULT_ROOTS
+    naming = load_naming_config()
+    known = {row['path']: (row['size'], row['mtime_ns'])
+             for row in connection.execute('SELECT path, size, mtime_ns FROM files')}
+
+    files = iter_corpus_files(roots)
+    keys = [corpus_key(path) for path in files]
+    changed = [(path, key) for path, key in zip(files, keys)
+               if rebuild or known.get(key) != file_signature(path)]
+    measured = parallel_map(measure_file, [str(path) for path, _ in changed], workers) if changed else []
+
+    now = time.time()
+    rows = []
+    for (_, key), measurement in zip(changed, measured):
+        fields = parse_sample_name(key, naming)
+        row = {'path': key, 'canonical_key': canonical_key(fields), **fields, **measurement, 'indexed_at': now}
+        rows.append(tuple(row[column] for column in COLUMNS))
+
+    # Rows under the scanned roots whose file is gone
+    prefixes = tuple(corpus_key(Path(root)) + '/' for root in roots)
+    present = set(keys)
+    removed = [key for key in known if key.startswith(prefixes) and key not in present]
+
+    with connection:
+        connection.executemany(f"INSERT OR REPLACE INTO files ({', '.join(COLUMNS)}) "
+                               f"VALUES ({', '.join('?' * len(COLUMNS))})", rows)
+        connection.executemany('DELETE FROM files WHERE path = ?', [(key,) for key in removed])
+    total = connection.execute('SELECT COUNT(*) FROM files').fetchone()[0]
+    return {'updated': len(rows), 'unchanged': len(files) - len(rows), 'removed': len(removed), 'total': total}
+
+def query(connection: sqlite3.Connection, min_scale: Optional[float] = None, max_scale: Optional[float] = None,
+          **filters) -> List[sqlite3.Row]:
+    """Rows matching equality filters on manifest columns plus an optional scale range"""
+    clauses, params = [], []
+    for column, value in filters.items():
+        if column not in COLUMNS:
+            raise ValueError(f'Unknown manifest column: {column}')
+        clauses.append(f'{column} = ?')
+        params.append(value)
+    if min_scale is not None:
+        clauses.append('scale >= ?')
+        params.append(min_scale)
+    if max_scale is not None:
+        clauses.append('scale <= ?')
+        params.append(max_scale)
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+    return connection.execute(f'SELECT * FROM files {where} ORDER BY path', params).fetchall()
+
+def load_manifest(db_path: Path = MANIFEST_DB):
+    """Whole manifest as a DataFrame, joinable on path (the key used by every corpus store)"""
+    import pandas as pd
+
+    with sqlite3.connect(db_path) as connection:
+        return pd.read_sql_query('SELECT * FROM files', connection)
+
+def main():
+    parser = argparse.ArgumentParser(description='Build or query the SQLite corpus manifest')
+    parser.add_argument('--roots', type=Path, nargs='+', help='Directories to index (default: corpus + webapp voices)')
+    parser.add_argument('--workers', type=int, help='Worker processes (default: CPU count)')
+    parser.add_argument('--rebuild', action='store_true', help='Re-measure every file')
+    parser.add_argument('--db', type=Path, default=MANIFEST_DB, help='Manifest database path')
+    parser.add_argument('--query', nargs='*', metavar='COLUMN=VALUE', help='Query instead of updating')
+    parser.add_argument('--min-scale', type=float, help='Query: minimum emotion scale')
+    parser.add_argument('--max-scale', type=float, help='Query: maximum emotion scale')
+    parser.add_argument('--sql', help='Run a read-only SQL statement against the manifest')
+
+    args = parser.parse_args()
+    connection = connect(args.db)
+
+    if args.sql:
+        rows = connection.execute(args.sql).fetchall()
+        if rows:
+            print('\t'.join(rows[0].keys()))
+        for row in rows:
+            print('\t'.join(str(value) for value in row))
+        return
+
+    if args.query is not None or args.min_scale is not None or args.max_scale is not None:
+        filters = dict(item.split('=', 1) for item in args.query or [])
+        rows = query(connection, args.min_scale, args.max_scale, **filters)
+        for row in rows:
+            print(f"   {row['canonical_key'] or '-':55s} {row['duration'] or 0:6.2f}s  {row['path']}")
+        print(f"🔍 {len(rows)} file(s)")
+        return
+
+    counts = update_manifest(connection, args.roots, args.workers, args.rebuild)
+    print(f"✅ Manifest: {args.db} (updated {counts['updated']}, unchanged {counts['unchanged']}, "
+          f"removed {counts['removed']}, total {counts['total']})")
+    unparsed = connection.execute('SELECT COUNT(*) FROM files WHERE canonical_key IS NULL').fetchone()[0]
+    if unparsed:
+        print(f"⚠️  {unparsed} file(s) with names outside the known schemes (see --sql)")
+
+if __name__ == "__main__":
+    main()
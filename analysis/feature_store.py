@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Acoustic feature store for the generated audio corpus
+Computes per-file objective metrics (duration, RMS/LUFS loudness, peak, clipping,
+leading/trailing silence, spectral centroid/bandwidth) across a process pool and
+keeps them in analysis/corpus_store/features.npz, recomputing only changed files
+
+Usage:
+  python feature_store.py                      # incremental update of all corpora
+  python feature_store.py --roots ../public/voices_3 --workers 8
+  python feature_store.py --rebuild
+"""
+
+import argparse
+from pathlib import Path
+from typing import Dict
+
+import numpy as np
+
+from audio_corpus import (
+    CORPUS_DIRS, SILENCE_DB, STORE_DIR, ColumnStore, frame_db, frame_signal,
+    integrated_loudness, load_pcm, resolve_key, update_store,
+)
+
+FEATURE_STORE = STORE_DIR / 'features.npz'
+
+# Spectral frames: 2048-point FFT with 75% overlap
+N_FFT = 2048
+HOP = 512
+CLIP_LEVEL = 0.999
+
+def spectral_shape(samples: np.ndarray, sample_rate: int):
+    """Energy-weighted mean spectral centroid and bandwidth (Hz) over all frames"""
+    frames = frame_signal(samples, N_FFT, HOP) * np.hanning(N_FFT).astype(np.float32)
+    magnitude = np.abs(np.fft.rfft(frames, axis=1))
+    freqs = np.fft.rfftfreq(N_FFT, 1.0 / sample_rate)
+
+    frame_energy = magnitude.sum(axis=1)
+    voiced = frame_energy > 1e-8
+    if not voiced.any():
+        return 0.0, 0.0
+    magnitude, frame_energy = magnitude[voiced], frame_energy[voiced]
+
+    centroid = (magnitude @ freqs) / frame_energy
+    spread = np.sqrt((magnitude * (freqs[None, :] - centroid[:, None]) ** 2).sum(axis=1) / frame_energy)
+    weights = frame_energy / frame_energy.sum()
+    return float(centroid @ weights), float(spread @ weights)
+
+def extract_features(key: str) -> Dict:
+    """All scalar features for one corpus file (top-level so the process pool can pickle it)"""
+    samples, sample_rate = load_pcm(resolve_key(key))
+    duration = len(samples) / sample_rate if sample_rate else 0.0
+    peak = float(np.max(np.abs(samples))) if len(samples) else 0.0
+    rms = float(np.sqrt(np.mean(samples.astype(np.float64) ** 2))) if len(samples) else 0.0
+
+    # Leading/trailing silence from 10ms hop frame levels
+    levels = frame_db(samples, sample_rate)
+    loud = np.flatnonzero(levels >= SILENCE_DB)
+    if len(loud):
+        leading = loud[0] * 0.01
+        trailing = max(0.0, duration - (loud[-1] * 0.01 + 0.02))
+    else:
+        leading = trailing = duration
+
+    centroid, bandwidth = spectral_shape(samples, sample_rate)
+    return {
+        'sample_rate': sample_rate,
+        'duration': duration,
+        'rms_db': 20 * np.log10(max(rms, 1e-10)),
+        'lufs': integrated_loudness(samples, sample_rate),
+        'peak_dbfs': 20 * np.log10(max(peak, 1e-10)),
+        'clipping_ratio': float(np.mean(np.abs(samples) >= CLIP_LEVEL)) if len(samples) else 0.0,
+        'leading_silence': float(leading),
+        'trailing_silence': float(trailing),
+        'spectral_centroid': centroid,
+        'spectral_bandwidth': bandwidth,
+    }
+
+def load_features():
+    """Feature store as a pandas DataFrame (one row per WAV, keyed by repo-relative path)"""
+    return ColumnStore(FEATURE_STORE).to_dataframe()
+
+def main():
+    parser = argparse.ArgumentParser(description='Build or update the acoustic feature store')
+    parser.add_argument('--roots', type=Path, nargs='+', default=CORPUS_DIRS, help='Directories to scan for WAVs')
+    parser.add_argument('--workers', type=int, help='Worker processes (default: CPU count)')
+    parser.add_argument('--rebuild', action='store_true', help='Recompute every file')
+    parser.add_argument('--store', type=Path, default=FEATURE_STORE, help='Feature store path')
+
+    args = parser.parse_args()
+
+    print(f"🔍 Scanning {', '.join(str(r) for r in args.roots)}")
+    counts = update_store(args.store, extract_features, args.roots, args.workers, args.rebuild)
+    print(f"✅ Feature store: {args.store}")
+    print(f"   Updated {counts['updated']}, unchanged {counts['unchanged']}, "
+          f"removed {counts['removed']}, total {counts['total']}")
+
+    df = ColumnStore(args.store).to_dataframe()
+    if len(df):
+        summary = df[['duration', 'lufs', 'peak_dbfs', 'clipping_ratio', 'leading_silence',
+                      'trailing_silence', 'spectral_centroid']].replace([np.inf, -np.inf], np.nan)
+        print("\n📊 Corpus summary:")
+        print(summary.describe().loc[['mean', 'min', 'max']].round(3).to_string())
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+"""
+Audio fingerprint index for duplicate / near-duplicate detection across versions
+Each file gets a sequence of 32-bit sub-fingerprints (Haitsma-Kalker style: signs of
+band-energy differences across 33 log-spaced bands, 300-2000 Hz) plus a hash of its
+PCM. Candidates are found through an inverted index on sub-fingerprint values and
+confirmed by bit error rate (BER) at the best time offset.
+
+Usage:
+  python fingerprint_index.py build
+  python fingerprint_index.py duplicates [--cross-version] [--threshold 0.2]
+  python fingerprint_index.py query ../public/voices_3/expressivity_0.6/v001_angry_match_scale_1.0.wav
+  python fingerprint_index.py compare OLD.wav NEW.wav      # verify a regeneration really changed
+"""
+
+import argparse
+import sys
+from collections import Counter, defaultdict
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from scipy.signal import resample_poly
+
+from audio_corpus import (
+    CORPUS_DIRS, STORE_DIR, ColumnStore, corpus_key, frame_signal, load_pcm, pcm_digest,
+    resolve_key, update_store,
+)
+
+FINGERPRINT_STORE = STORE_DIR / 'fingerprints.npz'
+
+# Analysis at 8 kHz: 2048-sample (256ms) frames every 16ms
+FP_RATE = 8000
+FP_FRAME = 2048
+FP_HOP = 128
+BANDS = np.geomspace(300, 2000, 34)
+# Fixed-length storage; longer files keep their first MAX_FRAMES sub-fingerprints
+MAX_FRAMES = 512
+
+# BER below this is the same audio (unrelated speech sits around 0.5)
+DUPLICATE_BER = 0.2
+MIN_MATCHES = 3
+
+def subfingerprints(samples: np.ndarray, sample_rate: int) -> Tuple[np.ndarray, np.ndarray]:
+    """32-bit sub-fingerprint per frame and a mask of frames loud enough to be meaningful"""
+    if sample_rate != FP_RATE:
+        divisor = np.gcd(sample_rate, FP_RATE)
+        samples = resample_poly(samples, FP_RATE // divisor, sample_rate // divisor)
+    frames = frame_signal(samples.astype(np.float32), FP_FRAME, FP_HOP) * np.hanning(FP_FRAME).astype(np.float32)
+    power = np.abs(np.fft.rfft(frames, axis=1)) ** 2
+    freqs = np.fft.rfftfreq(FP_FRAME, 1.0 / FP_RATE)
+
+    band_of_bin = np.digitize(freqs, BANDS) - 1
+    band_matrix = (band_of_bin[:, None] == np.arange(len(BANDS) - 1)[None, :]).astype(np.float32)
+    energy = power @ band_matrix
+
+    band_diff = energy[:, :-1] - energy[:, 1:]
+    bits = (band_diff[1:] - band_diff[:-1]) > 0
+    codes = np.packbits(bits, axis=1, bitorder='little').view('<u4').ravel()
+
+    frame_level = 10 * np.log10(np.maximum(energy.sum(axis=1), 1e-12))
+    loud = frame_level[1:] > frame_level.max() - 40
+    return codes.astype(np.uint32), loud
+
+def fingerprint_file(key: str) -> Dict:
+    """Store row for one corpus file (top-level so the process pool can pickle it)"""
+    path = resolve_key(key)
+    samples, sample_rate = load_pcm(path)
+    codes, loud = subfingerprints(samples, sample_rate)
+    padded = np.zeros(MAX_FRAMES, dtype=np.uint32)
+    mask = np.zeros(MAX_FRAMES, dtype=bool)
+    n = min(len(codes), MAX_FRAMES)
+    padded[:n], mask[:n] = codes[:n], loud[:n]
+    return {
+        'pcm_sha1': pcm_digest(path),
+        'duration': len(samples) / sample_rate,
+        'n_frames': n,
+        'codes': padded,
+        'loud': mask,
+    }
+
+def bit_error_rate(a: np.ndarray, b: np.ndarray, offset: int) -> float:
+    """BER between code sequences with b shifted by `offset` frames, over the overlap"""
+    if offset >= 0:
+        a = a[offset:]
+    else:
+        b = b[-offset:]
+    n = min(len(a), len(b))
+    if n == 0:
+        return 1.0
+    diff = np.bitwise_xor(a[:n], b[:n]).view(np.uint8)
+    return float(np.unpackbits(diff).sum() / (32 * n))
+
+class FingerprintIndex:
+    """Inverted index from sub-fingerprint value to (row, frame) occurrences"""
+
+    def __init__(self, store: ColumnStore):
+        self.paths = list(store.columns.get('path', []))
+        self.digests = list(store.columns.get('pcm_sha1', []))
+        self.sizes = store.columns.get('size', np.zeros(0, dtype=np.int64))
+        n_frames = store.columns.get('n_frames', [])
+        self.codes = [store.columns['codes'][row, :n] for row, n in enumerate(n_frames)]
+        self.loud = [store.columns['loud'][row, :n] for row, n in enumerate(n_frames)]
+        self.postings: Dict[int, List[Tuple[int, int]]] = defaultdict(list)
+        for row, loud in enumerate(self.loud):
+            for frame in np.flatnonzero(loud):
+                self.postings[int(self.codes[row][frame])].append((row, int(frame)))
+
+    def query(self, codes: np.ndarray, loud: np.ndarray, exclude: Optional[int] = None,
+              threshold: float = DUPLICATE_BER) -> List[Tuple[float, int, int]]:
+        """(ber, row, offset) for stored files matching `codes`, best first"""
+        votes = Counter()
+        for frame in np.flatnonzero(loud):
+            for row, stored_frame in self.postings.get(int(codes[frame]), ()):
+                if row != exclude:
+                    votes[(row, int(frame) - stored_frame)] += 1
+
+        best: Dict[int, Tuple[float, int]] = {}
+        for (row, offset), count in votes.most_common():
+            if count < MIN_MATCHES:
+                break
+            if row in best:
+                continue
+            ber = bit_error_rate(codes, self.codes[row], offset)
+            if ber <= threshold:
+                best[row] = (ber, offset)
+        return sorted((ber, row, offset) for row, (ber, offset) in best.items())
+
+def version_of(key: str) -> str:
+    """Experiment version directory (public/voices_3/... -> voices_3)"""
+    parts = key.split('/')
+    return parts[1] if len(parts) > 2 and parts[0] == 'public' else parts[0]
+
+def find_duplicates(index: FingerprintIndex, threshold: float, cross_version: bool) -> List[Tuple]:
+    """Duplicate pairs (ber, key_a, key_b, kind) across the whole store"""
+    pairs = {}
+    # Exact PCM duplicates are found by digest, no fingerprint search needed
+    by_digest = defaultdict(list)
+    for row, digest in enumerate(index.digests):
+        by_digest[digest].append(row)
+    for rows in by_digest.values():
+        for i, a in enumerate(rows):
+            for b in rows[i + 1:]:
+                pairs[(a, b)] = (0.0, 'exact')
+
+    for row, codes in enumerate(index.codes):
+        for ber, other, _ in index.query(codes, index.loud[row], exclude=row, threshold=threshold):
+            pair = (min(row, other), max(row, other))
+            if pair not in pairs:
+                pairs[pair] = (ber, 'near')
+
+    results = []
+    for (a, b), (ber, kind) in pairs.items():
+        key_a, key_b = index.paths[a], index.paths[b]
+        if cross_version and version_of(key_a) == version_of(key_b):
+            continue
+        results.append((ber, key_a, key_b, kind))
+    return sorted(results)
+
+def reclaimable_bytes(pairs: List[Tuple], sizes: Dict[str, int]) -> int:
+    """Bytes freed by keeping one file of each group of exact copies"""
+    parent: Dict[str, str] = {}
+
+    def find(key: str) -> str:
+        parent.setdefault(key, key)
+        while parent[key] != key:
+            parent[key] = parent[parent[key]]
+            key = parent[key]
+        return key
+
+    for _, key_a, key_b, kind in pairs:
+        if kind == 'exact':
+            parent[find(key_a)] = find(key_b)
+    groups: Dict[str, List[int]] = {}
+    for key in parent:
+        groups.setdefault(find(key), []).append(sizes[key])
+    return sum(sum(members) - max(members) for members in groups.values())
+
+def main():
+    parser = argparse.ArgumentParser(description='Audio fingerprint index for duplicate detection')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    build = subparsers.add_parser('build', help='Fingerprint new or changed files')
+    build.add_argument('--roots', type=Path, nargs='+', default=CORPUS_DIRS)
+    build.add_argument('--workers', type=int)
+    build.add_argument('--rebuild', action='store_true')
+
+    duplicates = subparsers.add_parser('duplicates', help='List duplicate and near-duplicate pairs')
+    duplicates.add_argument('--threshold', type=float, default=DUPLICATE_BER, help='Maximum bit error rate')
+    duplicates.add_argument('--cross-version', action='store_true', help='Only pairs from different versions')
+
+    query = subparsers.add_parser('query', help='Nearest stored files for a WAV')
+    query.add_argument('wav', type=Path)
+    query.add_argument('--threshold', type=float, default=0.35)
+
+    compare = subparsers.add_parser('compare', help='Check that a regenerated file differs from its predecessor')
+    compare.add_argument('old', type=Path)
+    compare.add_argument('new', type=Path)
+
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        counts = update_store(FINGERPRINT_STORE, fingerprint_file, args.roots, args.workers, args.rebuild)
+        print(f"✅ Fingerprint store: {FINGERPRINT_STORE} (updated {counts['updated']}, total {counts['total']})")
+        return
+
+    if args.command == 'compare':
+        old, new = fingerprint_file(str(args.old.resolve())), fingerprint_file(str(args.new.resolve()))
+        if old['pcm_sha1'] == new['pcm_sha1']:
+            print(f"❌ Identical PCM: {args.new} is the same audio as {args.old}")
+            sys.exit(1)
+        a, b = old['codes'][:old['n_frames']], new['codes'][:new['n_frames']]
+        ber = min(bit_error_rate(a, b, offset) for offset in range(-10, 11))
+        if ber <= DUPLICATE_BER:
+            print(f"❌ Near-duplicate (BER {ber:.3f}): regeneration likely returned cached audio")
+            sys.exit(1)
+        print(f"✅ Different audio (BER {ber:.3f})")
+        return
+
+    store = ColumnStore(FINGERPRINT_STORE)
+    if not len(store):
+        print("❌ Fingerprint store is empty, run: python fingerprint_index.py build")
+        sys.exit(1)
+    index = FingerprintIndex(store)
+
+    if args.command == 'query':
+        key = corpus_key(args.wav)
+        row = fingerprint_file(str(args.wav.resolve()))
+        codes, loud = row['codes'][:row['n_frames']], row['loud'][:row['n_frames']]
+        exclude = index.paths.index(key) if key in index.paths else None
+        matches = index.query(codes, loud, exclude=exclude, threshold=args.threshold)
+        print(f"🔍 {key}: {len(matches)} match(es)")
+        for ber, other, offset in matches[:20]:
+            print(f"   BER {ber:.3f}  offset {offset * FP_HOP / FP_RATE:+.2f}s  {index.paths[other]}")
+        return
+
+    pairs = find_duplicates(index, args.threshold, args.cross_version)
+    sizes = dict(zip(index.paths, index.sizes))
+    for ber, key_a, key_b, kind in pairs:
+        print(f"{'🟰' if kind == 'exact' else '≈ '} BER {ber:.3f}  {key_a}  <->  {key_b}")
+    reclaimable = reclaimable_bytes(pairs, sizes)
+    print(f"\n📊 {len(pairs)} pair(s): {sum(kind == 'exact' for *_, kind in pairs)} exact, "
+          f"{sum(kind == 'near' for *_, kind in pairs)} near-duplicate")
+    print(f"   Reclaimable by deduplicating exact copies: {reclaimable / 1024 / 1024:.1f} MB")
+
+if __name__ == "__main__":
+    main()
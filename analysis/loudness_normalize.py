@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+Loudness-normalized serving renditions
+Measures integrated loudness (BS.1770) for every file in a served directory and
+writes a copy gained to a target LUFS, with the gain reduced where needed so the
+peak stays under the ceiling. Renditions keep the source's channels and sample
+width and are named by PCM content hash, so an unchanged file is never re-rendered
+and identical audio is rendered once:
+
+  <dir>/.normalized/<target>/<sha1>_<channels>ch<bits>.wav
+  <dir>/.normalized/<target>/manifest.json     filename -> sha1, lufs, gain_db, limited
+
+Experiments opt in with `normalize_lufs` in config/experiments.yaml (null: not
+normalized, unless --target is given). The webapp serves the renditions at the
+normalize_lufs of its SERVE_EXPERIMENT, so render its voices directory for that
+experiment (--experiment with --roots).
+
+Usage:
+  python loudness_normalize.py --experiment voices_3
+  python loudness_normalize.py --experiment voices_3 --roots ../tts-qa-system/data/voices   # webapp voices
+  python loudness_normalize.py --roots ../tts-qa-system/data/voices --target -23
+"""
+
+import argparse
+import json
+import os
+import wave
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+import yaml
+
+from audio_corpus import (
+    FULL_SCALE, REPO_ROOT, integer_pcm, integrated_loudness, iter_corpus_files, load_pcm, parallel_map, pcm_digest,
+    raw_pcm,
+)
+
+EXPERIMENTS_CONFIG = REPO_ROOT / 'tts-qa-system' / 'config' / 'experiments.yaml'
+DEFAULT_TARGET = -23.0
+PEAK_CEILING_DB = -1.0
+
+def rendition_dir(root: Path, target: float) -> Path:
+    return Path(root) / '.normalized' / f"{target:g}"
+
+def source_pcm(path: Path):
+    """(float32 (frames, channels) in [-1, 1], sample width to write) of a corpus file"""
+    samples, width = raw_pcm(path)
+    ints = integer_pcm(samples)
+    if np.issubdtype(ints.dtype, np.floating):
+        # Float WAVs are rendered as 16-bit PCM (the wave module only writes integer PCM)
+        return np.asarray(ints, dtype=np.float32), 2
+    return ints.astype(np.float32) / FULL_SCALE[width], width
+
+def write_pcm(path: Path, audio: np.ndarray, sample_rate: int, width: int):
+    """Quantize (frames, channels) floats to width-byte PCM and write a WAV atomically"""
+    full = 1 << (8 * width - 1)
+    ints = np.clip(np.round(audio.astype(np.float64) * full), -full, full - 1).astype(np.int64)
+    if width == 1:
+        data = (ints + 128).astype('u1').tobytes()
+    elif width == 3:
+        data = ints.astype('<i4').view('u1').reshape(-1, 4)[:, :3].tobytes()
+    else:
+        data = ints.astype({2: '<i2', 4: '<i4'}[width]).tobytes()
+    tmp_path = path.with_suffix('.tmp')
+    with wave.open(str(tmp_path), 'wb') as wav:
+        wav.setnchannels(audio.shape[1])
+        wav.setsampwidth(width)
+        wav.setframerate(sample_rate)
+        wav.writeframes(data)
+    os.replace(tmp_path, path)
+
+def normalize_file(task) -> Dict:
+    """Measure one file and write its rendition if missing (top-level so the process pool can pickle it)"""
+    path, out_dir, target, known = task
+    path = Path(path)
+    digest = pcm_digest(path)
+    audio, width = source_pcm(path)
+    rendition = Path(out_dir) / f"{digest}_{audio.shape[1]}ch{8 * width}.wav"
+    if known and known.get('sha1') == digest and known.get('rendition') == rendition.name and rendition.exists():
+        return dict(known, rendered=False)
+
+    samples, sample_rate = load_pcm(path)
+    lufs = integrated_loudness(samples, sample_rate)
+    # Limit on the loudest channel, not the mono mix used for loudness
+    peak = float(np.max(np.abs(audio))) if audio.size else 0.0
+
+    gain_db = target - lufs if np.isfinite(lufs) else 0.0
+    ceiling = 10 ** (PEAK_CEILING_DB / 20)
+    limited = peak > 0 and peak * 10 ** (gain_db / 20) > ceiling
+    if limited:
+        gain_db = 20 * np.log10(ceiling / peak)
+
+    rendered = False
+    if not rendition.exists():
+        write_pcm(rendition, audio * 10 ** (gain_db / 20), sample_rate, width)
+        rendered = True
+
+    return {
+        'sha1': digest,
+        'lufs': round(lufs, 2) if np.isfinite(lufs) else None,
+        'gain_db': round(float(gain_db), 2),
+        'limited': bool(limited),
+        'rendition': rendition.name,
+        'rendered': rendered,
+    }
+
+def normalize_directory(root: Path, target: float, workers: Optional[int] = None) -> Dict:
+    out_dir = rendition_dir(root, target)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    manifest_path = out_dir / 'manifest.json'
+    manifest = {'target_lufs': target, 'files': {}}
+    if manifest_path.exists():
+        with open(manifest_path, 'r') as f:
+            manifest = json.load(f)
+
+    files = iter_corpus_files([root])
+    names = [path.relative_to(root).as_posix() for path in files]
+    tasks = [(str(path), str(out_dir), target, manifest['files'].get(name)) for path, name in zip(files, names)]
+    results = parallel_map(normalize_file, tasks, workers)
+
+    manifest['files'] = {name: {k: v for k, v in result.items() if k != 'rendered'}
+                         for name, result in zip(names, results)}
+    tmp_path = manifest_path.with_suffix('.tmp')
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, indent=1)
+    os.replace(tmp_path, manifest_path)
+
+    # Renditions no longer referenced by any file
+    referenced = {entry['rendition'] for entry in manifest['files'].values()}
+    for stale in out_dir.glob('*.wav'):
+        if stale.name not in referenced:
+            stale.unlink()
+
+    return {'files': len(results), 'rendered': sum(r['rendered'] for r in results),
+            'limited': sum(r['limited'] for r in results), 'results': results}
+
+def experiment_targets(names: List[str], override: Optional[float] = None,
+                       roots: Optional[List[Path]] = None) -> List[tuple]:
+    """(directory, target) for experiments, their output_dir unless roots are given;
+    without override, normalize_lufs: null skips one"""
+    with open(EXPERIMENTS_CONFIG, 'r') as f:
+        config = yaml.safe_load(f)
+    targets = []
+    for name in names:
+        experiment = {**config.get('defaults', {}), **config['experiments'][name]}
+        target = override if override is not None else experiment.get('normalize_lufs')
+        if target is None:
+            print(f"⏭️  {name}: normalize_lufs is null, keeping original levels (pass --target to render anyway)")
+            continue
+        targets += [(Path(root), float(target)) for root in roots or [REPO_ROOT / experiment['output_dir']]]
+    return targets
+
+def main():
+    parser = argparse.ArgumentParser(description='Precompute loudness-normalized serving renditions')
+    parser.add_argument('--experiment', nargs='+', help='Experiments from config/experiments.yaml')
+    parser.add_argument('--roots', type=Path, nargs='+',
+                        help="Served directories to normalize (with --experiment: instead of its output_dir)")
+    parser.add_argument('--target', type=float, help=f'Target integrated loudness in LUFS (default {DEFAULT_TARGET:g})')
+    parser.add_argument('--workers', type=int, help='Worker processes (default: CPU count)')
+
+    args = parser.parse_args()
+
+    if args.experiment:
+        if args.roots and len(args.experiment) > 1:
+            parser.error('--roots takes a single --experiment')
+        jobs = experiment_targets(args.experiment, args.target, args.roots)
+    elif args.roots:
+        jobs = [(root, args.target if args.target is not None else DEFAULT_TARGET) for root in args.roots]
+    else:
+        parser.error('give --experiment or --roots')
+
+    for root, target in jobs:
+        print(f"🔊 Normalizing {root} to {target:g} LUFS")
+        summary = normalize_directory(root, target, args.workers)
+        lufs = np.array([r['lufs'] for r in summary['results'] if r['lufs'] is not None])
+        print(f"✅ {summary['files']} file(s), {summary['rendered']} rendered, "
+              f"{summary['limited']} peak-limited -> {rendition_dir(root, target)}")
+        if len(lufs):
+            print(f"   Source loudness: {lufs.min():.1f} .. {lufs.max():.1f} LUFS "
+                  f"(spread {lufs.max() - lufs.min():.1f} dB, median {np.median(lufs):.1f})")
+
+if __name__ == "__main__":
+    main()
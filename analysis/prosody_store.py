@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""
+Prosody store: F0, energy dynamics and speaking rate for every corpus file
+F0 is tracked with a vectorized YIN (FFT autocorrelation over all frames at once,
+cumulative-mean-normalized difference, absolute threshold). Results are kept in
+corpus_store/prosody.npz next to the feature store and updated incrementally.
+
+Usage:
+  python prosody_store.py                                # update store + emotion x scale summary
+  python prosody_store.py --roots ../public/voices_3 --plot prosody_vs_scale.png
+"""
+
+import argparse
+import re
+from pathlib import Path
+from typing import Dict, Tuple
+
+import numpy as np
+from scipy.signal import resample_poly
+
+from audio_corpus import (
+    CORPUS_DIRS, SILENCE_DB, STORE_DIR, ColumnStore, frame_signal, load_pcm, resolve_key, update_store,
+)
+
+PROSODY_STORE = STORE_DIR / 'prosody.npz'
+
+# YIN runs at 16 kHz with a 30ms integration window every 10ms, searching 60-500 Hz
+ANALYSIS_RATE = 16000
+WINDOW = 480
+HOP = 160
+F0_MIN = 60.0
+F0_MAX = 500.0
+YIN_THRESHOLD = 0.15
+
+SAMPLE_PATTERN = re.compile(r"^(?P<voice>v\d+)_(?P<emotion>[a-z]+)_(?P<text_type>match|neutral|opposite)"
+                            r"_scale_(?P<scale>[\d.]+)$")
+
+def yin_f0(samples: np.ndarray, sample_rate: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Per-frame F0 in Hz (0 where unvoiced) and frame level in dBFS"""
+    if sample_rate != ANALYSIS_RATE:
+        divisor = np.gcd(sample_rate, ANALYSIS_RATE)
+        samples = resample_poly(samples, ANALYSIS_RATE // divisor, sample_rate // divisor)
+    min_lag = int(ANALYSIS_RATE / F0_MAX)
+    max_lag = int(ANALYSIS_RATE / F0_MIN)
+    frames = frame_signal(samples.astype(np.float64), WINDOW + max_lag + 1, HOP)
+
+    # YIN difference d(tau) = sum_j (x_j - x_{j+tau})^2 over a fixed WINDOW, for all frames at once:
+    # energy of x[0:W] + energy of x[tau:tau+W] - 2 * cross-correlation (via FFT)
+    size = 1 << (2 * frames.shape[1] - 1).bit_length()
+    cross = np.fft.irfft(np.conj(np.fft.rfft(frames[:, :WINDOW], size)) * np.fft.rfft(frames, size),
+                         size)[:, :max_lag + 1]
+    power = np.concatenate([np.zeros((len(frames), 1)), np.cumsum(frames ** 2, axis=1)], axis=1)
+    shifted_energy = power[:, WINDOW:WINDOW + max_lag + 1] - power[:, :max_lag + 1]
+    diff = np.maximum(shifted_energy[:, :1] + shifted_energy - 2 * cross, 0)
+    diff[:, 0] = 0
+
+    # Cumulative mean normalized difference
+    lags = np.arange(diff.shape[1])
+    cumulative = np.cumsum(diff, axis=1)
+    cmnd = np.ones_like(diff)
+    np.divide(diff[:, 1:] * lags[1:], cumulative[:, 1:], out=cmnd[:, 1:], where=cumulative[:, 1:] > 1e-12)
+
+    search = cmnd[:, min_lag:max_lag + 1]
+    below = search < YIN_THRESHOLD
+    first = np.argmax(below, axis=1)
+    # Walk from the first dip under the threshold to its local minimum
+    window = np.minimum(first[:, None] + np.arange(min_lag)[None, :], search.shape[1] - 1)
+    best = np.take_along_axis(window, np.argmin(np.take_along_axis(search, window, axis=1), axis=1)[:, None], 1)[:, 0]
+
+    # Parabolic interpolation around the chosen lag
+    tau = best + min_lag
+    left = cmnd[np.arange(len(tau)), np.maximum(tau - 1, 1)]
+    centre = cmnd[np.arange(len(tau)), tau]
+    right = cmnd[np.arange(len(tau)), np.minimum(tau + 1, cmnd.shape[1] - 1)]
+    denominator = left - 2 * centre + right
+    shift = np.zeros_like(denominator)
+    np.divide(0.5 * (left - right), denominator, out=shift, where=np.abs(denominator) > 1e-12)
+    period = tau + np.clip(shift, -1, 1)
+
+    level = 10 * np.log10(np.maximum(np.mean(frames[:, :WINDOW] ** 2, axis=1), 1e-20))
+    voiced = below.any(axis=1) & (level > SILENCE_DB + 10)
+    return np.where(voiced, ANALYSIS_RATE / period, 0.0), level
+
+def syllable_count(level: np.ndarray, speech: np.ndarray) -> int:
+    """Energy-envelope peaks (>= 3 dB above the preceding dip) inside speech, ~ syllable nuclei"""
+    envelope = np.convolve(level, np.ones(5) / 5, mode='same')
+    envelope = np.where(speech, envelope, envelope.min())
+    peaks = np.flatnonzero((envelope[1:-1] > envelope[:-2]) & (envelope[1:-1] >= envelope[2:])) + 1
+    count, previous = 0, 0
+    for peak in peaks:
+        if speech[peak] and envelope[peak] - envelope[previous:peak + 1].min() >= 3.0:
+            count += 1
+            previous = peak
+    return count
+
+F0_COLUMNS = ('f0_mean', 'f0_median', 'f0_std', 'f0_range_st', 'f0_var_st')
+
+def extract_prosody(key: str) -> Dict:
+    """Prosody row for one corpus file (top-level so the process pool can pickle it)"""
+    samples, sample_rate = load_pcm(resolve_key(key))
+    f0, level = yin_f0(samples, sample_rate)
+    speech = level > SILENCE_DB
+    voiced_f0 = f0[f0 > 0]
+
+    if len(voiced_f0) >= 3:
+        semitones = 12 * np.log2(voiced_f0 / np.median(voiced_f0))
+        f0_stats = {
+            'f0_mean': float(voiced_f0.mean()),
+            'f0_median': float(np.median(voiced_f0)),
+            'f0_std': float(voiced_f0.std()),
+            'f0_range_st': float(np.percentile(semitones, 95) - np.percentile(semitones, 5)),
+            'f0_var_st': float(semitones.var()),
+        }
+    else:
+        # Too little voicing to measure pitch: NaN, so per-group means skip the file
+        f0_stats = {name: np.nan for name in F0_COLUMNS}
+
+    speech_levels = level[speech]
+    speech_seconds = speech.sum() * HOP / ANALYSIS_RATE
+    frame_step = np.abs(np.diff(speech_levels)) if len(speech_levels) > 1 else np.zeros(1)
+    return {
+        **f0_stats,
+        'voiced_ratio': float((f0 > 0).sum() / max(speech.sum(), 1)),
+        'energy_mean_db': float(speech_levels.mean()) if len(speech_levels) else SILENCE_DB,
+        'energy_std_db': float(speech_levels.std()) if len(speech_levels) else 0.0,
+        'energy_range_db': float(np.percentile(speech_levels, 95) - np.percentile(speech_levels, 5))
+        if len(speech_levels) else 0.0,
+        'energy_flux_db': float(frame_step.mean()),
+        'speech_seconds': float(speech_seconds),
+        'syllables_per_second': syllable_count(level, speech) / speech_seconds if speech_seconds else 0.0,
+    }
+
+def load_prosody():
+    """Prosody store as a DataFrame with voice/emotion/text_type/scale parsed from the filename"""
+    df = ColumnStore(PROSODY_STORE).to_dataframe()
+    # Rows stored before unvoiced files got NaN have f0_mean == 0 (never a measured pitch)
+    df.loc[df['f0_mean'] == 0, list(F0_COLUMNS)] = np.nan
+    parsed = df['path'].str.rsplit('/', n=1).str[-1].str.removesuffix('.wav').str.extract(SAMPLE_PATTERN)
+    parsed['scale'] = parsed['scale'].astype(float)
+    df['version'] = df['path'].str.split('/').str[1]
+    df['expressivity'] = df['path'].str.extract(r'expressivity_([^/]+)')[0]
+    return df.join(parsed)
+
+def plot_scale_response(df, output: Path):
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+
+    metrics = [('f0_range_st', 'F0 range (semitones)'), ('f0_mean', 'Mean F0 (Hz)'),
+               ('energy_range_db', 'Energy range (dB)'), ('syllables_per_second', 'Syllables / s')]
+    fig, axes = plt.subplots(1, len(metrics), figsize=(5 * len(metrics), 4))
+    for ax, (column, label) in zip(axes, metrics):
+        for emotion, group in df.groupby('emotion'):
+            means = group.groupby('scale')[column].mean()
+            ax.plot(means.index, means.values, marker='o', label=emotion)
+        ax.set_xlabel('emotion_scale')
+        ax.set_title(label)
+        ax.grid(alpha=0.3)
+    axes[0].legend(fontsize=8)
+    plt.tight_layout()
+    plt.savefig(output, dpi=120)
+    print(f"📈 Saved: {output}")
+
+def main():
+    parser = argparse.ArgumentParser(description='Build or update the prosody store')
+    parser.add_argument('--roots', type=Path, nargs='+', default=CORPUS_DIRS, help='Directories to scan for WAVs')
+    parser.add_argument('--workers', type=int, help='Worker processes (default: CPU count)')
+    parser.add_argument('--rebuild', action='store_true', help='Recompute every file')
+    parser.add_argument('--plot', type=Path, help='Save prosody-vs-scale plots per emotion')
+
+    args = parser.parse_args()
+
+    counts = update_store(PROSODY_STORE, extract_prosody, args.roots, args.workers, args.rebuild)
+    print(f"✅ Prosody store: {PROSODY_STORE} (updated {counts['updated']}, total {counts['total']})")
+
+    df = load_prosody()
+    scaled = df.dropna(subset=['scale'])
+    if len(scaled):
+        summary = scaled.groupby(['emotion', 'scale'])[['f0_mean', 'f0_range_st', 'energy_range_db',
+                                                        'syllables_per_second']].mean()
+        print("\n📊 Prosody by emotion and scale:")
+        print(summary.round(2).to_string())
+        if args.plot:
+            plot_scale_response(scaled, args.plot)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+"""
+Objective comparison of API quality tiers (hd1 / high / standard / low)
+For every utterance downloaded in more than one tier, measures sample rate, bit
+depth (declared and effective), effective bandwidth, and log-spectral distance and
+SNR against the hd1 rendition, then gives a per-tier verdict and the cheapest tier
+that is perceptually equivalent.
+
+Tier files are grouped by name: <stem>_<tier>.wav, <stem>-<tier>.wav or <tier>/<stem>.wav
+(e.g. quality_test/test_hd1.wav, quality_test/test_low.wav).
+
+Usage:
+  python quality_tiers.py                       # quality_test/ + corpus
+  python quality_tiers.py --roots ../quality_test --csv tier_report.csv
+"""
+
+import argparse
+import re
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from scipy.signal import resample_poly
+
+from audio_corpus import (
+    CORPUS_DIRS, REPO_ROOT, audio_source, corpus_key, frame_signal, iter_corpus_files,
+    load_pcm, parallel_map, raw_pcm, resolve_key,
+)
+
+TIERS = ['hd1', 'high', 'standard', 'low']
+REFERENCE_TIER = 'hd1'
+DEFAULT_ROOTS = [REPO_ROOT / 'quality_test'] + CORPUS_DIRS
+
+TIER_PATTERN = re.compile(rf"^(?P<stem>.+?)[_-](?P<tier>{'|'.join(TIERS)})$")
+
+# Verdict thresholds relative to hd1
+EQUIVALENT_LSD = 1.0       # dB
+EQUIVALENT_SNR = 25.0      # dB
+EQUIVALENT_BANDWIDTH = 0.9  # fraction of the hd1 bandwidth
+DEGRADED_LSD = 2.5
+
+N_FFT = 1024
+
+def tier_of(path: Path) -> Optional[Tuple[str, str]]:
+    """(group stem, tier) for a tier file, None for ordinary corpus files"""
+    match = TIER_PATTERN.match(path.stem)
+    if match:
+        return f"{path.parent.as_posix()}/{match['stem']}", match['tier']
+    if path.parent.name in TIERS:
+        return f"{path.parent.parent.as_posix()}/{path.stem}", path.parent.name
+    return None
+
+def find_tier_groups(roots) -> Dict[str, Dict[str, str]]:
+    """Utterances present in at least two tiers, including hd1"""
+    groups = defaultdict(dict)
+    for path in iter_corpus_files(roots):
+        found = tier_of(path)
+        if found:
+            stem, tier = found
+            groups[corpus_key(Path(stem))][tier] = corpus_key(path)
+    return {stem: tiers for stem, tiers in groups.items() if REFERENCE_TIER in tiers and len(tiers) > 1}
+
+def effective_bits(path: Path) -> int:
+    """Declared bit depth minus LSBs that are zero in every sample (padded low-resolution audio)"""
+    samples, width = raw_pcm(path)
+    bits = width * 8
+    if width not in (2, 4) or samples.dtype.kind != 'i':
+        return bits
+    samples = samples.ravel()
+    combined = int(np.bitwise_or.reduce(samples.astype(np.int64) & ((1 << bits) - 1))) if len(samples) else 0
+    if combined == 0:
+        return 0
+    return bits - ((combined & -combined).bit_length() - 1)
+
+def average_spectrum_db(samples: np.ndarray) -> np.ndarray:
+    frames = frame_signal(samples, N_FFT, N_FFT // 2) * np.hanning(N_FFT).astype(np.float32)
+    power = (np.abs(np.fft.rfft(frames, axis=1)) ** 2).mean(axis=0)
+    return 10 * np.log10(np.maximum(power, 1e-20))
+
+def effective_bandwidth(samples: np.ndarray, sample_rate: int, floor_db: float = 50.0) -> float:
+    """Highest frequency whose long-term level is within `floor_db` of the spectral peak"""
+    spectrum = average_spectrum_db(samples)
+    above = np.flatnonzero(spectrum > spectrum.max() - floor_db)
+    return float(above[-1] * sample_rate / N_FFT) if len(above) else 0.0
+
+def align(reference: np.ndarray, test: np.ndarray, max_lag: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Shift `test` by the cross-correlation peak (within ±max_lag) and trim both to a common length"""
+    n = len(reference) + len(test)
+    size = 1 << (n - 1).bit_length()
+    corr = np.fft.irfft(np.fft.rfft(reference, size) * np.conj(np.fft.rfft(test, size)), size)
+    lags = np.concatenate([corr[:max_lag + 1], corr[-max_lag:]]) if max_lag else corr[:1]
+    lag = int(np.argmax(lags))
+    lag = lag if lag <= max_lag else lag - len(lags)
+    if lag > 0:
+        reference = reference[lag:]
+    elif lag < 0:
+        test = test[-lag:]
+    length = min(len(reference), len(test))
+    return reference[:length], test[:length]
+
+def log_spectral_distance(reference: np.ndarray, test: np.ndarray, sample_rate: int,
+                          max_freq: float) -> float:
+    """Mean over frames of the RMS dB difference between power spectra below `max_freq`
+
+    Restricting to the band both renditions can carry keeps LSD about distortion;
+    the missing top band is reported separately as bandwidth.
+    """
+    bins = int(max_freq / sample_rate * N_FFT) + 1
+    spectra = []
+    for signal in (reference, test):
+        frames = frame_signal(signal, N_FFT, N_FFT // 2) * np.hanning(N_FFT)
+        spectra.append(10 * np.log10(np.abs(np.fft.rfft(frames, axis=1)[:, :bins]) ** 2 + 1e-12))
+    ref_db, test_db = spectra
+    # Floor both at 80 dB below the reference peak and ignore frames silent in the reference
+    floor = ref_db.max() - 80
+    ref_db, test_db = np.maximum(ref_db, floor), np.maximum(test_db, floor)
+    active = ref_db.max(axis=1) > ref_db.max() - 60
+    return float(np.sqrt(((ref_db - test_db)[active] ** 2).mean(axis=1)).mean())
+
+def snr_db(reference: np.ndarray, test: np.ndarray) -> float:
+    """SNR after least-squares gain matching, so level differences are not counted as noise"""
+    gain = np.dot(reference, test) / max(np.dot(test, test), 1e-20)
+    noise = reference - gain * test
+    return float(10 * np.log10(max(np.dot(reference, reference), 1e-20) / max(np.dot(noise, noise), 1e-20)))
+
+def verdict(row: Dict) -> str:
+    if row['tier'] == REFERENCE_TIER:
+        return 'reference'
+    if (row['lsd_db'] <= EQUIVALENT_LSD and row['snr_db'] >= EQUIVALENT_SNR
+            and row['bandwidth_hz'] >= EQUIVALENT_BANDWIDTH * row['reference_bandwidth_hz']):
+        return 'equivalent'
+    if row['lsd_db'] <= DEGRADED_LSD:
+        return 'near'
+    return 'degraded'
+
+def analyze_group(group: Tuple[str, Dict[str, str]]) -> List[Dict]:
+    """Metrics for every tier of one utterance (top-level so the process pool can pickle it)"""
+    stem, tiers = group
+    reference_path = resolve_key(tiers[REFERENCE_TIER])
+    reference, reference_rate = load_pcm(reference_path)
+    reference_bandwidth = effective_bandwidth(reference, reference_rate)
+
+    rows = []
+    for tier in TIERS:
+        if tier not in tiers:
+            continue
+        path = resolve_key(tiers[tier])
+        samples, rate = load_pcm(path)
+        row = {
+            'utterance': stem,
+            'tier': tier,
+            'bytes': audio_source(path).stat().st_size,
+            'sample_rate': rate,
+            'bit_depth': raw_pcm(path)[1] * 8,
+            'effective_bits': effective_bits(path),
+            'duration': len(samples) / rate,
+            'bandwidth_hz': effective_bandwidth(samples, rate),
+            'reference_bandwidth_hz': reference_bandwidth,
+        }
+
+        if tier == REFERENCE_TIER:
+            row.update(lsd_db=0.0, snr_db=np.inf, verdict='reference')
+            rows.append(row)
+            continue
+
+        # Compare on the hd1 time base
+        if rate != reference_rate:
+            divisor = np.gcd(rate, reference_rate)
+            samples = resample_poly(samples, reference_rate // divisor, rate // divisor).astype(np.float32)
+        ref_aligned, test_aligned = align(reference.astype(np.float64), samples.astype(np.float64),
+                                          int(0.05 * reference_rate))
+        row['lsd_db'] = log_spectral_distance(ref_aligned, test_aligned, reference_rate,
+                                              min(rate, reference_rate) / 2 * 0.95)
+        row['snr_db'] = snr_db(ref_aligned, test_aligned)
+        row['verdict'] = verdict(row)
+        rows.append(row)
+    return rows
+
+def print_report(df):
+    print("\n📊 Per-utterance tiers:")
+    columns = ['utterance', 'tier', 'bytes', 'sample_rate', 'bit_depth', 'effective_bits',
+               'bandwidth_hz', 'lsd_db', 'snr_db', 'verdict']
+    print(df[columns].round(2).to_string(index=False))
+
+    summary = df.groupby('tier').agg(
+        utterances=('utterance', 'count'),
+        mean_bytes=('bytes', 'mean'),
+        sample_rate=('sample_rate', 'median'),
+        bandwidth_hz=('bandwidth_hz', 'median'),
+        lsd_db=('lsd_db', 'mean'),
+        snr_db=('snr_db', 'mean'),
+        equivalent=('verdict', lambda v: float(np.mean(np.isin(v, ['reference', 'equivalent'])))),
+    ).reindex([tier for tier in TIERS if tier in set(df['tier'])])
+    print("\n📋 Tier summary (vs hd1):")
+    print(summary.round(2).to_string())
+
+    # Cheapest tier that every compared utterance rated equivalent
+    eligible = summary[(summary['equivalent'] == 1.0) & (summary.index != REFERENCE_TIER)]
+    if len(eligible):
+        cheapest = eligible['mean_bytes'].idxmin()
+        saving = 1 - eligible.loc[cheapest, 'mean_bytes'] / summary.loc[REFERENCE_TIER, 'mean_bytes']
+        print(f"\n✅ Cheapest equivalent tier: {cheapest} ({saving:.0%} smaller than {REFERENCE_TIER})")
+    else:
+        print(f"\n⚠️  No cheaper tier is equivalent to {REFERENCE_TIER} on every utterance")
+
+def main():
+    import pandas as pd
+
+    parser = argparse.ArgumentParser(description='Compare hd1/high/standard/low renditions of the same utterances')
+    parser.add_argument('--roots', type=Path, nargs='+', default=DEFAULT_ROOTS, help='Directories to scan for tier files')
+    parser.add_argument('--workers', type=int, help='Worker processes (default: CPU count)')
+    parser.add_argument('--csv', type=Path, help='Write per-tier rows to this CSV')
+
+    args = parser.parse_args()
+
+    groups = find_tier_groups([root for root in args.roots if Path(root).exists()])
+    if not groups:
+        print("❌ No utterances with an hd1 file and at least one other tier found")
+        return
+    print(f"🔍 Comparing {len(groups)} utterance(s) with multiple tiers")
+
+    results = parallel_map(analyze_group, sorted(groups.items()), args.workers, label='utterances')
+    df = pd.DataFrame([row for rows in results for row in rows])
+    print_report(df)
+
+    if args.csv:
+        df.to_csv(args.csv, index=False)
+        print(f"\n💾 Saved: {args.csv}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+Speaker-similarity embeddings for reference-vs-target comparison
+Every file gets an MFCC-statistics embedding (mean and std of c1..c19 over speech
+frames, 38 dims), stored in corpus_store/speakers.npz. EmbeddingIndex standardizes
+the embeddings across the corpus and answers cosine-similarity queries with one
+matrix product; pair similarity for every target and its reference is written to
+corpus_store/pair_similarity.csv and can be joined onto evaluation rows.
+
+Usage:
+  python speaker_embeddings.py                     # update store, pair table, correlation with ratings
+  python speaker_embeddings.py --nearest ../public/voices_3/expressivity_0.6/v001_sad_match_reference.wav
+"""
+
+import argparse
+from pathlib import Path
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+from scipy.fft import dct
+from scipy.signal import resample_poly
+
+from audio_corpus import (
+    CORPUS_DIRS, EVALUATIONS_CSV, SILENCE_DB, STORE_DIR, ColumnStore, corpus_key, frame_signal,
+    load_evaluations, load_pcm, resolve_key, update_store,
+)
+
+SPEAKER_STORE = STORE_DIR / 'speakers.npz'
+PAIR_TABLE = STORE_DIR / 'pair_similarity.csv'
+
+ANALYSIS_RATE = 16000
+FRAME = 400   # 25ms
+HOP = 160     # 10ms
+N_FFT = 512
+N_MELS = 40
+N_MFCC = 20
+
+def mel_filterbank(sample_rate: int = ANALYSIS_RATE, n_fft: int = N_FFT, n_mels: int = N_MELS) -> np.ndarray:
+    """Triangular mel filters, shape (n_mels, n_fft // 2 + 1)"""
+    def to_mel(hz):
+        return 2595 * np.log10(1 + hz / 700)
+
+    def to_hz(mel):
+        return 700 * (10 ** (mel / 2595) - 1)
+
+    edges = to_hz(np.linspace(to_mel(20), to_mel(sample_rate / 2), n_mels + 2))
+    freqs = np.fft.rfftfreq(n_fft, 1.0 / sample_rate)
+    lower, centre, upper = edges[:-2, None], edges[1:-1, None], edges[2:, None]
+    rising = (freqs[None, :] - lower) / (centre - lower)
+    falling = (upper - freqs[None, :]) / (upper - centre)
+    return np.maximum(0, np.minimum(rising, falling))
+
+MEL_FILTERS = mel_filterbank()
+
+def mfcc(samples: np.ndarray, sample_rate: int) -> Tuple[np.ndarray, np.ndarray]:
+    """MFCCs (frames, N_MFCC) and a mask of speech frames"""
+    if sample_rate != ANALYSIS_RATE:
+        divisor = np.gcd(sample_rate, ANALYSIS_RATE)
+        samples = resample_poly(samples, ANALYSIS_RATE // divisor, sample_rate // divisor)
+    samples = np.append(samples[0], samples[1:] - 0.97 * samples[:-1])
+    frames = frame_signal(samples.astype(np.float32), FRAME, HOP) * np.hamming(FRAME).astype(np.float32)
+    power = np.abs(np.fft.rfft(frames, N_FFT, axis=1)) ** 2
+    log_mel = np.log(np.maximum(power @ MEL_FILTERS.T, 1e-10))
+    level = 10 * np.log10(np.maximum(np.mean(frames.astype(np.float64) ** 2, axis=1), 1e-20))
+    return dct(log_mel, type=2, norm='ortho', axis=1)[:, :N_MFCC], level > SILENCE_DB
+
+def extract_embedding(key: str) -> Dict:
+    """Embedding row for one corpus file (top-level so the process pool can pickle it)"""
+    samples, sample_rate = load_pcm(resolve_key(key))
+    coefficients, speech = mfcc(samples, sample_rate)
+    if speech.sum() >= 10:
+        coefficients = coefficients[speech]
+    # c0 is overall level, not voice identity
+    coefficients = coefficients[:, 1:]
+    return {
+        'embedding': np.concatenate([coefficients.mean(axis=0), coefficients.std(axis=0)]).astype(np.float32),
+        'speech_frames': int(speech.sum()),
+    }
+
+def reference_key(key: str) -> str:
+    """Reference recording for a target: <stem>_scale_<x>.wav -> <stem>_reference.wav"""
+    if '_scale_' not in key:
+        return ''
+    return f"{key.rsplit('_scale_', 1)[0]}_reference.wav"
+
+class EmbeddingIndex:
+    """Standardized, L2-normalized embedding matrix with cosine-similarity lookup"""
+
+    def __init__(self, store: ColumnStore):
+        self.paths = list(store.columns.get('path', []))
+        self.rows = {path: i for i, path in enumerate(self.paths)}
+        matrix = store.columns['embedding'].astype(np.float64)
+        # Standardize each dimension so no single coefficient dominates the cosine
+        matrix = (matrix - matrix.mean(axis=0)) / np.maximum(matrix.std(axis=0), 1e-9)
+        self.matrix = matrix / np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12)
+
+    def nearest(self, key: str, k: int = 10) -> List[Tuple[float, str]]:
+        scores = self.matrix @ self.matrix[self.rows[key]]
+        order = np.argsort(-scores)
+        return [(float(scores[i]), self.paths[i]) for i in order if self.paths[i] != key][:k]
+
+    def pair_similarity(self, keys_a: Sequence[str], keys_b: Sequence[str]) -> np.ndarray:
+        """Row-wise cosine similarity; NaN where either file is not in the store"""
+        # intp so an empty query still indexes the matrix
+        a = np.array([self.rows.get(key, -1) for key in keys_a], dtype=np.intp)
+        b = np.array([self.rows.get(key, -1) for key in keys_b], dtype=np.intp)
+        valid = (a >= 0) & (b >= 0)
+        similarity = np.full(len(a), np.nan)
+        similarity[valid] = np.einsum('ij,ij->i', self.matrix[a[valid]], self.matrix[b[valid]])
+        return similarity
+
+def build_pair_table(index: EmbeddingIndex):
+    """Speaker similarity for every target and its reference"""
+    import pandas as pd
+
+    targets = [path for path in index.paths if reference_key(path) in index.rows]
+    references = [reference_key(path) for path in targets]
+    return pd.DataFrame({
+        'target_key': targets,
+        'reference_key': references,
+        'speaker_similarity': index.pair_similarity(targets, references),
+    })
+
+def with_speaker_similarity(df, target_column: str = 'target_key', reference_column: str = 'reference_key'):
+    """Add a speaker_similarity column to any frame carrying target/reference corpus keys"""
+    index = EmbeddingIndex(ColumnStore(SPEAKER_STORE))
+    df = df.copy()
+    df['speaker_similarity'] = index.pair_similarity(df[target_column].tolist(), df[reference_column].tolist())
+    return df
+
+def main():
+    parser = argparse.ArgumentParser(description='Speaker embeddings and reference-vs-target similarity')
+    parser.add_argument('--roots', type=Path, nargs='+', default=CORPUS_DIRS, help='Directories to scan for WAVs')
+    parser.add_argument('--workers', type=int, help='Worker processes (default: CPU count)')
+    parser.add_argument('--rebuild', action='store_true', help='Recompute every file')
+    parser.add_argument('--evaluations', type=Path, default=EVALUATIONS_CSV, help='Evaluation export CSV')
+    parser.add_argument('--nearest', type=Path, help='List the most similar stored files to this one')
+
+    args = parser.parse_args()
+
+    counts = update_store(SPEAKER_STORE, extract_embedding, args.roots, args.workers, args.rebuild)
+    print(f"✅ Speaker store: {SPEAKER_STORE} (updated {counts['updated']}, total {counts['total']})")
+    index = EmbeddingIndex(ColumnStore(SPEAKER_STORE))
+
+    if args.nearest:
+        key = corpus_key(args.nearest)
+        print(f"\n🔍 Nearest speakers to {key}:")
+        for score, other in index.nearest(key):
+            print(f"   {score:6.3f}  {other}")
+        return
+
+    pairs = build_pair_table(index)
+    pairs.to_csv(PAIR_TABLE, index=False)
+    print(f"💾 {len(pairs)} target/reference pairs: {PAIR_TABLE}")
+    if pairs.empty:
+        print("⚠️  No target has a *_reference.wav in the store; nothing to compare")
+        return
+    print(f"   Mean similarity {pairs['speaker_similarity'].mean():.3f}, "
+          f"lowest 5%: < {pairs['speaker_similarity'].quantile(0.05):.3f}")
+
+    evaluations = with_speaker_similarity(load_evaluations(args.evaluations)).dropna(subset=['speaker_similarity'])
+    if len(evaluations) > 2:
+        rho = evaluations['speaker_similarity'].corr(evaluations['similarity'].astype(float), method='spearman')
+        print(f"\n📝 Spearman(speaker_similarity, human similarity) over {len(evaluations)} ratings: {rho:.3f}")
+
+if __name__ == "__main__":
+    main()
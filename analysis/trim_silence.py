@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""
+Silence-trimmed serving copies
+Finds speech onset and offset with a frame-energy VAD (20ms frames, 10ms hop, all
+frames at once) and writes a copy cut to [onset - pad, offset + pad]. The PCM is
+sliced, not re-encoded, and originals are never touched:
+
+  <dir>/.trimmed/<sha1>_<pad_ms>.wav
+  <dir>/.trimmed/manifest.json     filename -> rendition, trim offsets (served by the webapp)
+
+Trim offsets are also recorded in the corpus manifest (corpus_store/manifest.sqlite,
+table trims) so analysis can map trimmed times back to the originals.
+
+To serve trimmed and loudness-normalized audio together, trim the normalized
+renditions as well; the webapp looks the trimmed copy up through the normalized one.
+
+Usage:
+  python trim_silence.py --roots ../tts-qa-system/data/voices
+  python trim_silence.py --roots ../tts-qa-system/data/voices/.normalized/-23   # normalize_lufs: -23
+  python trim_silence.py --roots ../public/voices_3 --pad-ms 150 --csv trim_report.csv
+"""
+
+import argparse
+import json
+import os
+import time
+import wave
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from audio_corpus import (
+    SILENCE_DB, audio_source, corpus_key, frame_db, iter_corpus_files, load_pcm, parallel_map, pcm_digest,
+    read_header,
+)
+from corpus_manifest import MANIFEST_DB, connect
+from wav_reader import pcm_view, read_flac
+
+DEFAULT_PAD_MS = 100
+HOP_MS = 10
+# Speech is any frame within SPEECH_RANGE_DB of the loudest frame (and above SILENCE_DB),
+# sustained for MIN_SPEECH_FRAMES so isolated clicks do not count as an onset
+SPEECH_RANGE_DB = 40.0
+MIN_SPEECH_FRAMES = 3
+
+def speech_bounds(samples: np.ndarray, sample_rate: int) -> Optional[Tuple[int, int]]:
+    """(onset, offset) sample positions of speech, None if the file is silent"""
+    level = frame_db(samples, sample_rate, hop_ms=HOP_MS)
+    active = level > max(SILENCE_DB, level.max() - SPEECH_RANGE_DB)
+    sustained = np.convolve(active, np.ones(MIN_SPEECH_FRAMES, dtype=int), mode='valid') == MIN_SPEECH_FRAMES
+    frames = np.flatnonzero(sustained)
+    if not len(frames):
+        return None
+    hop = int(sample_rate * HOP_MS / 1000)
+    frame_length = int(sample_rate * 0.02)
+    onset = frames[0] * hop
+    offset = min(len(samples), (frames[-1] + MIN_SPEECH_FRAMES - 1) * hop + frame_length)
+    return int(onset), int(offset)
+
+def pcm_slice(path: Path, start: int, stop: int) -> Tuple[bytes, int, int, int]:
+    """Raw PCM bytes of frames [start, stop) as stored, with channels, width and sample rate"""
+    source = audio_source(path)
+    if source.suffix == '.flac':
+        samples, sample_rate, width = read_flac(source)
+        samples = samples[start:stop]
+        if width == 3:
+            data = samples.astype('<i4').view('u1').reshape(len(samples), -1, 4)[:, :, :3].tobytes()
+        else:
+            data = samples.astype(f'<i{width}').tobytes()
+        return data, samples.shape[1], width, sample_rate
+    header = read_header(source)
+    return pcm_view(source, header, start, stop).tobytes(), header.channels, header.sample_width, header.sample_rate
+
+def served_bytes(path: Path, frames: int) -> int:
+    """Size of the file as the webapp serves it (FLAC masters are decoded back to WAV)"""
+    source = audio_source(path)
+    if source.suffix == '.wav':
+        return source.stat().st_size
+    samples, _, width = read_flac(source)
+    return 44 + frames * samples.shape[1] * width
+
+def trim_file(task) -> Dict:
+    """Measure one file and write its trimmed copy if missing (top-level so the process pool can pickle it)"""
+    path, out_dir, pad_ms, known = task
+    path = Path(path)
+    digest = pcm_digest(path)
+    # The pad is part of the name: a different --pad-ms is a different slice
+    rendition = Path(out_dir) / f"{digest}_{pad_ms}.wav"
+    if known and known.get('sha1') == digest and known.get('rendition') == rendition.name and rendition.exists():
+        return dict(known, rendered=False)
+
+    samples, sample_rate = load_pcm(path)
+    bounds = speech_bounds(samples, sample_rate)
+    pad = int(sample_rate * pad_ms / 1000)
+    onset, offset = bounds or (0, len(samples))
+    start, stop = max(0, onset - pad), min(len(samples), offset + pad)
+
+    rendered = False
+    if not rendition.exists():
+        data, channels, width, _ = pcm_slice(path, start, stop)
+        tmp_path = rendition.with_suffix('.tmp')
+        with wave.open(str(tmp_path), 'wb') as wav:
+            wav.setnchannels(channels)
+            wav.setsampwidth(width)
+            wav.setframerate(sample_rate)
+            wav.writeframes(data)
+        os.replace(tmp_path, rendition)
+        rendered = True
+
+    return {
+        'sha1': digest,
+        'pad_ms': pad_ms,
+        'speech': bounds is not None,
+        'start_s': round(start / sample_rate, 4),
+        'end_s': round(stop / sample_rate, 4),
+        'original_s': round(len(samples) / sample_rate, 4),
+        'first_speech_s': round(onset / sample_rate, 4),
+        'trimmed_first_speech_s': round((onset - start) / sample_rate, 4),
+        'original_bytes': served_bytes(path, len(samples)),
+        'trimmed_bytes': rendition.stat().st_size,
+        'rendition': rendition.name,
+        'rendered': rendered,
+    }
+
+def record_trims(results: Dict[str, Dict], db_path: Path = MANIFEST_DB):
+    """Store trim offsets per corpus key in the manifest database"""
+    connection = connect(db_path)
+    now = time.time()
+    with connection:
+        connection.executemany(
+            'INSERT OR REPLACE INTO trims (path, start_s, end_s, original_s, first_speech_s, pad_ms, '
+            'rendition, trimmed_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+            [(key, r['start_s'], r['end_s'], r['original_s'], r['first_speech_s'], r['pad_ms'], r['rendition'], now)
+             for key, r in results.items()])
+    connection.close()
+
+def trim_directory(root: Path, pad_ms: int = DEFAULT_PAD_MS, workers: Optional[int] = None) -> Dict:
+    out_dir = Path(root) / '.trimmed'
+    out_dir.mkdir(parents=True, exist_ok=True)
+    manifest_path = out_dir / 'manifest.json'
+    manifest = {'files': {}}
+    if manifest_path.exists():
+        with open(manifest_path, 'r') as f:
+            manifest = json.load(f)
+
+    files = iter_corpus_files([root])
+    names = [path.relative_to(root).as_posix() for path in files]
+    tasks = [(str(path), str(out_dir), pad_ms, manifest['files'].get(name)) for path, name in zip(files, names)]
+    results = parallel_map(trim_file, tasks, workers)
+
+    manifest = {'pad_ms': pad_ms, 'files': {name: {k: v for k, v in result.items() if k != 'rendered'}
+                                            for name, result in zip(names, results)}}
+    tmp_path = manifest_path.with_suffix('.tmp')
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, indent=1)
+    os.replace(tmp_path, manifest_path)
+    # Offsets map back to corpus files; renditions (e.g. .normalized/<target>) are not in the corpus
+    if not any(part.startswith('.') for part in Path(root).resolve().parts):
+        record_trims({corpus_key(path): result for path, result in zip(files, results)})
+
+    referenced = {entry['rendition'] for entry in manifest['files'].values()}
+    for stale in out_dir.glob('*.wav'):
+        if stale.name not in referenced:
+            stale.unlink()
+    return {'files': len(results), 'rendered': sum(r['rendered'] for r in results), 'results': results}
+
+def main():
+    parser = argparse.ArgumentParser(description='Write silence-trimmed serving copies')
+    parser.add_argument('--roots', type=Path, nargs='+', required=True, help='Served directories to trim')
+    parser.add_argument('--pad-ms', type=int, default=DEFAULT_PAD_MS, help='Silence kept around speech')
+    parser.add_argument('--workers', type=int, help='Worker processes (default: CPU count)')
+    parser.add_argument('--csv', type=Path, help='Write per-file bytes saved and time to first speech')
+
+    args = parser.parse_args()
+
+    rows = []
+    for root in args.roots:
+        print(f"✂️  Trimming {root} (pad {args.pad_ms}ms)")
+        summary = trim_directory(root, args.pad_ms, args.workers)
+        results = summary['results']
+        rows += [{'path': corpus_key(path), **result}
+                 for path, result in zip(iter_corpus_files([root]), results)]
+        if not results:
+            print("⚠️  No audio files found")
+            continue
+        original = sum(r['original_bytes'] for r in results)
+        trimmed = sum(r['trimmed_bytes'] for r in results)
+        before = np.array([r['first_speech_s'] for r in results])
+        after = np.array([r['trimmed_first_speech_s'] for r in results])
+        print(f"✅ {summary['files']} file(s), {summary['rendered']} written -> {Path(root) / '.trimmed'}")
+        print(f"   Bytes: {original / 1024 / 1024:.1f} MB -> {trimmed / 1024 / 1024:.1f} MB "
+              f"(saved {(original - trimmed) / 1024 / 1024:.1f} MB, {100 * (1 - trimmed / original):.1f}%)")
+        print(f"   Time to first speech: median {np.median(before) * 1000:.0f}ms -> {np.median(after) * 1000:.0f}ms, "
+              f"max {before.max() * 1000:.0f}ms -> {after.max() * 1000:.0f}ms")
+        silent = sum(not r['speech'] for r in results)
+        if silent:
+            print(f"⚠️  {silent} file(s) without detectable speech were copied untrimmed")
+
+    if args.csv and rows:
+        import pandas as pd
+
+        df = pd.DataFrame(rows).drop(columns=['rendered'])
+        df['bytes_saved'] = df['original_bytes'] - df['trimmed_bytes']
+        df.to_csv(args.csv, index=False)
+        print(f"\n💾 Saved: {args.csv}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Cross-version audio diff for matched samples
+Pairs files from two experiment versions that share a manifest cell (expressivity,
+voice, emotion, text type, scale, tier; see corpus_manifest.py) and measures what
+changed between them:
+
+  dtw_distance      mean MFCC distance along the DTW alignment path (spectral change)
+  duration_delta_s  duration change (B - A)
+  loudness_delta    integrated loudness change in LU (B - A)
+  f0_rmse_st        F0 difference in semitones over frames voiced in both, after DTW alignment
+  voicing_mismatch  share of aligned frames voiced in one version only
+
+Pairs are ranked by change_score, the mean percentile of the absolute metrics, so the
+biggest changes are listened to first.
+
+Usage:
+  python version_diff.py voices_2 voices_3
+  python version_diff.py voices_2 voices_3 --expressivity 0.6 --top 30 --csv diff_v2_v3.csv
+"""
+
+import argparse
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from audio_corpus import integrated_loudness, load_pcm, parallel_map, resolve_key
+from corpus_manifest import connect, update_manifest
+from prosody_store import yin_f0
+from speaker_embeddings import mfcc
+
+CELL_COLUMNS = ['expressivity', 'voice', 'emotion', 'emotion_type', 'text_type', 'scale', 'is_reference', 'tier']
+METRICS = ['dtw_distance', 'duration_delta_s', 'loudness_delta', 'f0_rmse_st', 'voicing_mismatch']
+# c1..c12: spectral envelope without level (c0) or fine structure
+DTW_COEFFICIENTS = slice(1, 13)
+
+def dtw_path(cost: np.ndarray) -> Tuple[float, np.ndarray]:
+    """Accumulated cost and alignment path (pairs of frame indices) for a cost matrix
+
+    Cells on the same anti-diagonal do not depend on each other, so each diagonal is
+    filled in one vectorized step.
+    """
+    n, m = cost.shape
+    total = np.full((n + 1, m + 1), np.inf)
+    total[0, 0] = 0.0
+    for diagonal in range(2, n + m + 1):
+        i = np.arange(max(1, diagonal - m), min(n, diagonal - 1) + 1)
+        j = diagonal - i
+        total[i, j] = cost[i - 1, j - 1] + np.minimum(np.minimum(total[i - 1, j - 1], total[i - 1, j]),
+                                                      total[i, j - 1])
+
+    path = []
+    i, j = n, m
+    while i > 0 and j > 0:
+        path.append((i - 1, j - 1))
+        step = np.argmin([total[i - 1, j - 1], total[i - 1, j], total[i, j - 1]])
+        i, j = (i - 1, j - 1) if step == 0 else (i - 1, j) if step == 1 else (i, j - 1)
+    return float(total[n, m]), np.array(path[::-1])
+
+def diff_pair(task) -> Dict:
+    """Diff metrics for one matched pair (top-level so the process pool can pickle it)"""
+    key_a, key_b = task
+    analysed = []
+    for key in (key_a, key_b):
+        samples, sample_rate = load_pcm(resolve_key(key))
+        coefficients, _ = mfcc(samples, sample_rate)
+        f0, _ = yin_f0(samples, sample_rate)
+        analysed.append({
+            'mfcc': coefficients[:, DTW_COEFFICIENTS],
+            'f0': f0,
+            'duration': len(samples) / sample_rate,
+            'loudness': integrated_loudness(samples, sample_rate),
+        })
+    a, b = analysed
+
+    cost = np.sqrt(((a['mfcc'][:, None, :] - b['mfcc'][None, :, :]) ** 2).sum(axis=2))
+    total, path = dtw_path(cost)
+
+    f0_a = a['f0'][np.minimum(path[:, 0], len(a['f0']) - 1)]
+    f0_b = b['f0'][np.minimum(path[:, 1], len(b['f0']) - 1)]
+    both = (f0_a > 0) & (f0_b > 0)
+    either = (f0_a > 0) | (f0_b > 0)
+    semitones = 12 * np.log2(f0_b[both] / f0_a[both])
+
+    loudness_delta = b['loudness'] - a['loudness']
+    return {
+        'dtw_distance': total / len(path),
+        'duration_delta_s': b['duration'] - a['duration'],
+        'loudness_delta': float(loudness_delta) if np.isfinite(loudness_delta) else np.nan,
+        'f0_rmse_st': float(np.sqrt(np.mean(semitones ** 2))) if both.any() else np.nan,
+        'voicing_mismatch': float((either & ~both).sum() / max(either.sum(), 1)),
+    }
+
+def matched_pairs(version_a: str, version_b: str, expressivity: str = None) -> List[Dict]:
+    """Manifest rows of both versions joined on the cell columns"""
+    connection = connect()
+    condition = ' AND '.join(f'a.{column} IS b.{column}' for column in CELL_COLUMNS)
+    sql = (f"SELECT a.path AS path_a, b.path AS path_b, a.canonical_key AS key_a, "
+           f"{', '.join(f'a.{column}' for column in CELL_COLUMNS)} "
+           f"FROM files a JOIN files b ON {condition} "
+           f"WHERE a.version = ? AND b.version = ? AND a.voice IS NOT NULL")
+    params = [version_a, version_b]
+    if expressivity:
+        sql += ' AND a.expressivity = ?'
+        params.append(expressivity)
+    rows = [dict(row) for row in connection.execute(sql + ' ORDER BY a.path', params)]
+    connection.close()
+    return rows
+
+def rank_changes(df):
+    """change_score: mean percentile of the absolute metrics across all pairs (1 = biggest change)"""
+    magnitudes = df[METRICS].abs()
+    df['change_score'] = magnitudes.rank(pct=True).mean(axis=1, skipna=True)
+    return df.sort_values('change_score', ascending=False).reset_index(drop=True)
+
+def main():
+    parser = argparse.ArgumentParser(description='Rank what changed between two experiment versions')
+    parser.add_argument('version_a', help='Baseline version (e.g. voices_2)')
+    parser.add_argument('version_b', help='New version (e.g. voices_3)')
+    parser.add_argument('--expressivity', help='Only compare this expressivity setting')
+    parser.add_argument('--workers', type=int, help='Worker processes (default: CPU count)')
+    parser.add_argument('--top', type=int, default=20, help='Rows to print')
+    parser.add_argument('--csv', type=Path, help='Write the full ranked table to this CSV')
+
+    args = parser.parse_args()
+
+    import pandas as pd
+
+    counts = update_manifest(connect())
+    print(f"✅ Manifest up to date ({counts['total']} files, {counts['updated']} re-measured)")
+    pairs = matched_pairs(args.version_a, args.version_b, args.expressivity)
+    if not pairs:
+        print(f"❌ No matched files between {args.version_a} and {args.version_b}")
+        return
+    print(f"🔍 Diffing {len(pairs)} matched pair(s): {args.version_a} -> {args.version_b}")
+
+    results = parallel_map(diff_pair, [(pair['path_a'], pair['path_b']) for pair in pairs], args.workers,
+                           label='pairs')
+    df = rank_changes(pd.DataFrame([{**pair, **result} for pair, result in zip(pairs, results)]))
+
+    print(f"\n📊 Median change per metric:")
+    print(df[METRICS].abs().median().round(3).to_string())
+    print(f"\n🔝 Top {args.top} changed cells:")
+    columns = ['voice', 'emotion', 'text_type', 'scale', 'expressivity'] + METRICS + ['change_score']
+    print(df[columns].head(args.top).round(3).to_string())
+
+    if args.csv:
+        df.to_csv(args.csv, index=False)
+        print(f"\n💾 Saved: {args.csv}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+"""
+Memory-mapped WAV reader (plus FLAC master decoding)
+Parses the RIFF chunk list once per file and exposes the PCM payload as a NumPy
+view over an mmap (no copy, only touched pages are read). Parsed headers are kept
+in a JSON index keyed by (size, mtime) so corpus scans skip re-parsing entirely.
+
+Usage:
+  python wav_reader.py                       # header-only scan / integrity check of the corpus
+  python wav_reader.py --roots ../public/voices_3
+"""
+
+import argparse
+import json
+import os
+import struct
+from collections import Counter
+from pathlib import Path
+from typing import Dict, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+WAVE_FORMAT_PCM = 1
+WAVE_FORMAT_IEEE_FLOAT = 3
+WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+class WavHeader(NamedTuple):
+    format_tag: int
+    channels: int
+    sample_rate: int
+    sample_width: int
+    data_offset: int
+    data_size: int
+    file_size: int
+
+    @property
+    def frames(self) -> int:
+        return self.data_size // (self.channels * self.sample_width)
+
+    @property
+    def duration(self) -> float:
+        return self.frames / self.sample_rate if self.sample_rate else 0.0
+
+    @property
+    def truncated(self) -> bool:
+        """The data chunk claims more bytes than the file holds"""
+        return self.data_offset + self.data_size > self.file_size
+
+def parse_header(path: Path) -> WavHeader:
+    """Walk the RIFF chunks up to 'data' without reading any samples"""
+    file_size = os.path.getsize(path)
+    with open(path, 'rb') as f:
+        riff = f.read(12)
+        if len(riff) < 12 or riff[:4] != b'RIFF' or riff[8:12] != b'WAVE':
+            raise ValueError(f"Not a RIFF/WAVE file: {path}")
+
+        fmt = None
+        while True:
+            chunk = f.read(8)
+            if len(chunk) < 8:
+                raise ValueError(f"No data chunk in {path}")
+            chunk_id, chunk_size = struct.unpack('<4sI', chunk)
+
+            if chunk_id == b'fmt ':
+                body = f.read(chunk_size)
+                format_tag, channels, sample_rate, _, _, bits = struct.unpack('<HHIIHH', body[:16])
+                if format_tag == WAVE_FORMAT_EXTENSIBLE and len(body) >= 26:
+                    format_tag = struct.unpack('<H', body[24:26])[0]
+                fmt = (format_tag, channels, sample_rate, bits // 8)
+                if chunk_size % 2:
+                    f.seek(1, os.SEEK_CUR)
+            elif chunk_id == b'data':
+                if fmt is None:
+                    raise ValueError(f"data chunk before fmt chunk in {path}")
+                # Streaming writers leave 0 or 0xFFFFFFFF here; trust the file size instead
+                data_offset = f.tell()
+                if chunk_size in (0, 0xFFFFFFFF):
+                    chunk_size = file_size - data_offset
+                return WavHeader(*fmt, data_offset, chunk_size, file_size)
+            else:
+                f.seek(chunk_size + chunk_size % 2, os.SEEK_CUR)
+
+def sample_dtype(header: WavHeader) -> np.dtype:
+    if header.format_tag == WAVE_FORMAT_IEEE_FLOAT:
+        return np.dtype('<f4') if header.sample_width == 4 else np.dtype('<f8')
+    if header.format_tag != WAVE_FORMAT_PCM:
+        raise ValueError(f"Unsupported WAV format tag: {header.format_tag}")
+    # 24-bit has no NumPy dtype: expose raw bytes, to_float32 unpacks them
+    return {1: np.dtype('u1'), 2: np.dtype('<i2'), 3: np.dtype('u1'), 4: np.dtype('<i4')}[header.sample_width]
+
+def pcm_view(path: Path, header: Optional[WavHeader] = None, start: int = 0,
+             stop: Optional[int] = None) -> np.ndarray:
+    """Zero-copy (frames, channels) view of frames [start, stop) backed by an mmap"""
+    header = header or parse_header(path)
+    frames = min(header.frames, (header.file_size - header.data_offset) // (header.channels * header.sample_width))
+    stop = frames if stop is None else min(stop, frames)
+    start = min(max(start, 0), stop)
+
+    width = header.channels * header.sample_width
+    if stop == start:
+        return np.empty((0, header.channels), dtype=sample_dtype(header))
+    view = np.memmap(path, dtype=sample_dtype(header), mode='r',
+                     offset=header.data_offset + start * width,
+                     shape=((stop - start) * width // sample_dtype(header).itemsize,))
+    if header.sample_width == 3:
+        return view.reshape(-1, header.channels, 3)
+    return view.reshape(-1, header.channels)
+
+def to_float32(view: np.ndarray, header: WavHeader) -> np.ndarray:
+    """Scale a pcm_view to float32 in [-1, 1] (this is the only copy)"""
+    if header.format_tag == WAVE_FORMAT_IEEE_FLOAT:
+        return np.asarray(view, dtype=np.float32)
+    if header.sample_width == 1:
+        return (view.astype(np.float32) - 128.0) / 128.0
+    if header.sample_width == 3:
+        ints = (view[..., 0].astype(np.int32) | (view[..., 1].astype(np.int32) << 8)
+                | (view[..., 2].astype(np.int32) << 16))
+        ints = np.where(ints >= 1 << 23, ints - (1 << 24), ints)
+        return ints.astype(np.float32) / float(1 << 23)
+    return view.astype(np.float32) / float(1 << (8 * header.sample_width - 1))
+
+def read_flac(path: Path) -> Tuple[np.ndarray, int, int]:
+    """Decode a FLAC master to integer PCM (frames, channels), sample rate and sample width
+
+    Unlike WAV this is a decode (copy); the integer samples are bit-identical to the
+    WAV the master was encoded from. Needs the optional soundfile package.
+    """
+    import soundfile
+
+    info = soundfile.info(str(path))
+    # soundfile cannot read int8, so 8-bit masters come back scaled to 16-bit
+    width = {'PCM_S8': 2, 'PCM_U8': 2, 'PCM_16': 2, 'PCM_24': 3}.get(info.subtype, 4)
+    dtype = 'int16' if width <= 2 else 'int32'
+    samples, sample_rate = soundfile.read(str(path), dtype=dtype, always_2d=True)
+    if width == 3:
+        # libsndfile left-aligns 24-bit samples in int32
+        samples = samples >> 8
+    return samples, sample_rate, width
+
+class HeaderIndex:
+    """JSON cache of parsed headers keyed by path, invalidated by (size, mtime)"""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.entries: Dict[str, Dict] = {}
+        self.dirty = False
+        if self.path.exists():
+            with open(self.path, 'r') as f:
+                self.entries = json.load(f)
+
+    def get(self, key: str, file_path: Path) -> WavHeader:
+        stat = os.stat(file_path)
+        entry = self.entries.get(key)
+        if entry and entry['size'] == stat.st_size and entry['mtime'] == stat.st_mtime_ns:
+            return WavHeader(*entry['header'])
+
+        header = parse_header(file_path)
+        self.entries[key] = {'size': stat.st_size, 'mtime': stat.st_mtime_ns, 'header': list(header)}
+        self.dirty = True
+        return header
+
+    def prune(self, keep):
+        keep = set(keep)
+        stale = [key for key in self.entries if key not in keep]
+        for key in stale:
+            del self.entries[key]
+        self.dirty = self.dirty or bool(stale)
+
+    def save(self):
+        if not self.dirty:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix('.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump(self.entries, f)
+        os.replace(tmp_path, self.path)
+        self.dirty = False
+
+def main():
+    from audio_corpus import CORPUS_DIRS, scan_headers
+
+    parser = argparse.ArgumentParser(description='Header-only scan and integrity check of the WAV corpus')
+    parser.add_argument('--roots', type=Path, nargs='+', default=CORPUS_DIRS, help='Directories to scan for WAVs')
+
+    args = parser.parse_args()
+
+    headers, errors = scan_headers(args.roots)
+    formats = Counter((h.sample_rate, h.sample_width * 8, h.channels) for h in headers.values())
+    truncated = [key for key, h in headers.items() if h.truncated]
+
+    print(f"✅ Indexed {len(headers)} WAV headers")
+    print(f"   Total audio: {sum(h.duration for h in headers.values()) / 60:.1f} min, "
+          f"{sum(h.data_size for h in headers.values()) / 1024 / 1024:.1f} MB PCM")
+    for (rate, bits, channels), count in formats.most_common():
+        print(f"   {rate} Hz / {bits}-bit / {channels}ch: {count} files")
+
+    for key in truncated:
+        print(f"❌ Truncated: {key}")
+    for key, error in errors.items():
+        print(f"❌ Unreadable: {key} ({error})")
+    if not truncated and not errors:
+        print("✅ All headers consistent with file sizes")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Precomputed waveform peaks for instant player rendering
+Writes multi-resolution min/max peaks for every file in a served directory, so a
+player can draw the waveform (and show clipping or silence) before the audio has
+downloaded. The webapp serves them from /peaks/<filename> next to /audio/<filename>.
+
+  <dir>/.peaks/<name>.peaks     rebuilt when the audio is newer
+
+Rendition directories under <dir> (.trimmed/, .normalized/<target>/, ...) get their own
+.peaks/, so the waveform always matches the audio the webapp actually serves.
+
+File format (little-endian):
+  header   4s magic 'WPK1', u32 sample_rate, u32 frames, u16 level count
+  levels   per level: u32 samples_per_peak, u32 peak count
+  data     per level: int8 (min, max) pairs, full scale = +/-127
+
+Usage:
+  python waveform_peaks.py --roots ../tts-qa-system/data/voices ../public/voices_3
+  python waveform_peaks.py --show ../tts-qa-system/data/voices/.peaks/v001_match_emo_angry_scale_1.0.peaks
+"""
+
+import argparse
+import os
+import struct
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from audio_corpus import audio_source, iter_corpus_files, load_pcm, parallel_map
+
+MAGIC = b'WPK1'
+HEADER = struct.Struct('<4sIIH')
+LEVEL = struct.Struct('<II')
+# Finest level resolves ~8ms at 16 kHz; each following level is 4x coarser
+BASE_SAMPLES_PER_PEAK = 128
+LEVEL_FACTOR = 4
+LEVELS = 4
+
+def peaks_path(root: Path, path: Path) -> Path:
+    return Path(root) / '.peaks' / path.relative_to(root).with_suffix('.peaks')
+
+def rendition_dirs(root: Path) -> List[Path]:
+    """Hidden rendition directories under root, recognized by their manifest.json"""
+    root = Path(root)
+    return sorted(manifest.parent for manifest in root.rglob('manifest.json')
+                  if any(part.startswith('.') for part in manifest.parent.relative_to(root).parts)
+                  and '.peaks' not in manifest.parent.relative_to(root).parts)
+
+def compute_peaks(samples: np.ndarray) -> List[Tuple[int, np.ndarray]]:
+    """(samples_per_peak, int8 array (peaks, 2)) per level, finest first"""
+    count = -(-len(samples) // BASE_SAMPLES_PER_PEAK)
+    padded = np.zeros(max(count, 1) * BASE_SAMPLES_PER_PEAK, dtype=np.float32)
+    padded[:len(samples)] = samples
+    blocks = padded.reshape(-1, BASE_SAMPLES_PER_PEAK)
+    low, high = blocks.min(axis=1), blocks.max(axis=1)
+
+    levels = []
+    samples_per_peak = BASE_SAMPLES_PER_PEAK
+    for _ in range(LEVELS):
+        pairs = np.stack([low, high], axis=1)
+        levels.append((samples_per_peak, np.clip(np.round(pairs * 127), -127, 127).astype(np.int8)))
+        # Coarser level from the previous one: min of mins, max of maxes
+        count = -(-len(low) // LEVEL_FACTOR)
+        low = np.pad(low, (0, count * LEVEL_FACTOR - len(low)), mode='edge').reshape(-1, LEVEL_FACTOR).min(axis=1)
+        high = np.pad(high, (0, count * LEVEL_FACTOR - len(high)), mode='edge').reshape(-1, LEVEL_FACTOR).max(axis=1)
+        samples_per_peak *= LEVEL_FACTOR
+    return levels
+
+def encode_peaks(sample_rate: int, frames: int, levels: List[Tuple[int, np.ndarray]]) -> bytes:
+    parts = [HEADER.pack(MAGIC, sample_rate, frames, len(levels))]
+    parts += [LEVEL.pack(samples_per_peak, len(pairs)) for samples_per_peak, pairs in levels]
+    parts += [pairs.tobytes() for _, pairs in levels]
+    return b''.join(parts)
+
+def decode_peaks(data: bytes) -> Dict:
+    magic, sample_rate, frames, count = HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError('not a peaks file')
+    offset = HEADER.size
+    specs = []
+    for _ in range(count):
+        specs.append(LEVEL.unpack_from(data, offset))
+        offset += LEVEL.size
+    levels = []
+    for samples_per_peak, peaks in specs:
+        pairs = np.frombuffer(data, dtype=np.int8, count=peaks * 2, offset=offset).reshape(-1, 2)
+        levels.append((samples_per_peak, pairs))
+        offset += peaks * 2
+    return {'sample_rate': sample_rate, 'frames': frames, 'levels': levels}
+
+def build_peaks(task) -> Dict:
+    """Write the peaks file for one audio file if stale (top-level so the process pool can pickle it)"""
+    path, out_path = Path(task[0]), Path(task[1])
+    source = audio_source(path)
+    if out_path.exists() and out_path.stat().st_mtime >= source.stat().st_mtime:
+        return {'written': False, 'bytes': out_path.stat().st_size, 'clipped': None}
+
+    samples, sample_rate = load_pcm(path)
+    levels = compute_peaks(samples)
+    data = encode_peaks(sample_rate, len(samples), levels)
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = out_path.with_suffix('.tmp')
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, out_path)
+    return {'written': True, 'bytes': len(data), 'clipped': bool(np.abs(levels[0][1]).max(initial=0) >= 127)}
+
+def main():
+    parser = argparse.ArgumentParser(description='Precompute waveform peak thumbnails for served audio')
+    parser.add_argument('--roots', type=Path, nargs='+', help='Served directories to process')
+    parser.add_argument('--workers', type=int, help='Worker processes (default: CPU count)')
+    parser.add_argument('--show', type=Path, help='Describe an existing peaks file')
+
+    args = parser.parse_args()
+
+    if args.show:
+        peaks = decode_peaks(args.show.read_bytes())
+        print(f"🔍 {args.show.name}: {peaks['frames']} frames @ {peaks['sample_rate']} Hz")
+        for samples_per_peak, pairs in peaks['levels']:
+            print(f"   {samples_per_peak:5d} samples/peak: {len(pairs):5d} peaks, "
+                  f"range {pairs[:, 0].min()} .. {pairs[:, 1].max()}")
+        return
+    if not args.roots:
+        parser.error('give --roots or --show')
+
+    for root in [directory for root in args.roots for directory in (Path(root), *rendition_dirs(root))]:
+        files = iter_corpus_files([root])
+        print(f"📈 Peaks for {len(files)} file(s) in {root}")
+        results = parallel_map(build_peaks, [(str(path), str(peaks_path(root, path))) for path in files], args.workers)
+        audio_bytes = sum(audio_source(path).stat().st_size for path in files)
+        peak_bytes = sum(r['bytes'] for r in results)
+        print(f"✅ {sum(r['written'] for r in results)} written -> {Path(root) / '.peaks'} "
+              f"({peak_bytes / 1024:.0f} KB, {audio_bytes / max(peak_bytes, 1):.0f}x smaller than the audio)")
+        clipped = sum(bool(r['clipped']) for r in results)
+        if clipped:
+            print(f"⚠️  {clipped} newly written file(s) reach full scale")
+
+if __name__ == "__main__":
+    main()
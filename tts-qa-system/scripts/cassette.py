@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+"""
+Record/replay cassette for TTS API interactions
+Drop-in replacement for the `requests.get`/`requests.post` calls used by the
+generation client and test scripts:
+- record: forwards to the live backend and captures request/response pairs
+- replay: answers from the cassette deterministically, fully offline
+
+Cassette layout (one directory):
+  interactions.jsonl   one line per request/response pair, in call order
+  audio/<sha256>.bin   binary response bodies, stored once per content hash
+  baseline.json        timings measured while replaying (test_cassette_replay.py)
+
+Enable for any script via environment variables:
+  TTS_CASSETTE=path/to/cassette  TTS_CASSETTE_MODE=record|replay  TTS_CASSETTE_TIMING=1.0
+
+With TTS_CASSETTE_TIMING, a replay waits the recorded latency times that factor and
+measures every call it answers, so the replayed timings follow both the recording
+and the client's request pattern.
+
+Usage:
+  python cassette.py cassettes/generation_flow                    # summary of recorded timings
+  python cassette.py cassettes/generation_flow --export-traces traces.jsonl
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import statistics
+import threading
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import requests
+import requests.adapters
+
+# A step (or a whole replay) regresses when its measured time exceeds the baseline by this factor
+REGRESSION_TOLERANCE = 1.5
+
+class CassetteMiss(requests.exceptions.ConnectionError):
+    """Raised in replay mode when a request was never recorded"""
+
+class CassetteResponse:
+    """Minimal stand-in for requests.Response built from a cassette entry"""
+
+    def __init__(self, status_code: int, content: bytes, headers: Optional[Dict] = None, url: str = ''):
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers or {}
+        self.url = url
+
+    @property
+    def text(self) -> str:
+        return self.content.decode('utf-8', errors='replace')
+
+    def json(self):
+        return json.loads(self.content)
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.exceptions.HTTPError(f"{self.status_code} Error for url: {self.url}", response=self)
+
+def request_key(method: str, url: str, body) -> str:
+    """Canonical match key: method, URL and JSON body with sorted keys"""
+    return f"{method} {url} {json.dumps(body, sort_keys=True, ensure_ascii=False)}"
+
+def endpoint_step(url: str) -> str:
+    """Map a URL onto the 4-step workflow name used in generation traces"""
+    if url.endswith('/speak/batch/post'):
+        return 'post'
+    if url.endswith('/speak/batch/get'):
+        return 'poll'
+    if url.endswith('/cloudfront'):
+        return 'cloudfront'
+    return 'download'
+
+class Cassette:
+    def __init__(self, path: Path, mode: str = 'replay', timing: float = 0.0):
+        if mode not in ('record', 'replay'):
+            raise ValueError(f"Unknown cassette mode: {mode}")
+
+        self.path = Path(path)
+        self.mode = mode
+        self.timing = timing
+        self.index_file = self.path / 'interactions.jsonl'
+        self.audio_dir = self.path / 'audio'
+        self.lock = threading.Lock()
+
+        # Replay state: key -> ordered responses, key -> next position
+        self.recorded: Dict[str, List[Dict]] = defaultdict(list)
+        self.positions: Dict[str, int] = defaultdict(int)
+        # Replay measurements: step -> wall time of each answered call
+        self.measured: Dict[str, List[float]] = defaultdict(list)
+
+        if mode == 'record':
+            self.session = requests.Session()
+            self.audio_dir.mkdir(parents=True, exist_ok=True)
+        else:
+            if not self.index_file.exists():
+                raise FileNotFoundError(f"Cassette not found: {self.index_file}")
+            for entry in self.interactions():
+                self.recorded[entry['key']].append(entry)
+
+    def interactions(self) -> List[Dict]:
+        with open(self.index_file, 'r', encoding='utf-8') as f:
+            return [json.loads(line) for line in f if line.strip()]
+
+    def get(self, url: str, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url: str, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+    def request(self, method: str, url: str, json=None, headers=None, timeout=None, **kwargs):
+        key = request_key(method, url, json)
+        if self.mode == 'record':
+            return self.record(method, url, key, json=json, headers=headers, timeout=timeout, **kwargs)
+        return self.replay(key, url)
+
+    def record(self, method: str, url: str, key: str, **kwargs):
+        """Forward to the live backend and append the exchange to the cassette"""
+        started = time.time()
+        response = self.session.request(method, url, **kwargs)
+        elapsed = time.time() - started
+
+        entry = {
+            'key': key,
+            'step': endpoint_step(url),
+            'status': response.status_code,
+            'elapsed': round(elapsed, 4),
+            'content_type': response.headers.get('Content-Type', ''),
+        }
+        try:
+            entry['json'] = response.json()
+        except ValueError:
+            digest = hashlib.sha256(response.content).hexdigest()
+            blob = self.audio_dir / f"{digest}.bin"
+            if not blob.exists():
+                blob.write_bytes(response.content)
+            entry['sha256'] = digest
+            entry['bytes'] = len(response.content)
+
+        with self.lock:
+            with open(self.index_file, 'a', encoding='utf-8') as f:
+                f.write(json_dumps(entry) + '\n')
+        return response
+
+    def replay(self, key: str, url: str) -> CassetteResponse:
+        """Return the next recorded response for this request (the last one repeats)"""
+        started = time.time()
+        with self.lock:
+            entries = self.recorded.get(key)
+            if not entries:
+                raise CassetteMiss(f"No recorded interaction for {key[:120]}")
+            position = self.positions[key]
+            entry = entries[min(position, len(entries) - 1)]
+            self.positions[key] = position + 1
+
+        if self.timing:
+            time.sleep(entry['elapsed'] * self.timing)
+
+        if 'sha256' in entry:
+            content = (self.audio_dir / f"{entry['sha256']}.bin").read_bytes()
+        else:
+            content = json_dumps(entry.get('json')).encode('utf-8')
+        with self.lock:
+            self.measured[entry['step']].append(time.time() - started)
+        return CassetteResponse(entry['status'], content, {'Content-Type': entry['content_type']}, url)
+
+    def timings(self) -> Dict[str, List[float]]:
+        """Recorded latencies grouped by workflow step"""
+        by_step = defaultdict(list)
+        for entry in self.interactions():
+            by_step[entry['step']].append(entry['elapsed'])
+        return dict(by_step)
+
+    def export_traces(self, trace_file: Path) -> int:
+        """Write recorded timings in the TTSAPIClient trace format for plan_generation.py"""
+        entries = self.interactions()
+        with open(trace_file, 'a') as f:
+            for entry in entries:
+                record = {'step': entry['step'], 'elapsed': entry['elapsed'], 'status': entry['status']}
+                if 'bytes' in entry:
+                    record['bytes'] = entry['bytes']
+                f.write(json.dumps(record) + '\n')
+        return len(entries)
+
+    def measured_medians(self) -> Dict[str, float]:
+        """Median wall time per step over the calls replayed so far"""
+        with self.lock:
+            return {step: statistics.median(values) for step, values in self.measured.items()}
+
+    def request_counts(self) -> Dict[str, int]:
+        with self.lock:
+            return {step: len(values) for step, values in self.measured.items()}
+
+    def write_baseline(self, run_seconds: float, result=None) -> Dict:
+        """Store this replay's measurements as baseline.json"""
+        baseline = {'timing': self.timing, 'run_seconds': round(run_seconds, 4), 'result': result,
+                    'steps': {step: round(median, 4) for step, median in sorted(self.measured_medians().items())},
+                    'requests': dict(sorted(self.request_counts().items()))}
+        with open(self.path / 'baseline.json', 'w') as f:
+            json.dump(baseline, f, indent=2)
+        return baseline
+
+    def load_baseline(self) -> Dict:
+        with open(self.path / 'baseline.json', 'r') as f:
+            return json.load(f)
+
+    def check_baseline(self, run_seconds: float, result=None,
+                       tolerance: float = REGRESSION_TOLERANCE) -> List[str]:
+        """Regressions of this replay against baseline.json (replayed at the baseline's timing)"""
+        baseline = self.load_baseline()
+        failures = []
+        if result != baseline['result']:
+            failures.append(f"result {result!r} != baseline {baseline['result']!r}")
+        if run_seconds > baseline['run_seconds'] * tolerance:
+            failures.append(f"run {run_seconds:.3f}s > baseline {baseline['run_seconds']:.3f}s x {tolerance:g}")
+        medians, counts = self.measured_medians(), self.request_counts()
+        for step, limit in baseline['steps'].items():
+            if medians.get(step, 0) > limit * tolerance:
+                failures.append(f"{step} median {medians[step]:.3f}s > baseline {limit:.3f}s x {tolerance:g}")
+        for step in sorted(set(counts) | set(baseline['requests'])):
+            # More calls than recorded means extra polls or retries; fewer means a step was skipped
+            if counts.get(step, 0) != baseline['requests'].get(step, 0):
+                failures.append(f"{step}: {counts.get(step, 0)} request(s), baseline {baseline['requests'].get(step, 0)}")
+        return failures
+
+def json_dumps(value) -> str:
+    return json.dumps(value, ensure_ascii=False, separators=(',', ':'))
+
+def transport_from_env(pool_size: int = 10):
+    """Return a Cassette when TTS_CASSETTE is set, otherwise a pooled requests.Session"""
+    path = os.environ.get('TTS_CASSETTE')
+    if not path:
+        session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        return session
+    return Cassette(
+        Path(path),
+        mode=os.environ.get('TTS_CASSETTE_MODE', 'replay'),
+        timing=float(os.environ.get('TTS_CASSETTE_TIMING', '0')),
+    )
+
+def main():
+    parser = argparse.ArgumentParser(description='Inspect a TTS API cassette')
+    parser.add_argument('cassette', type=Path, help='Cassette directory')
+    parser.add_argument('--export-traces', type=Path, help='Append recorded timings to a trace JSONL')
+
+    args = parser.parse_args()
+
+    cassette = Cassette(args.cassette, mode='replay')
+    blobs = list(cassette.audio_dir.glob('*.bin'))
+
+    print(f"Cassette: {args.cassette}")
+    print(f"Interactions: {sum(len(v) for v in cassette.recorded.values())}")
+    print(f"Audio blobs: {len(blobs)} ({sum(b.stat().st_size for b in blobs)/1024/1024:.1f} MB)")
+    print("\nRecorded latency per step (seconds):")
+    for step, values in sorted(cassette.timings().items()):
+        print(f"  {step:<11} n={len(values):<5} median={statistics.median(values):.3f} "
+              f"max={max(values):.3f}")
+
+    if args.export_traces:
+        count = cassette.export_traces(args.export_traces)
+        print(f"\nExported {count} timings to: {args.export_traces}")
+
+if __name__ == "__main__":
+    main()
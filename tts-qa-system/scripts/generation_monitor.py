@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+"""
+Live monitoring for orchestrated generation runs
+- GenerationMetrics: thread-safe counters fed by the orchestrator and TTSAPIClient steps
+- MetricsServer: serves a JSON snapshot on http://127.0.0.1:<port>/metrics
+- run_dashboard: curses terminal view of that endpoint
+
+Usage:
+  python orchestrate.py run voices_3 --metrics-port 8787
+  python generation_monitor.py --url http://127.0.0.1:8787/metrics
+"""
+
+import argparse
+import curses
+import json
+import threading
+import time
+import urllib.request
+from collections import Counter, defaultdict, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional
+
+# Throughput and ETA are computed over this trailing window (seconds)
+RATE_WINDOW = 60.0
+
+class GenerationMetrics:
+    """Counters for one run; every method is safe to call from worker threads"""
+
+    def __init__(self, experiment: str = '', token_expires_at: Optional[float] = None):
+        self.experiment = experiment
+        self.token_expires_at = token_expires_at
+        self.lock = threading.Lock()
+        self.started_at = time.time()
+        self.total = 0
+        self.done = 0
+        self.failed = 0
+        self.in_flight = 0
+        self.step_events: Dict[str, deque] = defaultdict(deque)
+        self.step_latency: Dict[str, deque] = defaultdict(lambda: deque(maxlen=200))
+        self.status_counts: Dict[str, Counter] = defaultdict(Counter)
+        self.errors = Counter()
+        self.completions = deque()
+
+    def start(self, total: int):
+        with self.lock:
+            self.started_at = time.time()
+            self.total = total
+
+    def batch_started(self, size: int):
+        with self.lock:
+            self.in_flight += size
+
+    def batch_finished(self, size: int):
+        with self.lock:
+            self.in_flight -= size
+
+    def job_done(self):
+        with self.lock:
+            self.done += 1
+            self.completions.append(time.time())
+
+    def job_failed(self, error: Optional[str]):
+        with self.lock:
+            self.failed += 1
+            self.errors[error or 'unknown'] += 1
+
+    def step(self, step: str, elapsed: float, status: Optional[int] = None):
+        """Hook for TTSAPIClient.on_step"""
+        with self.lock:
+            self.step_events[step].append(time.time())
+            self.step_latency[step].append(elapsed)
+            if status is not None:
+                self.status_counts[step][str(status)] += 1
+
+    def trim(self, now: float):
+        cutoff = now - RATE_WINDOW
+        for events in list(self.step_events.values()) + [self.completions]:
+            while events and events[0] < cutoff:
+                events.popleft()
+
+    def snapshot(self) -> Dict:
+        now = time.time()
+        with self.lock:
+            self.trim(now)
+            window = min(RATE_WINDOW, max(now - self.started_at, 1e-6))
+            rate = len(self.completions) / window
+            remaining = self.total - self.done - self.failed
+            queued = remaining - self.in_flight
+            eta = remaining / rate if rate > 0 else None
+            token_remaining = self.token_expires_at - now if self.token_expires_at else None
+
+            steps = {}
+            for step in set(self.step_latency) | set(self.status_counts):
+                calls = sum(self.status_counts[step].values())
+                errors = sum(count for status, count in self.status_counts[step].items() if status != '200')
+                latencies = sorted(self.step_latency[step])
+                steps[step] = {
+                    'per_second': round(len(self.step_events[step]) / window, 2),
+                    'median_latency': round(latencies[len(latencies) // 2], 3) if latencies else None,
+                    'status_codes': dict(self.status_counts[step]),
+                    'error_rate': round(errors / calls, 3) if calls else 0.0,
+                }
+
+            return {
+                'experiment': self.experiment,
+                'elapsed': round(now - self.started_at, 1),
+                'total': self.total,
+                'done': self.done,
+                'failed': self.failed,
+                'in_flight': self.in_flight,
+                'queue_depth': max(queued, 0),
+                'files_per_second': round(rate, 3),
+                'eta_seconds': round(eta) if eta is not None else None,
+                'token_remaining_seconds': round(token_remaining) if token_remaining is not None else None,
+                # The run will not finish on this token at the current pace
+                'at_risk': bool(eta is not None and token_remaining is not None and eta > token_remaining),
+                'steps': steps,
+                'errors': dict(self.errors),
+            }
+
+class MetricsServer:
+    """Background HTTP server exposing GenerationMetrics.snapshot() as JSON"""
+
+    def __init__(self, metrics: GenerationMetrics, port: int, host: str = '127.0.0.1'):
+        metrics_ref = metrics
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.rstrip('/') not in ('', '/metrics'):
+                    self.send_error(404)
+                    return
+                body = json.dumps(metrics_ref.snapshot()).encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Cache-Control', 'no-store')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}/metrics"
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+def format_duration(seconds: Optional[float]) -> str:
+    if seconds is None:
+        return '--'
+    sign = '-' if seconds < 0 else ''
+    seconds = abs(int(seconds))
+    return f"{sign}{seconds // 3600:d}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+
+def fetch_snapshot(url: str) -> Dict:
+    with urllib.request.urlopen(url, timeout=2) as response:
+        return json.loads(response.read())
+
+def draw(screen, snapshot: Optional[Dict], url: str, error: Optional[str]):
+    screen.erase()
+    height, width = screen.getmaxyx()
+
+    def put(row: int, text: str, attr: int = 0):
+        if row < height:
+            screen.addnstr(row, 0, text, width - 1, attr)
+
+    put(0, f"TTS generation monitor  {url}  (q to quit)", curses.A_BOLD)
+    if error:
+        put(2, f"Cannot reach metrics endpoint: {error}", curses.color_pair(1))
+        screen.refresh()
+        return
+
+    s = snapshot
+    progress = (s['done'] + s['failed']) / s['total'] if s['total'] else 0.0
+    bar_width = max(10, min(50, width - 30))
+    filled = int(bar_width * progress)
+    put(2, f"{s['experiment']}  [{'#' * filled}{'.' * (bar_width - filled)}] {progress * 100:5.1f}%")
+    put(3, f"Done {s['done']}/{s['total']}   Failed {s['failed']}   In flight {s['in_flight']}   "
+           f"Queued {s['queue_depth']}")
+    put(4, f"Throughput {s['files_per_second']:.2f} files/s   Elapsed {format_duration(s['elapsed'])}   "
+           f"ETA {format_duration(s['eta_seconds'])}")
+    token_attr = curses.color_pair(1) | curses.A_BOLD if s['at_risk'] else curses.color_pair(2)
+    put(5, f"Token remaining {format_duration(s['token_remaining_seconds'])}"
+           + ("   ⚠ run will outlast the token at this pace" if s['at_risk'] else ''), token_attr)
+
+    put(7, f"{'step':<11} {'req/s':>7} {'median s':>9} {'err rate':>9}  status codes", curses.A_UNDERLINE)
+    row = 8
+    for step in ('post', 'poll', 'render', 'cloudfront', 'download'):
+        info = s['steps'].get(step)
+        if not info:
+            continue
+        latency = f"{info['median_latency']:.3f}" if info['median_latency'] is not None else '--'
+        attr = curses.color_pair(1) if info['error_rate'] > 0.05 else 0
+        put(row, f"{step:<11} {info['per_second']:>7.2f} {latency:>9} {info['error_rate']:>9.1%}  "
+                 f"{info['status_codes']}", attr)
+        row += 1
+
+    if s['errors']:
+        put(row + 1, "Job failures:", curses.A_BOLD)
+        for i, (error, count) in enumerate(sorted(s['errors'].items(), key=lambda e: -e[1])[:5]):
+            put(row + 2 + i, f"  {count:>5}  {error}")
+    screen.refresh()
+
+def run_dashboard(url: str, refresh: float = 1.0):
+    """Curses dashboard polling a MetricsServer endpoint"""
+
+    def loop(screen):
+        curses.curs_set(0)
+        curses.use_default_colors()
+        curses.init_pair(1, curses.COLOR_RED, -1)
+        curses.init_pair(2, curses.COLOR_GREEN, -1)
+        screen.timeout(int(refresh * 1000))
+        while True:
+            try:
+                draw(screen, fetch_snapshot(url), url, None)
+            except OSError as e:
+                draw(screen, None, url, str(e))
+            if screen.getch() in (ord('q'), ord('Q')):
+                return
+
+    curses.wrapper(loop)
+
+def main():
+    parser = argparse.ArgumentParser(description='Terminal dashboard for a running orchestrate.py job')
+    parser.add_argument('--url', default='http://127.0.0.1:8787/metrics', help='Metrics endpoint')
+    parser.add_argument('--refresh', type=float, default=1.0, help='Refresh interval in seconds')
+    parser.add_argument('--once', action='store_true', help='Print one JSON snapshot and exit')
+
+    args = parser.parse_args()
+
+    if args.once:
+        print(json.dumps(fetch_snapshot(args.url), indent=2))
+    else:
+        run_dashboard(args.url, args.refresh)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,547 @@
+#!/usr/bin/env python3
+"""
+Unified generation orchestrator for every experiment version
+Replaces the per-version generate_* scripts with one CLI that drives a worker
+pool over a single shared, rate-limited TTSAPIClient
+
+Usage:
+  python orchestrate.py plan voices_3
+  python orchestrate.py run voices_3 --workers 4 --token $TTS_API_TOKEN
+  python orchestrate.py resume voices_3
+  python orchestrate.py verify voices_3
+  python orchestrate.py stats voices_3
+  python orchestrate.py ready voices_3 --follow
+  python orchestrate.py dashboard voices_3
+"""
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Set
+
+import yaml
+
+from generation_monitor import GenerationMetrics, MetricsServer, run_dashboard
+from plan_generation import GenerationPlanner, StepLatencies
+from tts_api_client import TRACE_FILE, TTSAPIClient, token_expiry
+
+REPO_ROOT = Path(__file__).resolve().parents[2]
+CONFIG_DIR = Path(__file__).parent.parent / 'config'
+EXPERIMENTS_FILE = CONFIG_DIR / 'experiments.yaml'
+SENTENCES_FILE = CONFIG_DIR / 'test_sentences.json'
+RUNS_DIR = Path(__file__).parent.parent / 'data' / 'runs'
+
+# Anything smaller than this is an error page or a truncated download
+MIN_WAV_BYTES = 1000
+
+def load_experiment(name: str) -> Dict:
+    """Load one experiment definition merged over the shared defaults"""
+    with open(EXPERIMENTS_FILE, 'r', encoding='utf-8') as f:
+        config = yaml.safe_load(f)
+
+    if name not in config['experiments']:
+        available = ', '.join(config['experiments'])
+        raise SystemExit(f"Unknown experiment '{name}' (available: {available})")
+
+    experiment = {**config['defaults'], **config['experiments'][name], 'name': name}
+    with open(SENTENCES_FILE, 'r', encoding='utf-8') as f:
+        sentences = json.load(f)['emotions']
+    experiment['texts'] = {emotion: info['sentences'] for emotion, info in sentences.items()}
+    return experiment
+
+def build_request(experiment: Dict, text: str, actor_id: str, emotion_type: Optional[str] = None,
+                  emotion_value: Optional[str] = None, scale: Optional[float] = None) -> Dict:
+    """Backend payload; references carry no emotion parameters"""
+    request = {"text": text, "actor_id": actor_id, **experiment['request']}
+    if scale is not None:
+        request["emotion_scale"] = scale
+    if emotion_type == "label":
+        request["emotion_label"] = emotion_value
+    elif emotion_type == "vector":
+        request["emotion_vector_id"] = emotion_value
+    return request
+
+def build_plan(experiment: Dict) -> List[Dict]:
+    """Expand an experiment into one job per output file (references first per cell)"""
+    emotions = [(emotion, 'label', emotion) for emotion in experiment['emotion_labels']]
+    emotions += [(emotion, 'vector', vector_id) for emotion, vector_id in experiment['emotion_vectors'].items()]
+
+    jobs = []
+    for expressivity in experiment['expressivity']:
+        output_dir = Path(experiment['output_dir']) / f"expressivity_{expressivity}"
+        for voice, actor_id in experiment['voices'].items():
+            for emotion, emotion_type, emotion_value in emotions:
+                for text_type in experiment['text_types']:
+                    text = experiment['texts'][emotion][text_type]
+                    if expressivity != 'none':
+                        text = f"{text}{experiment['expressivity_suffix']}"
+
+                    cell = {
+                        'experiment': experiment['name'],
+                        'expressivity': expressivity,
+                        'voice': voice,
+                        'emotion': emotion,
+                        'emotion_type': emotion_type,
+                        'text_type': text_type,
+                    }
+
+                    filename = experiment['reference_filename'].format(**cell)
+                    jobs.append({
+                        **cell,
+                        'kind': 'reference',
+                        'scale': None,
+                        'filename': filename,
+                        'output_path': str(output_dir / filename),
+                        'request': build_request(experiment, text, actor_id),
+                    })
+
+                    for scale in experiment['scales']:
+                        filename = experiment['sample_filename'].format(scale=scale, **cell)
+                        jobs.append({
+                            **cell,
+                            'kind': 'sample',
+                            'scale': scale,
+                            'filename': filename,
+                            'output_path': str(output_dir / filename),
+                            'request': build_request(experiment, text, actor_id, emotion_type,
+                                                     emotion_value, scale),
+                        })
+    return jobs
+
+def filter_plan(jobs: List[Dict], voices: Optional[List[str]] = None, emotions: Optional[List[str]] = None,
+                kind: Optional[str] = None) -> List[Dict]:
+    return [
+        job for job in jobs
+        if (not voices or job['voice'] in voices)
+        and (not emotions or job['emotion'] in emotions)
+        and (not kind or job['kind'] == kind)
+    ]
+
+def is_valid_wav(path: Path) -> bool:
+    """Cheap integrity check: present, non-trivial size and a RIFF/WAVE header"""
+    if not path.exists() or path.stat().st_size < MIN_WAV_BYTES:
+        return False
+    with open(path, 'rb') as f:
+        header = f.read(12)
+    return header[:4] == b'RIFF' and header[8:12] == b'WAVE'
+
+def drop_lines(path: Path, field: str, values: Set[str]):
+    """Rewrite a JSONL file without the entries whose field is in values"""
+    if not path.exists():
+        return
+    with open(path, 'r') as f:
+        kept = [line for line in f if line.strip() and json.loads(line).get(field) not in values]
+    tmp_path = path.with_suffix('.tmp')
+    with open(tmp_path, 'w') as f:
+        f.writelines(kept)
+    os.replace(tmp_path, path)
+
+class RunState:
+    """Append-only JSONL log of job outcomes, shared by all workers"""
+
+    def __init__(self, experiment_name: str):
+        self.path = RUNS_DIR / f"{experiment_name}.jsonl"
+        self.lock = threading.Lock()
+
+    def reset(self, output_paths: Set[str]):
+        """Forget the outcomes of these jobs only; other jobs of the experiment keep theirs"""
+        drop_lines(self.path, 'output_path', output_paths)
+
+    def record(self, job: Dict, outcome: Dict):
+        entry = {
+            'output_path': job['output_path'],
+            'status': 'done' if outcome['ok'] else 'failed',
+            'quality': outcome.get('quality'),
+            'bytes': outcome.get('bytes', 0),
+            'error': outcome.get('error'),
+            'timestamp': datetime.now().isoformat(),
+        }
+        with self.lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, 'a') as f:
+                json.dump(entry, f)
+                f.write('\n')
+
+    def entries(self) -> List[Dict]:
+        if not self.path.exists():
+            return []
+        with open(self.path, 'r') as f:
+            return [json.loads(line) for line in f if line.strip()]
+
+    def completed(self) -> Set[str]:
+        """Output paths whose latest outcome is 'done'"""
+        latest = {}
+        for entry in self.entries():
+            latest[entry['output_path']] = entry['status']
+        return {path for path, status in latest.items() if status == 'done'}
+
+def unit_key(job: Dict) -> str:
+    """Evaluation unit: one reference plus all of its scale variants"""
+    return (f"{job['experiment']}/expressivity_{job['expressivity']}/"
+            f"{job['voice']}_{job['emotion']}_{job['text_type']}")
+
+class UnitTracker:
+    """Co-schedules evaluation units and streams each one out as soon as it is complete"""
+
+    def __init__(self, experiment_name: str, jobs: List[Dict], completed: Set[str]):
+        self.path = RUNS_DIR / f"{experiment_name}_ready_units.jsonl"
+        self.lock = threading.Lock()
+        self.units: Dict[str, List[Dict]] = {}
+        for job in jobs:
+            self.units.setdefault(unit_key(job), []).append(job)
+        self.remaining = {
+            key: {job['output_path'] for job in unit_jobs if job['output_path'] not in completed}
+            for key, unit_jobs in self.units.items()
+        }
+
+    def reset(self):
+        """Withdraw the streamed units this tracker is about to regenerate"""
+        drop_lines(self.path, 'unit', set(self.units))
+
+    def schedule(self, jobs: List[Dict]) -> List[Dict]:
+        """Order jobs unit by unit, finishing the most advanced units first"""
+        by_unit: Dict[str, List[Dict]] = {}
+        for job in jobs:
+            by_unit.setdefault(unit_key(job), []).append(job)
+        # Stable sort keeps plan order among untouched units; references lead within a unit
+        ordered = sorted(by_unit.items(), key=lambda item: len(self.remaining.get(item[0], ())))
+        return [
+            job
+            for _, unit_jobs in ordered
+            for job in sorted(unit_jobs, key=lambda j: j['kind'] != 'reference')
+        ]
+
+    def mark_done(self, job: Dict):
+        key = unit_key(job)
+        with self.lock:
+            remaining = self.remaining.get(key)
+            if remaining is None or job['output_path'] not in remaining:
+                return
+            remaining.discard(job['output_path'])
+            if not remaining:
+                self.emit(key)
+
+    def emit_ready(self):
+        """Stream complete units from earlier runs that are not in the stream yet"""
+        streamed = {unit['unit'] for unit in read_ready_units(self.path)}
+        with self.lock:
+            for key, remaining in self.remaining.items():
+                if not remaining and key not in streamed:
+                    self.emit(key)
+
+    def emit(self, key: str):
+        unit_jobs = self.units[key]
+        first = unit_jobs[0]
+        entry = {
+            'unit': key,
+            'expressivity': first['expressivity'],
+            'voice': first['voice'],
+            'emotion': first['emotion'],
+            'text_type': first['text_type'],
+            'reference': next((j['output_path'] for j in unit_jobs if j['kind'] == 'reference'), None),
+            'targets': [
+                {'scale': j['scale'], 'output_path': j['output_path']}
+                for j in unit_jobs if j['kind'] == 'sample'
+            ],
+            'timestamp': datetime.now().isoformat(),
+        }
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path, 'a') as f:
+            json.dump(entry, f)
+            f.write('\n')
+
+def read_ready_units(path: Path) -> List[Dict]:
+    if not path.exists():
+        return []
+    with open(path, 'r') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def iter_ready_units(experiment_name: str, follow: bool = False, poll_interval: float = 1.0) -> Iterator[Dict]:
+    """Yield ready units as they are written; with follow=True keep tailing like `tail -f`"""
+    path = RUNS_DIR / f"{experiment_name}_ready_units.jsonl"
+    position = 0
+    while True:
+        if path.exists():
+            with open(path, 'r') as f:
+                f.seek(position)
+                while True:
+                    line = f.readline()
+                    if not line.endswith('\n'):
+                        break
+                    position = f.tell()
+                    if line.strip():
+                        yield json.loads(line)
+        if not follow:
+            return
+        time.sleep(poll_interval)
+
+class GenerationOrchestrator:
+    """Runs planned jobs in API-sized batches across a thread pool"""
+
+    def __init__(self, client: TTSAPIClient, state: RunState, workers: int = 4, batch_size: int = 4,
+                 poll_interval: float = 1.0, max_attempts: int = 60, retries: int = 2,
+                 units: Optional[UnitTracker] = None, metrics: Optional[GenerationMetrics] = None):
+        self.client = client
+        self.state = state
+        self.units = units
+        self.metrics = metrics or GenerationMetrics()
+        self.client.on_step = self.metrics.step
+        self.workers = workers
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.retries = retries
+        self.lock = threading.Lock()
+        self.done = 0
+        self.failed: List[str] = []
+
+    def make_batches(self, jobs: List[Dict]) -> List[List[Dict]]:
+        return [jobs[i:i + self.batch_size] for i in range(0, len(jobs), self.batch_size)]
+
+    def process_batch(self, batch: List[Dict], total: int):
+        """Generate one batch, re-submitting only the failed members"""
+        pending = batch
+        for attempt in range(self.retries + 1):
+            self.metrics.batch_started(len(pending))
+            try:
+                outcomes = self.client.generate_batch(
+                    [job['request'] for job in pending],
+                    [REPO_ROOT / job['output_path'] for job in pending],
+                    self.max_attempts, self.poll_interval
+                )
+            finally:
+                self.metrics.batch_finished(len(pending))
+            retry = []
+            for job, outcome in zip(pending, outcomes):
+                if outcome['ok']:
+                    self.state.record(job, outcome)
+                    if self.units:
+                        self.units.mark_done(job)
+                    self.metrics.job_done()
+                    with self.lock:
+                        self.done += 1
+                        print(f"[{self.done}/{total}] ✅ {outcome['quality']}: {job['output_path']} "
+                              f"({outcome['bytes']/1024:.1f} KB)")
+                elif attempt < self.retries:
+                    retry.append(job)
+                else:
+                    self.state.record(job, outcome)
+                    self.metrics.job_failed(outcome['error'])
+                    with self.lock:
+                        self.failed.append(job['output_path'])
+                        print(f"❌ {job['output_path']}: {outcome['error']}")
+            if not retry:
+                return
+            pending = retry
+            time.sleep(2 ** attempt)
+
+    def run(self, jobs: List[Dict]):
+        total = len(jobs)
+        if self.units:
+            jobs = self.units.schedule(jobs)
+        batches = self.make_batches(jobs)
+        print(f"Generating {total} files in {len(batches)} batches with {self.workers} workers...")
+        self.metrics.start(total)
+
+        started = time.time()
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            futures = [pool.submit(self.process_batch, batch, total) for batch in batches]
+            for future in as_completed(futures):
+                future.result()
+
+        elapsed = time.time() - started
+        print("\n" + "="*70)
+        print("GENERATION COMPLETE")
+        print("="*70)
+        print(f"Success: {self.done}/{total}")
+        print(f"Failed: {len(self.failed)}")
+        print(f"Elapsed: {elapsed/60:.1f} min ({self.done / elapsed if elapsed else 0:.2f} files/s)")
+        return self.done, self.failed
+
+def planned_jobs(args) -> List[Dict]:
+    experiment = load_experiment(args.experiment)
+    return filter_plan(build_plan(experiment), args.voices, args.emotions, args.kind)
+
+def check_token(token: Optional[str]) -> str:
+    if not token:
+        raise SystemExit("An API token is required (--token or TTS_API_TOKEN)")
+    expires_at = token_expiry(token)
+    if expires_at is not None and expires_at <= time.time():
+        raise SystemExit(f"Token expired at {datetime.fromtimestamp(expires_at).isoformat()}")
+    return token.replace("Bearer ", "").strip()
+
+def make_orchestrator(args, state: RunState, units: UnitTracker) -> GenerationOrchestrator:
+    token = check_token(args.token)
+    client = TTSAPIClient(token, trace_file=args.traces,
+                          rate_limit=args.rate_limit, pool_size=args.workers * 2, verbose=False)
+    metrics = GenerationMetrics(args.experiment, token_expiry(token))
+    if args.metrics_port:
+        try:
+            server = MetricsServer(metrics, args.metrics_port).start()
+            print(f"Live metrics: {server.url}  (dashboard: python orchestrate.py dashboard {args.experiment})")
+        except OSError as e:
+            print(f"⚠️  Live metrics disabled, port {args.metrics_port} unavailable: {e}")
+    return GenerationOrchestrator(client, state, args.workers, args.batch_size,
+                                  args.poll_interval, args.max_attempts, args.retries, units, metrics)
+
+def cmd_plan(args):
+    jobs = planned_jobs(args)
+    existing = sum(1 for job in jobs if is_valid_wav(REPO_ROOT / job['output_path']))
+
+    print("="*70)
+    print(f"PLAN: {args.experiment}")
+    print("="*70)
+    print(f"Total files: {len(jobs)}")
+    for (kind, expressivity), count in sorted(Counter((j['kind'], j['expressivity']) for j in jobs).items()):
+        print(f"  {kind:<10} expressivity_{expressivity}: {count}")
+    print(f"Already on disk: {existing}")
+
+    todo = [job for job in jobs if not is_valid_wav(REPO_ROOT / job['output_path'])]
+    if todo:
+        planner = GenerationPlanner(StepLatencies(args.traces), args.workers, args.rate_limit,
+                                    args.batch_size, args.poll_interval)
+        estimate = planner.estimate([job['request'] for job in todo], runs=50)
+        print(f"\nEstimate for {len(todo)} remaining: {estimate['wall_time_p50']/60:.1f} min "
+              f"(p90 {estimate['wall_time_p90']/60:.1f} min), "
+              f"{estimate['bytes_downloaded']/1024/1024:.1f} MB, {estimate['characters']:,} chars")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(jobs, f, indent=2, ensure_ascii=False)
+        print(f"\nPlan saved to: {args.output}")
+
+def cmd_run(args):
+    jobs = planned_jobs(args)
+    state = RunState(args.experiment)
+    # Only the selected jobs start over; --voices/--emotions/--kind leave the rest of the log intact
+    state.reset({job['output_path'] for job in jobs})
+    units = UnitTracker(args.experiment, jobs, set())
+    units.reset()
+    make_orchestrator(args, state, units).run(jobs)
+
+def cmd_resume(args):
+    jobs = planned_jobs(args)
+    state = RunState(args.experiment)
+    completed = state.completed()
+    # A valid WAV on disk counts as done, logged or not (files from the legacy generation scripts)
+    todo = [job for job in jobs if not is_valid_wav(REPO_ROOT / job['output_path'])]
+    todo_paths = {job['output_path'] for job in todo}
+    accounted = todo_paths | completed
+    adopted = sum(1 for job in jobs if job['output_path'] not in accounted)
+    print(f"Resuming {args.experiment}: {len(jobs) - len(todo)} done ({adopted} found on disk only), "
+          f"{len(todo)} remaining")
+
+    units = UnitTracker(args.experiment, jobs, {j['output_path'] for j in jobs} - todo_paths)
+    units.emit_ready()
+    if todo:
+        make_orchestrator(args, state, units).run(todo)
+
+def cmd_verify(args):
+    jobs = planned_jobs(args)
+    missing = [job['output_path'] for job in jobs if not (REPO_ROOT / job['output_path']).exists()]
+    invalid = [
+        job['output_path'] for job in jobs
+        if job['output_path'] not in missing and not is_valid_wav(REPO_ROOT / job['output_path'])
+    ]
+
+    print(f"Expected files: {len(jobs)}")
+    print(f"Missing files: {len(missing)}")
+    print(f"Invalid files: {len(invalid)}")
+    for label, paths in (("Missing", missing), ("Invalid", invalid)):
+        for path in paths[:20]:
+            print(f"  {label}: {path}")
+        if len(paths) > 20:
+            print(f"  ... and {len(paths) - 20} more")
+
+    if missing or invalid:
+        print(f"\nRun `python orchestrate.py resume {args.experiment}` to fill the gaps")
+        sys.exit(1)
+    print("\n✓ All expected files are present and valid")
+
+def cmd_stats(args):
+    entries = RunState(args.experiment).entries()
+    if not entries:
+        print(f"No run recorded for {args.experiment}")
+        return
+
+    done = [e for e in entries if e['status'] == 'done']
+    failed = [e for e in entries if e['status'] == 'failed']
+    first = datetime.fromisoformat(entries[0]['timestamp'])
+    last = datetime.fromisoformat(entries[-1]['timestamp'])
+    span = (last - first).total_seconds()
+
+    print("="*70)
+    print(f"RUN STATS: {args.experiment}")
+    print("="*70)
+    print(f"Done: {len(done)}  Failed: {len(failed)}")
+    print(f"Downloaded: {sum(e['bytes'] for e in done)/1024/1024:.1f} MB")
+    print(f"Quality distribution: {dict(Counter(e['quality'] for e in done))}")
+    if span > 0:
+        print(f"Throughput: {len(done) / span:.2f} files/s over {span/60:.1f} min")
+    if failed:
+        print(f"Errors: {dict(Counter(e['error'] for e in failed))}")
+
+    latencies = StepLatencies(args.traces)
+    print("\nStep latencies (median seconds):")
+    for step, info in latencies.summary().items():
+        source = f"{info['samples']} traced" if info['samples'] else "default"
+        print(f"  {step:<11} {info['median']:>7.3f}  ({source})")
+
+def cmd_ready(args):
+    for unit in iter_ready_units(args.experiment, follow=args.follow):
+        print(json.dumps(unit, ensure_ascii=False), flush=True)
+
+def cmd_dashboard(args):
+    run_dashboard(f"http://127.0.0.1:{args.metrics_port}/metrics")
+
+def main():
+    parser = argparse.ArgumentParser(description='Plan, run and check TTS generation for an experiment version')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('experiment', help='Experiment name from config/experiments.yaml')
+    common.add_argument('--voices', nargs='+', help='Only these voices (e.g. v001)')
+    common.add_argument('--emotions', nargs='+', help='Only these emotions')
+    common.add_argument('--kind', choices=['reference', 'sample'], help='Only references or only samples')
+    common.add_argument('--traces', type=Path, default=TRACE_FILE, help='Step latency trace JSONL')
+    common.add_argument('--workers', type=int, default=4, help='Batches in flight (default: 4)')
+    common.add_argument('--rate-limit', type=float, default=10, help='Backend requests per second (default: 10)')
+    common.add_argument('--batch-size', type=int, default=4, help='Requests per batch (API limit: 4)')
+    common.add_argument('--poll-interval', type=float, default=1.0, help='Seconds between polls (default: 1.0)')
+
+    generate = argparse.ArgumentParser(add_help=False)
+    generate.add_argument('--token', default=os.environ.get('TTS_API_TOKEN'), help='API token')
+    generate.add_argument('--max-attempts', type=int, default=60, help='Polls before a batch times out')
+    generate.add_argument('--retries', type=int, default=2, help='Re-submissions for failed files')
+    generate.add_argument('--metrics-port', type=int, default=8787, help='Local live-metrics port (0 disables)')
+
+    plan = subparsers.add_parser('plan', parents=[common], help='Show the plan and a dry-run estimate')
+    plan.add_argument('--output', type=Path, help='Write the expanded plan as JSON')
+    plan.set_defaults(func=cmd_plan)
+
+    subparsers.add_parser('run', parents=[common, generate], help='Generate every planned file').set_defaults(func=cmd_run)
+    subparsers.add_parser('resume', parents=[common, generate], help='Generate only what is not done yet').set_defaults(func=cmd_resume)
+    subparsers.add_parser('verify', parents=[common], help='Check planned files exist and are valid WAVs').set_defaults(func=cmd_verify)
+    subparsers.add_parser('stats', parents=[common], help='Summarize the recorded run').set_defaults(func=cmd_stats)
+
+    ready = subparsers.add_parser('ready', parents=[common], help='Print completed evaluation units as JSON lines')
+    ready.add_argument('--follow', action='store_true', help='Keep streaming units as the run completes them')
+    ready.set_defaults(func=cmd_ready)
+
+    dashboard = subparsers.add_parser('dashboard', help='Terminal dashboard for a running job')
+    dashboard.add_argument('experiment', help='Experiment name (for display only)')
+    dashboard.add_argument('--metrics-port', type=int, default=8787, help='Port given to run/resume')
+    dashboard.set_defaults(func=cmd_dashboard)
+
+    args = parser.parse_args()
+    args.func(args)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+"""
+Dry-run planner for TTS batch generation
+Simulates the 4-step workflow (post -> poll -> cloudfront -> download) for a
+request plan using latency distributions recorded by TTSAPIClient traces, and
+estimates wall time, API calls per endpoint, bytes downloaded and character quota
+"""
+
+import argparse
+import heapq
+import json
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+from tts_api_client import TRACE_FILE, token_expiry
+
+# Fallback step latencies (seconds) used when no trace has been recorded yet
+DEFAULT_LATENCIES = {
+    'post': [1.0],
+    'poll': [0.4],
+    'render': [6.0],
+    'cloudfront': [0.3],
+    'download': [0.6],
+}
+DEFAULT_DOWNLOAD_BYTES = [400_000]
+
+# Endpoints that go through the rate-limited backend (download hits the CDN)
+RATE_LIMITED_STEPS = ('post', 'poll', 'cloudfront')
+
+class StepLatencies:
+    """Empirical per-step latency samples loaded from a trace file"""
+
+    def __init__(self, trace_file: Optional[Path] = None):
+        self.samples: Dict[str, List[float]] = {step: [] for step in DEFAULT_LATENCIES}
+        self.download_bytes: List[int] = []
+
+        if trace_file and trace_file.exists():
+            self.load(trace_file)
+
+        self.fallback_steps = [step for step, values in self.samples.items() if not values]
+        for step in self.fallback_steps:
+            self.samples[step] = list(DEFAULT_LATENCIES[step])
+        if not self.download_bytes:
+            self.download_bytes = list(DEFAULT_DOWNLOAD_BYTES)
+
+    def load(self, trace_file: Path):
+        """Collect successful step timings from a JSONL trace"""
+        with open(trace_file, 'r') as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                step = record.get('step')
+                if step not in self.samples or record.get('status', 200) != 200:
+                    continue
+                self.samples[step].append(float(record['elapsed']))
+                if step == 'download' and record.get('bytes'):
+                    self.download_bytes.append(int(record['bytes']))
+
+    def draw(self, step: str, rng: random.Random) -> float:
+        return rng.choice(self.samples[step])
+
+    def summary(self) -> Dict[str, Dict]:
+        return {
+            step: {
+                'samples': 0 if step in self.fallback_steps else len(values),
+                'median': round(statistics.median(values), 3),
+            }
+            for step, values in self.samples.items()
+        }
+
+def load_plan(plan_file: Path) -> List[Dict]:
+    """Load a request plan (api_requests.json format or a list of bare requests)"""
+    with open(plan_file, 'r', encoding='utf-8') as f:
+        plan = json.load(f)
+    if isinstance(plan, dict):
+        plan = plan.get('requests') or plan.get('samples') or []
+    return [item.get('request', item) for item in plan]
+
+class GenerationPlanner:
+    """Discrete-event simulation of a batched generation run"""
+
+    def __init__(self, latencies: StepLatencies, concurrency: int = 1, rate_limit: float = 10,
+                 batch_size: int = 4, poll_interval: float = 0.5):
+        self.latencies = latencies
+        self.concurrency = max(1, concurrency)
+        self.rate_limit = rate_limit
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+
+    def batch_steps(self, batch_len: int, rng: random.Random, calls: Dict[str, int],
+                    totals: Dict[str, int]) -> Iterator:
+        """Yield (kind, step, duration) actions for one batch; receives the clock via send()"""
+        now = yield ('api', 'post', self.latencies.draw('post', rng))
+        calls['post'] += 1
+
+        ready_at = now + self.latencies.draw('render', rng)
+        while True:
+            now = yield ('api', 'poll', self.latencies.draw('poll', rng))
+            calls['poll'] += 1
+            if now >= ready_at:
+                break
+            yield ('wait', None, self.poll_interval)
+
+        for _ in range(batch_len):
+            yield ('api', 'cloudfront', self.latencies.draw('cloudfront', rng))
+            calls['cloudfront'] += 1
+            yield ('cdn', 'download', self.latencies.draw('download', rng))
+            calls['download'] += 1
+            totals['bytes'] += rng.choice(self.latencies.download_bytes)
+
+    def simulate_once(self, num_requests: int, rng: random.Random) -> Dict:
+        """Run one simulated generation and return its wall time and counters"""
+        calls = {'post': 0, 'poll': 0, 'cloudfront': 0, 'download': 0}
+        totals = {'bytes': 0}
+
+        batch_sizes = [min(self.batch_size, num_requests - i)
+                       for i in range(0, num_requests, self.batch_size)]
+        pending = iter(batch_sizes)
+
+        def worker() -> Iterator:
+            for batch_len in pending:
+                yield from self.batch_steps(batch_len, rng, calls, totals)
+
+        # Heap of (resume_time, seq, worker, value_to_send)
+        heap = []
+        for seq in range(min(self.concurrency, len(batch_sizes))):
+            heap.append((0.0, seq, worker(), None))
+        heapq.heapify(heap)
+        seq = len(heap)
+        next_slot = 0.0
+        wall_time = 0.0
+        min_gap = 1.0 / self.rate_limit if self.rate_limit else 0.0
+
+        while heap:
+            now, _, gen, value = heapq.heappop(heap)
+            wall_time = max(wall_time, now)
+            try:
+                kind, step, duration = gen.send(value)
+            except StopIteration:
+                continue
+
+            start = now
+            if kind == 'api' and step in RATE_LIMITED_STEPS:
+                start = max(now, next_slot)
+                next_slot = start + min_gap
+            end = start + duration
+            seq += 1
+            heapq.heappush(heap, (end, seq, gen, end))
+
+        return {'wall_time': wall_time, 'calls': calls, 'bytes': totals['bytes']}
+
+    def estimate(self, requests_data: List[Dict], runs: int = 200, seed: int = 0) -> Dict:
+        """Monte Carlo estimate over several simulated runs"""
+        rng = random.Random(seed)
+        outcomes = [self.simulate_once(len(requests_data), rng) for _ in range(runs)]
+        wall_times = sorted(o['wall_time'] for o in outcomes)
+
+        def percentile(values: List[float], q: float) -> float:
+            return values[min(len(values) - 1, int(q * len(values)))]
+
+        return {
+            'requests': len(requests_data),
+            'batches': (len(requests_data) + self.batch_size - 1) // self.batch_size,
+            'concurrency': self.concurrency,
+            'rate_limit': self.rate_limit,
+            'wall_time_p50': round(percentile(wall_times, 0.5), 1),
+            'wall_time_p90': round(percentile(wall_times, 0.9), 1),
+            'api_calls': {
+                step: round(statistics.mean(o['calls'][step] for o in outcomes), 1)
+                for step in outcomes[0]['calls']
+            } if outcomes else {},
+            'bytes_downloaded': int(statistics.mean(o['bytes'] for o in outcomes)) if outcomes else 0,
+            'characters': sum(len(r.get('text') or '') for r in requests_data),
+        }
+
+def token_fit(token: Optional[str], wall_time: float) -> Optional[Dict]:
+    """Check whether a run of wall_time seconds finishes before the token expires"""
+    if not token:
+        return None
+    expires_at = token_expiry(token)
+    if expires_at is None:
+        return None
+    remaining = expires_at - time.time()
+    return {
+        'expires_at': datetime.fromtimestamp(expires_at).isoformat(),
+        'remaining_seconds': round(remaining),
+        'fits': remaining >= wall_time,
+    }
+
+def print_report(estimate: Dict, latencies: StepLatencies, fit: Optional[Dict]):
+    print("="*70)
+    print("GENERATION DRY RUN")
+    print("="*70)
+    print(f"Requests: {estimate['requests']} in {estimate['batches']} batches")
+    print(f"Concurrency: {estimate['concurrency']}  Rate limit: {estimate['rate_limit']} req/s")
+
+    print("\nStep latencies (median seconds):")
+    for step, info in latencies.summary().items():
+        source = f"{info['samples']} traced" if info['samples'] else "default"
+        print(f"  {step:<11} {info['median']:>7.3f}  ({source})")
+
+    print(f"\nExpected wall time: {estimate['wall_time_p50']/60:.1f} min "
+          f"(p90 {estimate['wall_time_p90']/60:.1f} min)")
+    print("API calls per endpoint:")
+    for step, count in estimate['api_calls'].items():
+        print(f"  {step:<11} {count:>8.1f}")
+    print(f"Bytes downloaded: {estimate['bytes_downloaded']/1024/1024:.1f} MB")
+    print(f"Character quota: {estimate['characters']:,} chars")
+
+    if fit is None:
+        print("\nToken expiry: unknown (pass --token or set TTS_API_TOKEN)")
+    elif fit['fits']:
+        print(f"\n✓ Fits before token expiry ({fit['remaining_seconds']/60:.1f} min left, "
+              f"expires {fit['expires_at']})")
+    else:
+        print(f"\n✗ Does NOT fit before token expiry ({fit['remaining_seconds']/60:.1f} min left, "
+              f"expires {fit['expires_at']})")
+
+def main():
+    parser = argparse.ArgumentParser(description='Dry-run time/request/cost estimate for a TTS generation plan')
+    parser.add_argument('plan', type=Path, help='Request plan JSON (e.g. data/api_requests.json)')
+    parser.add_argument('--traces', type=Path, default=TRACE_FILE, help='Latency trace JSONL recorded by TTSAPIClient')
+    parser.add_argument('--concurrency', type=int, default=1, help='Parallel batches in flight (default: 1)')
+    parser.add_argument('--rate-limit', type=float, default=10, help='Backend requests per second (default: 10)')
+    parser.add_argument('--batch-size', type=int, default=4, help='Requests per batch (API limit: 4)')
+    parser.add_argument('--poll-interval', type=float, default=0.5, help='Seconds between polls (default: 0.5)')
+    parser.add_argument('--runs', type=int, default=200, help='Monte Carlo runs (default: 200)')
+    parser.add_argument('--token', default=os.environ.get('TTS_API_TOKEN'), help='API token to check expiry against')
+    parser.add_argument('--json', type=Path, help='Also write the estimate to this JSON file')
+
+    args = parser.parse_args()
+
+    requests_data = load_plan(args.plan)
+    if not requests_data:
+        print(f"No requests found in {args.plan}")
+        sys.exit(1)
+
+    latencies = StepLatencies(args.traces)
+    planner = GenerationPlanner(latencies, args.concurrency, args.rate_limit,
+                                args.batch_size, args.poll_interval)
+    estimate = planner.estimate(requests_data, runs=args.runs)
+    fit = token_fit(args.token, estimate['wall_time_p90'])
+
+    print_report(estimate, latencies, fit)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({**estimate, 'token': fit}, f, indent=2)
+        print(f"\nEstimate saved to: {args.json}")
+
+if __name__ == "__main__":
+    main()
@@ -4,6 +4,7 @@ Test script to verify the actual TTS API endpoint
 Tests with a simple request to validate API response and audio generation
 """
 
+import os
 import requests
 import json
 from pathlib import Path
@@ -11,7 +12,16 @@ import time
 import sys
 from urllib.parse import urljoin, urlparse
 
-def download_audio_file(audio_path: str, api_key: str) -> bool:
+from cassette import transport_from_env
+
+# Live backend by default; set TTS_CASSETTE to record or replay offline
+http = transport_from_env()
+
+def default_output_dir() -> Path:
+    """TTS_OUTPUT_DIR (e.g. for cassette replays) or data/voices"""
+    return Path(os.environ.get('TTS_OUTPUT_DIR') or Path(__file__).parent.parent / 'data' / 'voices')
+
+def download_audio_file(audio_path: str, api_key: str, output_dir=None) -> bool:
     """Download audio file from the provided path"""
     
     print(f"\nDownloading audio file from: {audio_path}")
@@ -32,7 +42,7 @@ def download_audio_file(audio_path: str, api_key: str) -> bool:
     }
     
     try:
-        download_response = requests.get(
+        download_response = http.get(
             download_url,
             headers=headers,
             timeout=30
@@ -43,7 +53,7 @@ def download_audio_file(audio_path: str, api_key: str) -> bool:
             print(f"✓ Downloaded {content_length} bytes ({content_length/1024:.1f} KB)")
             
             # Save test audio file
-            test_output = Path(__file__).parent.parent / 'data' / 'voices' / 'api_test_downloaded.wav'
+            test_output = Path(output_dir or default_output_dir()) / 'api_test_downloaded.wav'
             test_output.parent.mkdir(parents=True, exist_ok=True)
             
             with open(test_output, 'wb') as f:
@@ -62,7 +72,7 @@ def download_audio_file(audio_path: str, api_key: str) -> bool:
         print(f"✗ Download error: {str(e)}")
         return False
 
-def test_api_endpoint():
+def test_api_endpoint(api_key=None, output_dir=None):
     """Test the TTS API with a simple request"""
     
     # API Configuration
@@ -95,8 +105,8 @@ def test_api_endpoint():
     print(json.dumps(test_request, indent=2))
     print()
     
-    # Get API key from user input or environment
-    api_key = input("Enter your API key: ").strip()
+    # Get API key from the caller or user input
+    api_key = api_key or input("Enter your API key: ").strip()
     if not api_key:
         print("No API key provided. Exiting.")
         return False, "No API key"
@@ -113,7 +123,7 @@ def test_api_endpoint():
         auth_method = list(headers.keys())[-1]  # Get the auth header name
         print(f"\nTrying authentication method: {auth_method}")
         
-        success, message = try_api_request(api_endpoint, test_request, headers, api_key)
+        success, message = try_api_request(api_endpoint, test_request, headers, api_key, output_dir)
         if success:
             return success, message
         elif "401" not in message:  # If not auth error, don't try other methods
@@ -121,14 +131,14 @@ def test_api_endpoint():
     
     return False, "All authentication methods failed"
 
-def try_api_request(api_endpoint: str, test_request: dict, headers: dict, api_key: str):
+def try_api_request(api_endpoint: str, test_request: dict, headers: dict, api_key: str, output_dir=None):
     """Try API request with specific headers"""
     
     try:
         print("Sending request to API...")
         start_time = time.time()
         
-        response = requests.post(
+        response = http.post(
             api_endpoint,
             json=test_request,
             headers=headers,
@@ -158,7 +168,7 @@ def try_api_request(api_endpoint: str, test_request: dict, headers: dict, api_ke
                     print(f"\n✓ Found audio_path: {audio_path}")
                     
                     # Download the audio file
-                    success = download_audio_file(audio_path, api_key)
+                    success = download_audio_file(audio_path, api_key, output_dir)
                     if success:
                         return True, "API test and audio download successful"
                     else:
@@ -180,7 +190,7 @@ def try_api_request(api_endpoint: str, test_request: dict, headers: dict, api_ke
                     print("✓ Response appears to be direct audio data")
                     
                     # Save test audio file
-                    test_output = Path(__file__).parent.parent / 'data' / 'voices' / 'api_test.wav'
+                    test_output = Path(output_dir or default_output_dir()) / 'api_test.wav'
                     test_output.parent.mkdir(parents=True, exist_ok=True)
                     
                     with open(test_output, 'wb') as f:
@@ -3,13 +3,23 @@
 Simple API test script for TTS endpoint with audio_path workflow
 """
 
+import os
 import requests
 import json
 from pathlib import Path
 import sys
 from urllib.parse import urljoin
 
-def download_audio_file(audio_path: str, api_key: str) -> bool:
+from cassette import transport_from_env
+
+# Live backend by default; set TTS_CASSETTE to record or replay offline
+http = transport_from_env()
+
+def default_output_dir() -> Path:
+    """TTS_OUTPUT_DIR (e.g. for cassette replays) or data/voices"""
+    return Path(os.environ.get('TTS_OUTPUT_DIR') or Path(__file__).parent.parent / 'data' / 'voices')
+
+def download_audio_file(audio_path: str, api_key: str, output_dir=None) -> bool:
     """Download audio file from the provided path"""
     
     print(f"\nDownloading audio file from: {audio_path}")
@@ -35,14 +45,14 @@ def download_audio_file(audio_path: str, api_key: str) -> bool:
     for headers in auth_headers:
         try:
             print(f"Trying download with headers: {list(headers.keys())}")
-            download_response = requests.get(download_url, headers=headers, timeout=30)
+            download_response = http.get(download_url, headers=headers, timeout=30)
             
             if download_response.status_code == 200:
                 content_length = len(download_response.content)
                 print(f"✓ Downloaded {content_length} bytes ({content_length/1024:.1f} KB)")
                 
                 # Save test audio file
-                test_output = Path(__file__).parent.parent / 'data' / 'voices' / 'api_test_real.wav'
+                test_output = Path(output_dir or default_output_dir()) / 'api_test_real.wav'
                 test_output.parent.mkdir(parents=True, exist_ok=True)
                 
                 with open(test_output, 'wb') as f:
@@ -59,15 +69,15 @@ def download_audio_file(audio_path: str, api_key: str) -> bool:
     
     return False
 
-def test_tts_api():
+def test_tts_api(api_key=None, output_dir=None):
     """Test the TTS API with authentication"""
     
     api_endpoint = "https://dev.icepeak.ai/api/speak/batch/post"
     
-    # Get API key
-    if len(sys.argv) > 1:
+    # Get API key (argument, command line or prompt)
+    if not api_key and len(sys.argv) > 1:
         api_key = sys.argv[1]
-    else:
+    elif not api_key:
         api_key = input("Enter your API key: ").strip()
     
     if not api_key:
@@ -115,7 +125,7 @@ def test_tts_api():
         }
         
         try:
-            response = requests.post(api_endpoint, json=test_request, headers=headers, timeout=30)
+            response = http.post(api_endpoint, json=test_request, headers=headers, timeout=30)
             
             print(f"Status: {response.status_code}")
             
@@ -134,7 +144,7 @@ def test_tts_api():
                         print(f"\n✓ Found audio_path: {audio_path}")
                         
                         # Download the audio
-                        if download_audio_file(audio_path, api_key):
+                        if download_audio_file(audio_path, api_key, output_dir):
                             print("\n🎉 COMPLETE SUCCESS: API call + audio download working!")
                             return True
                         else:
@@ -150,7 +160,7 @@ def test_tts_api():
                     if 'audio' in content_type or len(response.content) > 10000:
                         print("✓ Appears to be direct audio data")
                         
-                        test_output = Path(__file__).parent.parent / 'data' / 'voices' / 'api_test_direct.wav'
+                        test_output = Path(output_dir or default_output_dir()) / 'api_test_direct.wav'
                         test_output.parent.mkdir(parents=True, exist_ok=True)
                         
                         with open(test_output, 'wb') as f:
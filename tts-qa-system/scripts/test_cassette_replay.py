@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Offline regression run of the API test scripts against their checked-in cassettes
+Each scenario replays cassettes/<scenario> through its script (no network, output in
+a temporary directory) with TTS_CASSETTE_TIMING set to the baseline's factor, so
+every replayed call waits its recorded latency scaled down. The run then checks what
+was measured during the replay against the cassette's baseline.json:
+  - the script's result is unchanged
+  - the whole run and each step's median call time stay within --tolerance
+  - each step makes exactly as many requests (extra polls, retries or skipped steps fail)
+
+Re-record a scenario against the live backend by deleting its interactions.jsonl and
+running the script with TTS_CASSETTE=cassettes/<scenario> TTS_CASSETTE_MODE=record;
+a slower backend then fails the check until the new timings are accepted with
+--write-baseline.
+
+Usage:
+  python test_cassette_replay.py
+  python test_cassette_replay.py --scenario generation_flow real_batch --tolerance 1.5
+  python test_cassette_replay.py --scenario api_simple --write-baseline --timing 0.05
+"""
+
+import argparse
+import importlib
+import json
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from cassette import REGRESSION_TOLERANCE, transport_from_env
+
+CASSETTES_DIR = Path(__file__).parent / 'cassettes'
+# Replays wait this fraction of each recorded latency unless the baseline says otherwise
+DEFAULT_TIMING = 0.05
+# A replay must stay an offline, seconds-long run
+MAX_REPLAY_SECONDS = 10.0
+# Stands in for the API key scripts would prompt for; headers are not part of cassette keys
+REPLAY_KEY = 'cassette-replay'
+
+# scenario -> (script module, call(module, output_dir, http) -> JSON-serializable result)
+SCENARIOS = {
+    'generation_flow': ('test_generation_flow', lambda module, output_dir, http: module.test_generation_flow(output_dir)),
+    'api_simple': ('test_api_simple', lambda module, output_dir, http: module.test_tts_api(REPLAY_KEY, output_dir)),
+    'api_endpoint': ('test_api_endpoint',
+                     lambda module, output_dir, http: list(module.test_api_endpoint(REPLAY_KEY, output_dir))),
+    'emotions_api': ('test_emotions_api', lambda module, output_dir, http: module.test_emotion_labels_and_vectors()),
+    'complete_compatibility': ('test_complete_compatibility',
+                               lambda module, output_dir, http: module.test_complete_compatibility(output_dir)),
+    'real_batch': ('test_real_batch', lambda module, output_dir, http: module.test_small_batch(output_dir, http)),
+}
+
+def load_scenario(name: str, mode: str = 'replay', timing: float = 0.0):
+    """Import a scenario's script on its cassette; returns (module, transport)"""
+    # The scripts build their transport at import time
+    os.environ['TTS_CASSETTE'] = str(CASSETTES_DIR / name)
+    os.environ['TTS_CASSETTE_MODE'] = mode
+    os.environ['TTS_CASSETTE_TIMING'] = str(timing)
+    module = importlib.import_module(SCENARIOS[name][0])
+    return module, getattr(module, 'http', None) or transport_from_env()
+
+def run_scenario(name: str, timing: float):
+    """Replay one scenario; returns (transport, result, run seconds, written WAVs that are not RIFF)"""
+    module, http = load_scenario(name, 'replay', timing)
+    with tempfile.TemporaryDirectory() as output_dir:
+        started = time.time()
+        result = SCENARIOS[name][1](module, output_dir, http)
+        elapsed = time.time() - started
+        invalid = [f.name for f in Path(output_dir).glob('*.wav') if not f.read_bytes().startswith(b'RIFF')]
+    return http, result, elapsed, invalid
+
+def main():
+    parser = argparse.ArgumentParser(description='Replay the API test cassettes and check their timings')
+    parser.add_argument('--scenario', nargs='+', choices=sorted(SCENARIOS), help='Scenarios to run (default: all)')
+    parser.add_argument('--tolerance', type=float, default=REGRESSION_TOLERANCE,
+                        help='Allowed slowdown factor (default: %(default)s)')
+    parser.add_argument('--write-baseline', action='store_true', help="Accept this replay's measurements")
+    parser.add_argument('--timing', type=float, default=DEFAULT_TIMING,
+                        help='Latency factor for --write-baseline (default: %(default)s)')
+
+    args = parser.parse_args()
+
+    failures = []
+    for name in args.scenario or SCENARIOS:
+        baseline_file = CASSETTES_DIR / name / 'baseline.json'
+        if not args.write_baseline and not baseline_file.exists():
+            failures.append(f"{name}: no baseline.json (run with --write-baseline)")
+            continue
+        if args.write_baseline:
+            timing = args.timing
+        else:
+            with open(baseline_file, 'r') as f:
+                timing = json.load(f)['timing']
+
+        http, result, elapsed, invalid = run_scenario(name, timing)
+        print(f"\n{'='*70}")
+        print(f"{name}: result {result!r} in {elapsed:.2f}s (timing x{timing:g})")
+        for step, median in sorted(http.measured_medians().items()):
+            print(f"  {step:<11} {http.request_counts()[step]:4d} request(s), median={median:.3f}s")
+
+        if invalid:
+            failures.append(f"{name}: invalid WAV(s) written: {invalid}")
+        if elapsed > MAX_REPLAY_SECONDS:
+            failures.append(f"{name}: replay took {elapsed:.1f}s (limit {MAX_REPLAY_SECONDS:g}s)")
+        if args.write_baseline:
+            http.write_baseline(elapsed, result)
+            print(f"💾 Baseline written: {baseline_file}")
+        else:
+            failures += [f"{name}: {failure}" for failure in http.check_baseline(elapsed, result, args.tolerance)]
+
+    print(f"\n{'='*70}")
+    if failures:
+        for failure in failures:
+            print(f"❌ {failure}")
+        sys.exit(1)
+    print("✅ Replay and timing checks passed")
+
+if __name__ == "__main__":
+    main()
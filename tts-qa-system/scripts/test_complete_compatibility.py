@@ -6,12 +6,19 @@ Test complete compatibility matrix for TTS API
 - Multiple scales: 0.5, 1.0, 1.5, 2.0, 2.5, 3.0
 """
 
+import os
 import requests
 import time
 import json
 from pathlib import Path
 
-def test_complete_compatibility():
+from cassette import transport_from_env
+
+# Live backend by default; set TTS_CASSETTE to record or replay offline
+http = transport_from_env()
+REPLAYING = getattr(http, 'mode', None) == 'replay'
+
+def test_complete_compatibility(output_dir=None):
     """Test all combinations of actors, emotions, and scales"""
     
     print("=" * 80)
@@ -69,7 +76,7 @@ def test_complete_compatibility():
         }]
         
         try:
-            response = requests.post(f"{base_url}/api/speak/batch/post", 
+            response = http.post(f"{base_url}/api/speak/batch/post", 
                                    headers=headers, json=test_request, timeout=10)
             
             if response.status_code == 200:
@@ -137,7 +144,7 @@ def test_complete_compatibility():
                 
                 try:
                     # Test request phase
-                    response = requests.post(f"{base_url}/api/speak/batch/post",
+                    response = http.post(f"{base_url}/api/speak/batch/post",
                                            headers=headers, json=test_request, timeout=10)
                     
                     if response.status_code == 200:
@@ -147,7 +154,7 @@ def test_complete_compatibility():
                         if speak_urls:
                             # Test generation phase (quick check)
                             for attempt in range(5):  # Quick test, don't wait long
-                                poll_response = requests.post(f"{base_url}/api/speak/batch/get",
+                                poll_response = http.post(f"{base_url}/api/speak/batch/get",
                                                             headers=headers, json=speak_urls, timeout=10)
                                 
                                 if poll_response.status_code == 200:
@@ -166,8 +173,9 @@ def test_complete_compatibility():
                                     print("❌ POLL FAILED")
                                     results[voice_name]["emotions"][emotion][scale] = "poll_failed"
                                     break
-                                    
-                                time.sleep(0.5)
+                                
+                                if not REPLAYING:
+                                    time.sleep(0.5)
                             else:
                                 print("⏳ TIMEOUT (still processing)")
                                 results[voice_name]["emotions"][emotion][scale] = "timeout"
@@ -183,8 +191,8 @@ def test_complete_compatibility():
                     print(f"❌ ERROR: {str(e)}")
                     results[voice_name]["emotions"][emotion][scale] = f"error: {str(e)}"
                 
-                # Rate limiting
-                if test_count < total_tests:
+                # Rate limiting (a replay never reaches the backend)
+                if test_count < total_tests and not REPLAYING:
                     time.sleep(1)
     
     # Generate comprehensive report
@@ -246,8 +254,8 @@ def test_complete_compatibility():
     if not working_combinations:
         print("  ❌ No working emotion combinations found!")
     
-    # Save detailed results
-    output_dir = Path(__file__).parent.parent / 'data'
+    # Save detailed results (TTS_OUTPUT_DIR overrides, e.g. for cassette replays)
+    output_dir = Path(output_dir or os.environ.get('TTS_OUTPUT_DIR') or Path(__file__).parent.parent / 'data')
     output_dir.mkdir(parents=True, exist_ok=True)
     results_file = output_dir / 'compatibility_test_results.json'
     
@@ -8,6 +8,11 @@ import json
 import time
 from pathlib import Path
 
+from cassette import transport_from_env
+
+# Live backend by default; set TTS_CASSETTE to record or replay offline
+http = transport_from_env()
+
 def test_emotion_labels_and_vectors():
     """Test the actual emotion labels and vector IDs from the test sentences file"""
     
@@ -129,7 +134,7 @@ def test_emotion_labels_and_vectors():
         print(f"   emotion_scale: {test_case['request']['emotion_scale']}")
         
         try:
-            response = requests.post(
+            response = http.post(
                 f"{base_url}/api/speak/batch/post", 
                 headers=headers, 
                 json=[test_case['request']],  # Wrap in array
@@ -3,13 +3,20 @@
 Test the complete generation flow with a few samples
 """
 
+import os
 import time
 import requests
 import json
 from pathlib import Path
 
-def test_generation_flow():
-    """Test generating a few samples to debug the flow"""
+from cassette import transport_from_env
+
+# Live backend by default; set TTS_CASSETTE to record or replay offline
+http = transport_from_env()
+REPLAYING = getattr(http, 'mode', None) == 'replay'
+
+def test_generation_flow(output_dir=None):
+    """Test generating a few samples to debug the flow; returns the number generated"""
     
     print("=" * 70)
     print("TESTING GENERATION FLOW")
@@ -21,8 +28,8 @@ def test_generation_flow():
     headers = {"Authorization": f"Bearer {token}"}
     host = "https://dev.icepeak.ai"
     
-    # Output directory
-    output_dir = Path(__file__).parent.parent / 'data' / 'voices'
+    # Output directory (TTS_OUTPUT_DIR overrides, e.g. for cassette replays)
+    output_dir = Path(output_dir or os.environ.get('TTS_OUTPUT_DIR') or Path(__file__).parent.parent / 'data' / 'voices')
     output_dir.mkdir(parents=True, exist_ok=True)
     
     # Test samples
@@ -86,8 +93,8 @@ def test_generation_flow():
         if process_sample(speak_data, headers, host, output_dir, sample["filename"]):
             success_count += 1
         
-        # Rate limiting between requests
-        if i < len(test_samples):
+        # Rate limiting between requests (a replay never reaches the backend)
+        if i < len(test_samples) and not REPLAYING:
             print(f"   Waiting 2 seconds...")
             time.sleep(2)
     
@@ -103,6 +110,8 @@ def test_generation_flow():
     for file in sorted(wav_files):
         size_kb = file.stat().st_size / 1024
         print(f"  {file.name} ({size_kb:.1f} KB)")
+    
+    return success_count
 
 def process_sample(speak_data, headers, host, output_dir, filename):
     """Process a single TTS sample using the notebook approach"""
@@ -110,7 +119,7 @@ def process_sample(speak_data, headers, host, output_dir, filename):
     try:
         # Step 1: Request generation
         print(f"   Step 1: Requesting TTS generation...")
-        speak_response = requests.post(f"{host}/api/speak/batch/post", headers=headers, json=speak_data, timeout=10)
+        speak_response = http.post(f"{host}/api/speak/batch/post", headers=headers, json=speak_data, timeout=10)
         
         if speak_response.status_code != 200:
             print(f"   ❌ Request failed: {speak_response.status_code}")
@@ -134,7 +143,7 @@ def process_sample(speak_data, headers, host, output_dir, filename):
         # Step 2: Poll for completion
         print(f"   Step 3: Polling for completion...")
         for attempt in range(30):  # Increased timeout
-            poll_response = requests.post(f"{host}/api/speak/batch/get", headers=headers, json=speak_urls, timeout=10)
+            poll_response = http.post(f"{host}/api/speak/batch/get", headers=headers, json=speak_urls, timeout=10)
             
             if poll_response.status_code != 200:
                 print(f"   ❌ Poll failed: {poll_response.status_code}")
@@ -148,7 +157,7 @@ def process_sample(speak_data, headers, host, output_dir, filename):
                 # Step 3: Get download URL
                 print(f"   Step 4: Getting download URL...")
                 audio_url = poll_result["audio"]["url"]
-                audio_response = requests.get(audio_url + "/cloudfront", headers=headers, timeout=10)
+                audio_response = http.get(audio_url + "/cloudfront", headers=headers, timeout=10)
                 
                 if audio_response.status_code != 200:
                     print(f"   ❌ CloudFront URL failed: {audio_response.status_code}")
@@ -160,7 +169,7 @@ def process_sample(speak_data, headers, host, output_dir, filename):
                 
                 # Step 4: Download audio
                 print(f"   Step 6: Downloading audio...")
-                real_audio_response = requests.get(real_audio_url, timeout=30)
+                real_audio_response = http.get(real_audio_url, timeout=30)
                 
                 if real_audio_response.status_code != 200:
                     print(f"   ❌ Audio download failed: {real_audio_response.status_code}")
@@ -180,7 +189,8 @@ def process_sample(speak_data, headers, host, output_dir, filename):
                 return False
             
             # Still processing
-            time.sleep(0.5)
+            if not REPLAYING:
+                time.sleep(0.5)
         
         print("   ❌ Timeout waiting for completion")
         return False
@@ -4,12 +4,13 @@ Test real TTS generation with a small batch of different sample types
 """
 
 import json
+import os
 import sys
 from pathlib import Path
 from tts_api_client import TTSAPIClient
 
-def test_small_batch():
-    """Test with a few samples of different types"""
+def test_small_batch(output_dir=None, http=None):
+    """Test with a few samples of different types (http: transport, e.g. a Cassette)"""
     
     print("="*70)
     print("TESTING REAL TTS GENERATION - SMALL BATCH")
@@ -70,8 +71,10 @@ def test_small_batch():
             print("Reference (normal-1)")
     
     # Initialize API client
-    client = TTSAPIClient(token)
-    output_dir = Path(__file__).parent.parent / 'data' / 'voices'
+    client = TTSAPIClient(token, http=http)
+    # TTS_OUTPUT_DIR overrides, e.g. for cassette replays
+    output_dir = Path(output_dir or os.environ.get('TTS_OUTPUT_DIR') or Path(__file__).parent.parent / 'data' / 'voices')
+    output_dir.mkdir(parents=True, exist_ok=True)
     
     # Generate the test batch
     print(f"\nGenerating test samples...")
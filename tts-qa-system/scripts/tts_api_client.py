@@ -8,18 +8,103 @@ Proper TTS API Client following the 4-step asynchronous workflow:
 """
 
 import requests
+import base64
 import json
 import time
+from datetime import datetime
 from pathlib import Path
 from typing import Dict, List, Optional, Tuple
 import sys
+import threading
+
+from cassette import transport_from_env
+
+# Default location for per-step latency traces used by plan_generation.py
+TRACE_FILE = Path(__file__).parent.parent / 'data' / 'generation_traces.jsonl'
+
+def token_expiry(token: str) -> Optional[float]:
+    """Return the JWT 'exp' claim as a Unix timestamp (no signature check)"""
+    token = token.replace("Bearer ", "").strip()
+    try:
+        payload = token.split(".")[1]
+        payload += "=" * (-len(payload) % 4)
+        claims = json.loads(base64.urlsafe_b64decode(payload))
+        return float(claims["exp"])
+    except (IndexError, KeyError, ValueError):
+        return None
+
+def select_audio_url(result: Dict) -> Tuple[Optional[str], Optional[str]]:
+    """Pick the best available audio URL: hd1 > high > standard > low"""
+    audio_section = result.get("audio", {})
+    
+    # 'high' is standard quality on this backend; hd1 is the real high quality tier
+    if audio_section.get("hd1", {}).get("url"):
+        return audio_section["hd1"]["url"], "hd1"
+    if audio_section.get("high", {}).get("url"):
+        return audio_section["high"]["url"], "high"
+    if audio_section.get("url"):
+        return audio_section["url"], "standard"
+    if audio_section.get("low", {}).get("url"):
+        return audio_section["low"]["url"], "low"
+    return None, None
+
+class RateLimiter:
+    """Thread-safe minimum spacing between backend calls"""
+    
+    def __init__(self, rate_limit: Optional[float]):
+        self.interval = 1.0 / rate_limit if rate_limit else 0.0
+        self.next_slot = 0.0
+        self.lock = threading.Lock()
+    
+    def wait(self):
+        if not self.interval:
+            return
+        with self.lock:
+            now = time.monotonic()
+            slot = max(now, self.next_slot)
+            self.next_slot = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
 
 class TTSAPIClient:
-    def __init__(self, token: str):
+    def __init__(self, token: str, trace_file: Optional[Path] = None, http=None,
+                 rate_limit: Optional[float] = None, pool_size: int = 10, verbose: bool = True):
         # Extract token from Jupyter notebook
         self.token = token
         self.headers = {"Authorization": f"Bearer {self.token}"}
         self.base_url = "https://dev.icepeak.ai"
+        self.trace_file = trace_file
+        self.trace_lock = threading.Lock()
+        # Optional callback(step, elapsed, status), e.g. GenerationMetrics.step
+        self.on_step = None
+        # Pooled session shared by all worker threads, or a Cassette for offline record/replay
+        self.http = http or transport_from_env(pool_size)
+        self.limiter = RateLimiter(rate_limit)
+        self.verbose = verbose
+    
+    def log(self, *args, **kwargs):
+        """Step-by-step progress output; silenced when the client runs inside a worker pool"""
+        if self.verbose:
+            print(*args, **kwargs)
+    
+    def record_trace(self, step: str, elapsed: float, **fields):
+        """Append one step timing to the trace file (no-op when tracing is off)"""
+        if self.on_step:
+            self.on_step(step, elapsed, fields.get('status'))
+        if not self.trace_file:
+            return
+        
+        record = {
+            'step': step,
+            'elapsed': round(elapsed, 4),
+            'timestamp': datetime.now().isoformat(),
+            **fields
+        }
+        with self.trace_lock:
+            self.trace_file.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.trace_file, 'a') as f:
+                json.dump(record, f)
+                f.write('\n')
         
     def create_request_payload(self, text: str, actor_id: str, style_label: str = "normal-1", 
                               emotion_vector_id: Optional[str] = None, emotion_scale: float = 1.0) -> Dict:
@@ -51,68 +136,89 @@ class TTSAPIClient:
     def step1_request_generation(self, requests_data: List[Dict]) -> Optional[List[str]]:
         """Step 1: Send TTS generation request"""
         
-        print(f"Step 1: Requesting generation for {len(requests_data)} samples...")
+        self.log(f"Step 1: Requesting generation for {len(requests_data)} samples...")
         
         try:
-            response = requests.post(
+            self.limiter.wait()
+            started = time.time()
+            response = self.http.post(
                 f"{self.base_url}/api/speak/batch/post",
                 headers=self.headers,
                 json=requests_data,
                 timeout=30
             )
+            elapsed = time.time() - started
+            # Parse before tracing, so a malformed 200 is traced once, as its exception
+            if response.status_code == 200:
+                speak_urls = response.json().get("result", {}).get("speak_urls", [])
+            self.record_trace('post', elapsed, status=response.status_code,
+                              batch_size=len(requests_data),
+                              chars=sum(len(r.get('text') or '') for r in requests_data))
             
             if response.status_code == 200:
-                result = response.json()
-                speak_urls = result.get("result", {}).get("speak_urls", [])
-                print(f"✓ Generation requested. Got {len(speak_urls)} speak URLs")
+                self.log(f"✓ Generation requested. Got {len(speak_urls)} speak URLs")
                 return speak_urls
             else:
-                print(f"✗ Request failed: {response.status_code}")
-                print(response.text[:200])
+                self.log(f"✗ Request failed: {response.status_code}")
+                self.log(response.text[:200])
                 return None
                 
         except Exception as e:
-            print(f"✗ Request error: {str(e)}")
+            self.record_trace('post', time.time() - started, status=type(e).__name__)
+            self.log(f"✗ Request error: {str(e)}")
             return None
     
     def step2_poll_completion(self, speak_urls: List[str], max_attempts: int = 20, 
                              poll_interval: float = 0.5) -> Optional[List[Dict]]:
         """Step 2: Poll for completion status"""
         
-        print(f"Step 2: Polling for completion (max {max_attempts} attempts, {poll_interval}s interval)...")
+        self.log(f"Step 2: Polling for completion (max {max_attempts} attempts, {poll_interval}s interval)...")
         
+        render_started = time.time()
         for attempt in range(max_attempts):
             try:
-                response = requests.post(
+                self.limiter.wait()
+                started = time.time()
+                response = self.http.post(
                     f"{self.base_url}/api/speak/batch/get",
                     headers=self.headers,
                     json=speak_urls,
                     timeout=30
                 )
-                
+                elapsed = time.time() - started
                 if response.status_code == 200:
                     results = response.json()["result"]
+                self.record_trace('poll', elapsed, status=response.status_code,
+                                  batch_size=len(speak_urls))
+                
+                if response.status_code == 200:
                     
                     # Check if all are done
                     all_done = all(result.get("status") == "done" for result in results)
                     done_count = sum(1 for result in results if result.get("status") == "done")
                     
-                    print(f"  Attempt {attempt + 1}: {done_count}/{len(results)} done")
+                    self.log(f"  Attempt {attempt + 1}: {done_count}/{len(results)} done")
                     
                     if all_done:
-                        print("✓ All generations completed!")
+                        self.log("✓ All generations completed!")
+                        # Server-side render time, i.e. how long polling had to wait
+                        self.record_trace('render', time.time() - render_started,
+                                          batch_size=len(speak_urls), attempts=attempt + 1)
                         return results
                 else:
-                    print(f"✗ Poll failed: {response.status_code}")
+                    self.log(f"✗ Poll failed: {response.status_code}")
                     return None
                     
             except Exception as e:
-                print(f"✗ Poll error: {str(e)}")
+                self.record_trace('poll', time.time() - started, status=type(e).__name__)
+                self.log(f"✗ Poll error: {str(e)}")
                 return None
             
-            time.sleep(poll_interval)
+            # A replayed cassette has nothing to render; its recorded latencies are replayed instead
+            if getattr(self.http, 'mode', None) != 'replay':
+                time.sleep(poll_interval)
         
-        print(f"✗ Polling timed out after {max_attempts} attempts")
+        self.log(f"✗ Polling timed out after {max_attempts} attempts")
         return None
     
     def step3_get_download_url(self, audio_url: str) -> Optional[str]:
@@ -121,30 +227,40 @@ class TTSAPIClient:
         cloudfront_url = f"{audio_url}/cloudfront"
         
         try:
-            response = requests.get(
+            self.limiter.wait()
+            started = time.time()
+            response = self.http.get(
                 cloudfront_url,
                 headers=self.headers,
                 timeout=30
             )
+            elapsed = time.time() - started
+            if response.status_code == 200:
+                download_url = response.json().get("result")
+            self.record_trace('cloudfront', elapsed, status=response.status_code)
             
             if response.status_code == 200:
-                result = response.json()
-                download_url = result.get("result")
                 return download_url
             else:
-                print(f"✗ CloudFront URL failed: {response.status_code}")
+                self.log(f"✗ CloudFront URL failed: {response.status_code}")
                 return None
                 
         except Exception as e:
-            print(f"✗ CloudFront error: {str(e)}")
+            self.record_trace('cloudfront', time.time() - started, status=type(e).__name__)
+            self.log(f"✗ CloudFront error: {str(e)}")
             return None
     
     def step4_download_audio(self, download_url: str, output_path: Path) -> bool:
         """Step 4: Download final audio file"""
         
+        traced = False
         try:
             # No authorization needed for final download
-            response = requests.get(download_url, timeout=30)
+            started = time.time()
+            response = self.http.get(download_url, timeout=30)
+            self.record_trace('download', time.time() - started, status=response.status_code,
+                              bytes=len(response.content))
+            traced = True
             
             if response.status_code == 200:
                 output_path.parent.mkdir(parents=True, exist_ok=True)
@@ -153,22 +269,63 @@ class TTSAPIClient:
                     f.write(response.content)
                 
                 file_size = output_path.stat().st_size
-                print(f"✓ Downloaded: {output_path.name} ({file_size/1024:.1f} KB)")
+                self.log(f"✓ Downloaded: {output_path.name} ({file_size/1024:.1f} KB)")
                 return True
             else:
-                print(f"✗ Download failed: {response.status_code}")
+                self.log(f"✗ Download failed: {response.status_code}")
                 return False
                 
         except Exception as e:
-            print(f"✗ Download error: {str(e)}")
+            # A failed write after a traced download is not a second download step
+            if not traced:
+                self.record_trace('download', time.time() - started, status=type(e).__name__)
+            self.log(f"✗ Download error: {str(e)}")
             return False
     
+    def generate_batch(self, requests_data: List[Dict], output_paths: List[Path],
+                       max_attempts: int = 60, poll_interval: float = 1.0) -> List[Dict]:
+        """Run all 4 steps for one batch; returns a per-request outcome dict"""
+        
+        outcomes = [{'ok': False, 'quality': None, 'bytes': 0, 'error': None} for _ in requests_data]
+        
+        speak_urls = self.step1_request_generation(requests_data)
+        if not speak_urls:
+            for outcome in outcomes:
+                outcome['error'] = 'request failed'
+            return outcomes
+        
+        results = self.step2_poll_completion(speak_urls, max_attempts, poll_interval)
+        if not results:
+            for outcome in outcomes:
+                outcome['error'] = 'polling failed'
+            return outcomes
+        
+        for outcome, result, output_path in zip(outcomes, results, output_paths):
+            audio_url, quality = select_audio_url(result)
+            outcome['quality'] = quality
+            if not audio_url:
+                outcome['error'] = 'missing audio URL'
+                continue
+            
+            download_url = self.step3_get_download_url(audio_url)
+            if not download_url:
+                outcome['error'] = 'cloudfront failed'
+                continue
+            
+            if self.step4_download_audio(download_url, output_path):
+                outcome['ok'] = True
+                outcome['bytes'] = output_path.stat().st_size
+            else:
+                outcome['error'] = 'download failed'
+        
+        return outcomes
+    
     def generate_audio_batch(self, samples: List[Dict], output_dir: Path) -> Tuple[int, int]:
         """Complete workflow for generating multiple audio samples"""
         
-        print("="*70)
-        print("TTS BATCH GENERATION - 4-Step Workflow")
-        print("="*70)
+        self.log("="*70)
+        self.log("TTS BATCH GENERATION - 4-Step Workflow")
+        self.log("="*70)
         
         # Prepare request data
         requests_data = []
@@ -195,11 +352,11 @@ class TTSAPIClient:
         # Steps 3 & 4: Download each audio file
         success_count = 0
         
-        print(f"\nStep 3 & 4: Processing {len(results)} completed generations...")
+        self.log(f"\nStep 3 & 4: Processing {len(results)} completed generations...")
         
         for i, (result, sample) in enumerate(zip(results, samples)):
             if result.get("status") != "done":
-                print(f"✗ Sample {i+1} not completed: {result.get('status')}")
+                self.log(f"✗ Sample {i+1} not completed: {result.get('status')}")
                 continue
                 
             # Get audio URL (use hd1 for highest quality)
@@ -207,13 +364,13 @@ class TTSAPIClient:
             audio_url = audio_info.get("hd1", {}).get("url") or audio_info.get("url")
             
             if not audio_url:
-                print(f"✗ Sample {i+1} missing audio URL")
+                self.log(f"✗ Sample {i+1} missing audio URL")
                 continue
             
             # Step 3: Get download URL
             download_url = self.step3_get_download_url(audio_url)
             if not download_url:
-                print(f"✗ Sample {i+1} failed to get download URL")
+                self.log(f"✗ Sample {i+1} failed to get download URL")
                 continue
             
             # Step 4: Download audio
@@ -223,11 +380,11 @@ class TTSAPIClient:
             
         failed_count = len(samples) - success_count
         
-        print("\n" + "="*70)
-        print("BATCH GENERATION COMPLETE")
-        print("="*70)
-        print(f"Success: {success_count}/{len(samples)}")
-        print(f"Failed: {failed_count}")
+        self.log("\n" + "="*70)
+        self.log("BATCH GENERATION COMPLETE")
+        self.log("="*70)
+        self.log(f"Success: {success_count}/{len(samples)}")
+        self.log(f"Failed: {failed_count}")
         
         return success_count, failed_count
 
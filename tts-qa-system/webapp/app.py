@@ -4,14 +4,22 @@ Flask server for TTS QA evaluation platform
 Implements dynamic sampling - 25 samples per session from 438 total pool
 """
 
-from flask import Flask, jsonify, request, send_from_directory, render_template_string
-import json
-import random
+from flask import Flask, Response, abort, jsonify, request, send_from_directory, render_template_string
+import sqlite3
 import uuid
 from datetime import datetime
 from pathlib import Path
 import os
 
+from audio_bundles import SessionBundles
+from audio_cache import (
+    AudioCache, LoudnessRenditions, TrimmedRenditions, experiment_loudness_target, flac_to_wav, resolve_audio,
+)
+from audio_http import IMMUTABLE, REVALIDATE, AudioValidators, audio_response
+from sample_catalog import SampleCatalog
+from session_sampler import SessionSampler
+from storage import create_storage
+
 app = Flask(__name__)
 
 # Configuration
@@ -20,18 +28,78 @@ VOICES_DIR = DATA_DIR / 'voices'
 METADATA_FILE = DATA_DIR / 'sample_metadata.json'
 RESULTS_FILE = DATA_DIR / 'results.jsonl'
 SESSION_LOG_FILE = DATA_DIR / 'session_log.jsonl'
+# jsonl (results.jsonl / session_log.jsonl / session_<id>.json) or sqlite (see storage.py)
+STORAGE_BACKEND = os.environ.get('STORAGE_BACKEND', 'jsonl')
+SERVE_OPUS = os.environ.get('SERVE_OPUS') == '1'
+EXPERIMENTS_FILE = Path(__file__).parent.parent / 'config' / 'experiments.yaml'
+# Experiment in config/experiments.yaml the served voices belong to; its normalize_lufs picks the
+# loudness-normalized renditions to serve (null or unset = originals)
+SERVE_EXPERIMENT = os.environ.get('SERVE_EXPERIMENT')
+# Serve silence-trimmed copies (analysis/trim_silence.py) when SERVE_TRIMMED=1
+SERVE_TRIMMED = os.environ.get('SERVE_TRIMMED') == '1'
+# Waveform peaks are rebuilt offline (analysis/waveform_peaks.py); clients may cache them for a day
+PEAKS_DIR = VOICES_DIR / '.peaks'
+PEAKS_MAX_AGE = 86400
+
+# Decoded FLAC masters, kept in memory (AUDIO_CACHE_MB)
+AUDIO_CACHE = AudioCache()
+NORMALIZED_LUFS = experiment_loudness_target(EXPERIMENTS_FILE, SERVE_EXPERIMENT) if SERVE_EXPERIMENT else None
+NORMALIZED = LoudnessRenditions(VOICES_DIR, NORMALIZED_LUFS) if NORMALIZED_LUFS is not None else None
+TRIMMED = TrimmedRenditions(VOICES_DIR) if SERVE_TRIMMED else None
+# Trimmed copies of the normalized renditions (trim_silence.py --roots <voices>/.normalized/<target>)
+NORMALIZED_TRIMMED = TrimmedRenditions(NORMALIZED.directory) if NORMALIZED and SERVE_TRIMMED else None
+# Per-session bundles of all target and reference audio
+BUNDLES = SessionBundles()
+# ETag / Last-Modified per served file, precomputed by audio_http.py
+AUDIO_VALIDATORS = AudioValidators(VOICES_DIR)
+
+def resolve_served_audio(filename, args=None):
+    """(path, kind, mimetype) of what /audio/<filename> serves for this request (or args), None if missing"""
+    args = request.args if args is None else args
+    # Renditions are precomputed offline; ?trimmed=0 / ?normalized=0 skip them
+    trimmed = TRIMMED is not None and args.get('trimmed') != '0'
+    if NORMALIZED and args.get('normalized') != '0':
+        rendition = NORMALIZED.lookup(filename)
+        if rendition:
+            # Trimming stacks on normalization; never fall back to the un-normalized trimmed copy
+            stacked = NORMALIZED_TRIMMED.lookup(rendition.name) if trimmed else None
+            return stacked or rendition, 'wav', 'audio/wav'
+    if trimmed:
+        rendition = TRIMMED.lookup(filename)
+        if rendition:
+            return rendition, 'wav', 'audio/wav'
+
+    # Opus is lossy, so it is only served on request (?format=opus or SERVE_OPUS=1)
+    prefer_opus = args.get('format') == 'opus' or SERVE_OPUS
+    resolved = resolve_audio(VOICES_DIR, filename, prefer_opus)
+    if resolved is None:
+        return None
+    path, kind = resolved
+    return path, kind, 'audio/ogg' if kind == 'opus' else 'audio/wav'
 
-# Load sample metadata
-def load_all_samples():
-    """Load all 438 samples from metadata"""
-    with open(METADATA_FILE, 'r', encoding='utf-8') as f:
-        metadata = json.load(f)
-    return metadata['samples']
+def read_served_audio(path, kind):
+    """Bytes of a resolved file, decoding FLAC masters through the audio cache"""
+    if kind == 'flac':
+        return AUDIO_CACHE.get(path, flac_to_wav)
+    return path.read_bytes()
 
-# Initialize samples on startup
-ALL_SAMPLES = load_all_samples()
+def audio_version(filename):
+    """URL version of the file /audio/<filename> serves by default, if its hash is precomputed"""
+    resolved = resolve_served_audio(filename, {})
+    return AUDIO_VALIDATORS.version(resolved[0]) if resolved else None
+
+# Immutable catalog of all samples, built once at startup; audio URLs are content-versioned
+CATALOG = SampleCatalog.from_metadata(METADATA_FILE, audio_version)
+ALL_SAMPLES = CATALOG.samples
 print(f"Loaded {len(ALL_SAMPLES)} samples")
 
+# Results, session logs and completed sessions
+STORAGE = create_storage(STORAGE_BACKEND, DATA_DIR)
+
+# Sessions are drawn to even out ratings per sample and per voice x emotion x scale stratum
+SAMPLER = SessionSampler(CATALOG)
+SAMPLER.load_ratings(STORAGE.sample_counts())
+
 @app.route('/')
 def index():
     """Serve the main evaluation interface"""
@@ -40,47 +108,28 @@ def index():
 @app.route('/api/get-session-samples')
 def get_session_samples():
     """
-    Dynamic sampling: Select 25 random samples from 438 for each session
+    Dynamic sampling: Select 25 samples from 438 for each session, balanced by SessionSampler
     """
     # Generate new session ID
     session_id = str(uuid.uuid4())
     
-    # Randomly select 25 samples from the full pool
-    session_samples = random.sample(ALL_SAMPLES, min(25, len(ALL_SAMPLES)))
-    
-    # Add session-specific IDs for tracking
-    for i, sample in enumerate(session_samples):
-        sample['session_sample_id'] = f"{session_id}_{i}"
-        sample['audio_url'] = f'/audio/{sample["filename"]}'
-        
-        # Add reference audio URL if applicable
-        if sample['type'] == 'reference':
-            sample['reference_url'] = None
-        else:
-            # Find appropriate reference for this voice
-            voice_id = sample['voice_id']
-            ref_type = 'styles' if sample['type'] == 'style' else sample['type']
-            ref_filename = f"{voice_id}_ref_{ref_type}.wav"
-            sample['reference_url'] = f'/audio/{ref_filename}'
-    
+    # Least covered strata and samples first; URLs are precomputed in the catalog
+    indices = SAMPLER.draw(session_id)
+    BUNDLES.register(session_id, CATALOG.audio_files(indices))
+
     # Log session creation
     session_log = {
         'session_id': session_id,
         'timestamp': datetime.now().isoformat(),
-        'sample_count': len(session_samples),
-        'sample_ids': [s['filename'] for s in session_samples]
+        'sample_count': len(indices),
+        'sample_ids': [CATALOG.filenames[i] for i in indices]
     }
     
     # Save session log
-    with open(SESSION_LOG_FILE, 'a') as f:
-        json.dump(session_log, f)
-        f.write('\n')
+    STORAGE.log_session(session_log)
     
-    return jsonify({
-        'session_id': session_id,
-        'samples': session_samples,
-        'total': len(session_samples)
-    })
+    body = CATALOG.session_json(session_id, indices, bundle_url=f'/api/session-bundle/{session_id}')
+    return Response(body, mimetype='application/json')
 
 @app.route('/api/save-result', methods=['POST'])
 def save_result():
@@ -107,10 +156,15 @@ def save_result():
         if not isinstance(score_value, (int, float)) or score_value < 1 or score_value > 7:
             return jsonify({'error': f'Invalid score for {score}: must be 1-7'}), 400
     
-    # Save to results file (JSONL format for easy appending)
-    with open(RESULTS_FILE, 'a') as f:
-        json.dump(data, f)
-        f.write('\n')
+    # Save through the storage backend (JSONL group commit or SQLite)
+    try:
+        STORAGE.save_result(data)
+    except (OSError, TimeoutError, sqlite3.Error) as e:
+        return jsonify({'error': f'Could not save result: {e}'}), 500
+
+    index = SAMPLER.resolve(data['session_id'], str(data['sample_id']))
+    if index is not None:
+        SAMPLER.record_rating(index)
     
     return jsonify({'status': 'success', 'message': 'Result saved'})
 
@@ -123,58 +177,65 @@ def save_session():
     data['completed_at'] = datetime.now().isoformat()
     
     # Save session completion
-    session_complete_file = DATA_DIR / f"session_{data['session_id']}.json"
-    with open(session_complete_file, 'w') as f:
-        json.dump(data, f, indent=2)
+    location = STORAGE.save_session(data)
     
     return jsonify({
         'status': 'success',
         'message': 'Session saved',
-        'file': str(session_complete_file)
+        'file': location
     })
 
 @app.route('/audio/<path:filename>')
 def serve_audio(filename):
-    """Serve audio files from the voices directory"""
-    return send_from_directory(VOICES_DIR, filename)
+    """Serve audio files from the voices directory (WAV, decoded FLAC master or Opus rendition)
+    with strong ETags, 304s and single or multipart byte ranges"""
+    resolved = resolve_served_audio(filename)
+    if resolved is None:
+        abort(404)
+
+    path, kind, mimetype = resolved
+    source = read_served_audio(path, kind) if kind == 'flac' else path
+    # The ETag hashes the decoded WAV for FLAC masters, i.e. the bytes actually sent
+    validator = AUDIO_VALIDATORS.lookup(path, source if kind == 'flac' else None)
+    # Versioned URLs name exactly this content; anything else is revalidated by ETag
+    cache_control = IMMUTABLE if request.args.get('v') == validator.version else REVALIDATE
+    return audio_response(request, source, validator, mimetype, cache_control)
+
+def logged_audio_files(session_id):
+    """Audio files of a session from the session log (drawn by any worker), None if never logged"""
+    sample_ids = STORAGE.session_samples(session_id)
+    if sample_ids is None:
+        return None
+    indices = [CATALOG.index_of(sample_id) for sample_id in sample_ids]
+    return CATALOG.audio_files([i for i in indices if i is not None])
+
+@app.route('/api/session-bundle/<session_id>')
+def serve_session_bundle(session_id):
+    """All audio of a session in one response (layout in audio_bundles.py); accepts the /audio options"""
+    variant = '&'.join(f'{key}={request.args.get(key)}' for key in ('format', 'trimmed', 'normalized'))
+    data = BUNDLES.get(session_id, variant, resolve_served_audio, read_served_audio, logged_audio_files)
+    if data is None:
+        abort(404)
+    return Response(data, mimetype='application/octet-stream', headers={'Cache-Control': 'private, max-age=3600'})
+
+@app.route('/peaks/<path:filename>')
+def serve_peaks(filename):
+    """Serve precomputed min/max waveform peaks of the audio /audio/<filename> serves (same options)"""
+    resolved = resolve_served_audio(filename)
+    if resolved is None:
+        abort(404)
+    path = resolved[0]
+    # Renditions live in dot-directories and have their peaks in <rendition dir>/.peaks/
+    if any(part.startswith('.') for part in path.relative_to(VOICES_DIR).parent.parts):
+        peaks_dir, peaks_name = path.parent / '.peaks', path.with_suffix('.peaks').name
+    else:
+        peaks_dir, peaks_name = PEAKS_DIR, Path(filename).with_suffix('.peaks').as_posix()
+    return send_from_directory(peaks_dir, peaks_name, mimetype='application/octet-stream', max_age=PEAKS_MAX_AGE)
 
 @app.route('/api/stats')
 def get_stats():
-    """Get current evaluation statistics"""
-    stats = {
-        'total_samples': len(ALL_SAMPLES),
-        'sessions_completed': 0,
-        'total_evaluations': 0,
-        'coverage': {}
-    }
-    
-    # Count evaluations per sample
-    sample_eval_counts = {}
-    
-    if RESULTS_FILE.exists():
-        with open(RESULTS_FILE, 'r') as f:
-            for line in f:
-                if line.strip():
-                    result = json.loads(line)
-                    sample_id = result.get('sample_id', '')
-                    sample_eval_counts[sample_id] = sample_eval_counts.get(sample_id, 0) + 1
-                    stats['total_evaluations'] += 1
-    
-    # Calculate coverage statistics
-    evaluated_samples = len(sample_eval_counts)
-    stats['coverage'] = {
-        'evaluated_samples': evaluated_samples,
-        'unevaluated_samples': len(ALL_SAMPLES) - evaluated_samples,
-        'percentage': round(evaluated_samples / len(ALL_SAMPLES) * 100, 1) if ALL_SAMPLES else 0,
-        'avg_evals_per_sample': round(stats['total_evaluations'] / evaluated_samples, 2) if evaluated_samples > 0 else 0
-    }
-    
-    # Count completed sessions
-    if SESSION_LOG_FILE.exists():
-        with open(SESSION_LOG_FILE, 'r') as f:
-            stats['sessions_completed'] = sum(1 for line in f if line.strip())
-    
-    return jsonify(stats)
+    """Get current evaluation statistics (counters kept by the storage backend)"""
+    return jsonify(STORAGE.stats(len(ALL_SAMPLES)))
 
 @app.route('/api/health')
 def health_check():
@@ -182,6 +243,11 @@ def health_check():
     return jsonify({
         'status': 'healthy',
         'samples_loaded': len(ALL_SAMPLES),
+        'audio_cache': AUDIO_CACHE.stats(),
+        'session_bundles': BUNDLES.stats(),
+        'audio_validators': AUDIO_VALIDATORS.stats(),
+        'sampler': SAMPLER.stats(),
+        'storage': STORAGE.health(),
         'timestamp': datetime.now().isoformat()
     })
 
@@ -191,13 +257,14 @@ if __name__ == '__main__':
     VOICES_DIR.mkdir(exist_ok=True)
     
     # Create empty results file if it doesn't exist
-    if not RESULTS_FILE.exists():
+    if STORAGE_BACKEND == 'jsonl' and not RESULTS_FILE.exists():
         RESULTS_FILE.touch()
-    if not SESSION_LOG_FILE.exists():
+    if STORAGE_BACKEND == 'jsonl' and not SESSION_LOG_FILE.exists():
         SESSION_LOG_FILE.touch()
     
     print(f"Starting TTS QA Evaluation Server")
     print(f"Data directory: {DATA_DIR}")
+    print(f"Storage backend: {STORAGE_BACKEND}")
     print(f"Voices directory: {VOICES_DIR}")
     print(f"Total samples available: {len(ALL_SAMPLES)}")
     print(f"Samples per session: 25")
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Session audio bundles: every file of an evaluation session in one response
+get_session_samples registers the session's target and reference files; the client
+fetches /api/session-bundle/<session_id> once and slices the files out locally.
+
+Bundle layout (little-endian):
+  4s magic 'TTSB', u32 index length, JSON index, then the files back to back
+  index: {"files": {filename: {"offset", "length", "mimetype"}}, "missing": [filename, ...]}
+  offsets are relative to the first byte after the index
+
+Built bundles are kept in their own in-memory LRU (bounded by AUDIO_CACHE_MB, like
+decoded FLAC) and rebuilt when any source file changes. The registry is per process:
+a session drawn by another worker is rebuilt from the logged session on first request.
+"""
+
+import json
+import struct
+import threading
+from collections import OrderedDict
+from typing import Callable, List, Optional, Tuple
+
+from audio_cache import CACHE_BYTES
+
+MAGIC = b'TTSB'
+MAX_SESSIONS = 2000
+
+def encode_bundle(entries: List[Tuple[str, str, bytes]], missing: List[str]) -> bytes:
+    """Bundle image from (filename, mimetype, data) entries"""
+    files, offset = {}, 0
+    for filename, mimetype, data in entries:
+        files[filename] = {'offset': offset, 'length': len(data), 'mimetype': mimetype}
+        offset += len(data)
+    index = json.dumps({'files': files, 'missing': missing}, separators=(',', ':')).encode('utf-8')
+    return b''.join([MAGIC, struct.pack('<I', len(index)), index] + [data for _, _, data in entries])
+
+class SessionBundles:
+    """Session -> file list registry plus a byte-bounded LRU of built bundles"""
+
+    def __init__(self, max_bytes: int = CACHE_BYTES, max_sessions: int = MAX_SESSIONS):
+        self.max_bytes = max_bytes
+        self.max_sessions = max_sessions
+        self.sessions: OrderedDict = OrderedDict()
+        self.bundles: OrderedDict = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def register(self, session_id: str, filenames: List[str]):
+        with self.lock:
+            self.sessions[session_id] = list(dict.fromkeys(filenames))
+            while len(self.sessions) > self.max_sessions:
+                self.sessions.popitem(last=False)
+
+    def get(self, session_id: str, variant: str, resolve: Callable, read: Callable,
+            load: Optional[Callable] = None) -> Optional[bytes]:
+        """Bundle bytes for a registered session, None if unknown
+
+        resolve(filename) -> (path, kind, mimetype) or None; read(path, kind) -> bytes.
+        variant distinguishes request options that change the served files (e.g. Opus).
+        load(session_id) -> filenames or None, for sessions this process did not register.
+        """
+        with self.lock:
+            filenames = self.sessions.get(session_id)
+        if filenames is None and load is not None:
+            filenames = load(session_id)
+            if filenames is not None:
+                self.register(session_id, filenames)
+                filenames = list(dict.fromkeys(filenames))
+        if filenames is None:
+            return None
+
+        resolved = [(filename, resolve(filename)) for filename in filenames]
+        signature = tuple((filename, str(found[0]), found[0].stat().st_mtime_ns) if found else (filename,)
+                          for filename, found in resolved)
+        key = (session_id, variant)
+        with self.lock:
+            entry = self.bundles.get(key)
+            if entry and entry[0] == signature:
+                self.bundles.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+
+        entries = [(filename, found[2], read(found[0], found[1])) for filename, found in resolved if found]
+        data = encode_bundle(entries, [filename for filename, found in resolved if not found])
+        with self.lock:
+            if key in self.bundles:
+                self.size -= len(self.bundles.pop(key)[1])
+            if len(data) <= self.max_bytes:
+                self.bundles[key] = (signature, data)
+                self.size += len(data)
+                while self.size > self.max_bytes:
+                    _, (_, evicted) = self.bundles.popitem(last=False)
+                    self.size -= len(evicted)
+        return data
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {'sessions': len(self.sessions), 'bundles': len(self.bundles), 'bytes': self.size,
+                    'hits': self.hits, 'misses': self.misses}
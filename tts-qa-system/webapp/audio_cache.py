@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Audio rendition selection and in-memory LRU cache for serve_audio
+Voices can be stored as plain WAV, as lossless FLAC masters (decoded back to WAV on
+request) and optionally with Opus renditions (analysis/compress_corpus.py writes
+both). Decoded WAVs are cached in memory, bounded by AUDIO_CACHE_MB.
+Loudness-normalized (analysis/loudness_normalize.py) and silence-trimmed
+(analysis/trim_silence.py) renditions are looked up through their manifests when
+the deployment enables them; the loudness target is the served experiment's
+normalize_lufs in config/experiments.yaml.
+"""
+
+import io
+import json
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional, Tuple
+
+from werkzeug.utils import safe_join
+
+CACHE_BYTES = int(float(os.environ.get('AUDIO_CACHE_MB', '64')) * 1024 * 1024)
+
+class AudioCache:
+    """Byte-bounded LRU of decoded audio, invalidated when the source file changes"""
+
+    def __init__(self, max_bytes: int = CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.entries: OrderedDict = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def get(self, path: Path, loader) -> bytes:
+        mtime = path.stat().st_mtime_ns
+        with self.lock:
+            entry = self.entries.get(path)
+            if entry and entry[0] == mtime:
+                self.entries.move_to_end(path)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+
+        data = loader(path)
+        with self.lock:
+            if path in self.entries:
+                self.size -= len(self.entries.pop(path)[1])
+            if len(data) <= self.max_bytes:
+                self.entries[path] = (mtime, data)
+                self.size += len(data)
+                while self.size > self.max_bytes:
+                    _, (_, evicted) = self.entries.popitem(last=False)
+                    self.size -= len(evicted)
+        return data
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {'entries': len(self.entries), 'bytes': self.size, 'hits': self.hits, 'misses': self.misses}
+
+def flac_to_wav(path: Path) -> bytes:
+    """Decode a FLAC master to a WAV file image with the original sample format"""
+    import soundfile
+
+    info = soundfile.info(str(path))
+    data, sample_rate = soundfile.read(str(path), dtype='int32' if info.subtype == 'PCM_24' else 'int16')
+    buffer = io.BytesIO()
+    # 8-bit WAV is unsigned; FLAC masters store 8-bit as signed
+    subtype = 'PCM_U8' if info.subtype == 'PCM_S8' else info.subtype
+    soundfile.write(buffer, data, sample_rate, subtype=subtype, format='WAV')
+    return buffer.getvalue()
+
+def resolve_audio(voices_dir: Path, filename: str, prefer_opus: bool = False) -> Optional[Tuple[Path, str]]:
+    """(file, kind) for a requested .wav name; kind is 'wav', 'flac' (decode) or 'opus'"""
+    joined = safe_join(str(voices_dir), filename)
+    if joined is None:
+        return None
+    path = Path(joined)
+
+    opus = path.with_suffix('.opus')
+    if prefer_opus and opus.exists():
+        return opus, 'opus'
+    if path.exists():
+        return path, 'wav'
+    flac = path.with_suffix('.flac')
+    if flac.exists():
+        return flac, 'flac'
+    if opus.exists():
+        return opus, 'opus'
+    return None
+
+class Renditions:
+    """Manifest lookup for a directory of precomputed renditions, reloaded when it is rebuilt"""
+
+    def __init__(self, directory: Path):
+        self.directory = Path(directory)
+        self.manifest_path = self.directory / 'manifest.json'
+        self.files = {}
+        self.loaded_mtime = None
+        self.lock = threading.Lock()
+
+    def lookup(self, filename: str) -> Optional[Path]:
+        if not self.manifest_path.exists():
+            return None
+        mtime = self.manifest_path.stat().st_mtime_ns
+        with self.lock:
+            if mtime != self.loaded_mtime:
+                with open(self.manifest_path, 'r') as f:
+                    self.files = json.load(f)['files']
+                self.loaded_mtime = mtime
+            entry = self.files.get(filename)
+        if entry is None:
+            return None
+        path = self.directory / entry['rendition']
+        return path if path.exists() else None
+
+class LoudnessRenditions(Renditions):
+    """Renditions in <voices_dir>/.normalized/<target>/"""
+
+    def __init__(self, voices_dir: Path, target: float):
+        super().__init__(Path(voices_dir) / '.normalized' / f"{target:g}")
+
+def experiment_loudness_target(config_path: Path, name: str) -> Optional[float]:
+    """normalize_lufs of an experiment (defaults applied); None serves the original levels"""
+    import yaml
+
+    with open(config_path, 'r', encoding='utf-8') as f:
+        config = yaml.safe_load(f)
+    if name not in config['experiments']:
+        raise ValueError(f"Unknown experiment '{name}'. Available: {', '.join(config['experiments'])}")
+    target = {**config.get('defaults', {}), **config['experiments'][name]}.get('normalize_lufs')
+    return float(target) if target is not None else None
+
+class TrimmedRenditions(Renditions):
+    """Renditions in <directory>/.trimmed/, for the voices or a directory of normalized renditions"""
+
+    def __init__(self, directory: Path):
+        super().__init__(Path(directory) / '.trimmed')
@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+"""
+HTTP validators, caching and byte ranges for /audio
+Every served file gets a strong ETag from the SHA-1 of the bytes served (for FLAC
+masters, of the decoded WAV, since that is the representation sent). Hashes are
+precomputed into <voices_dir>/.etags.json; files missing from it (or changed since)
+are hashed once on first request and kept in memory, keyed by size and mtime, so a
+request costs one stat. Catalog URLs carry ?v=<hash> for files in the index: those
+are served immutable for a year, everything else with no-cache (revalidated, 304).
+Range requests get 206 for one range and multipart/byteranges for several.
+
+Usage:
+  python audio_http.py                      # hash data/voices and its renditions into .etags.json
+  python audio_http.py --voices-dir DIR
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import threading
+import uuid
+from email.utils import formatdate, parsedate_to_datetime
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Tuple, Union
+
+from werkzeug.wrappers import Response
+from werkzeug.wsgi import wrap_file
+
+from audio_cache import flac_to_wav
+
+AUDIO_SUFFIXES = ('.wav', '.flac', '.opus')
+IMMUTABLE = 'public, max-age=31536000, immutable'
+REVALIDATE = 'no-cache'
+# More ranges than this (after merging) are answered with the whole file
+MAX_RANGES = 16
+VERSION_LENGTH = 16
+# Index format 2 hashes FLAC masters as served (decoded WAV); older indexes hashed the .flac
+INDEX_FORMAT = 2
+
+class Validator(NamedTuple):
+    """Cached per-file header data"""
+    sha1: str
+    size: int
+    mtime_ns: int
+    headers: Dict[str, str]
+
+    @property
+    def etag(self) -> str:
+        return self.headers['ETag']
+
+    @property
+    def version(self) -> str:
+        return self.sha1[:VERSION_LENGTH]
+
+def file_sha1(path: Path) -> str:
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def served_sha1(path: Path, data: Optional[bytes] = None) -> str:
+    """SHA-1 of what /audio sends for path: the file, or the decoded WAV of a FLAC master"""
+    if data is None and path.suffix.lower() == '.flac':
+        data = flac_to_wav(path)
+    return hashlib.sha1(data).hexdigest() if data is not None else file_sha1(path)
+
+def make_validator(sha1: str, size: int, mtime_ns: int) -> Validator:
+    headers = {'ETag': f'"{sha1}"', 'Last-Modified': formatdate(mtime_ns // 1_000_000_000, usegmt=True),
+               'Accept-Ranges': 'bytes'}
+    return Validator(sha1, size, mtime_ns, headers)
+
+class AudioValidators:
+    """ETag / Last-Modified per audio file, from the precomputed index or hashed once"""
+
+    def __init__(self, voices_dir: Path):
+        self.voices_dir = Path(voices_dir)
+        self.index_path = self.voices_dir / '.etags.json'
+        self.entries: Dict[str, Validator] = {}
+        self.indexed = 0
+        self.hashed = 0
+        self.lock = threading.Lock()
+        if self.index_path.exists():
+            with open(self.index_path, 'r') as f:
+                index = json.load(f)
+            for key, (size, mtime_ns, sha1) in index['files'].items():
+                if index.get('format') == INDEX_FORMAT or not key.lower().endswith('.flac'):
+                    self.entries[key] = make_validator(sha1, size, mtime_ns)
+            self.indexed = len(self.entries)
+
+    def key(self, path: Path) -> str:
+        try:
+            return path.relative_to(self.voices_dir).as_posix()
+        except ValueError:
+            return str(path)
+
+    def cached(self, path: Path) -> Tuple[str, os.stat_result, Optional[Validator]]:
+        key = self.key(path)
+        stat = path.stat()
+        with self.lock:
+            entry = self.entries.get(key)
+        if entry and entry.size == stat.st_size and entry.mtime_ns == stat.st_mtime_ns:
+            return key, stat, entry
+        return key, stat, None
+
+    def lookup(self, path: Path, data: Optional[bytes] = None) -> Validator:
+        """Validator for path; data is its served bytes if already decoded (saves decoding FLAC twice)"""
+        key, stat, entry = self.cached(path)
+        if entry:
+            return entry
+        entry = make_validator(served_sha1(path, data), stat.st_size, stat.st_mtime_ns)
+        with self.lock:
+            self.entries[key] = entry
+            self.hashed += 1
+        return entry
+
+    def version(self, path: Path) -> Optional[str]:
+        """URL version of a file if its hash is already known; never hashes"""
+        if not path.exists():
+            return None
+        _, _, entry = self.cached(path)
+        return entry.version if entry else None
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {'files': len(self.entries), 'from_index': self.indexed, 'hashed_on_request': self.hashed}
+
+def build_index(voices_dir: Path) -> Tuple[int, int]:
+    """Write <voices_dir>/.etags.json; unchanged files keep their hash. Returns (files, hashed)"""
+    voices_dir = Path(voices_dir)
+    validators = AudioValidators(voices_dir)
+    files = {}
+    for path in sorted(voices_dir.rglob('*')):
+        if path.suffix.lower() in AUDIO_SUFFIXES and path.is_file():
+            entry = validators.lookup(path)
+            files[validators.key(path)] = [entry.size, entry.mtime_ns, entry.sha1]
+    tmp_path = validators.index_path.with_suffix('.tmp')
+    with open(tmp_path, 'w') as f:
+        json.dump({'format': INDEX_FORMAT, 'files': files}, f)
+    os.replace(tmp_path, validators.index_path)
+    return len(files), validators.hashed
+
+def etag_listed(header: str, etag: str) -> bool:
+    """If-None-Match comparison (weak, so W/ prefixes match)"""
+    if header.strip() == '*':
+        return True
+    return etag in (tag.strip().removeprefix('W/') for tag in header.split(','))
+
+def not_modified(headers, validator: Validator) -> bool:
+    """Conditional GET: If-None-Match wins over If-Modified-Since"""
+    if_none_match = headers.get('If-None-Match')
+    if if_none_match is not None:
+        return etag_listed(if_none_match, validator.etag)
+    if_modified_since = headers.get('If-Modified-Since')
+    if if_modified_since:
+        try:
+            since = parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+        return validator.mtime_ns // 1_000_000_000 <= since
+    return False
+
+def parse_ranges(header: Optional[str], size: int) -> Optional[List[Tuple[int, int]]]:
+    """Merged (start, end inclusive) byte ranges; None = ignore the header, [] = unsatisfiable"""
+    if not header:
+        return None
+    unit, _, spec = header.partition('=')
+    if unit.strip().lower() != 'bytes' or not spec.strip():
+        return None
+    ranges = []
+    for part in spec.split(','):
+        first, dash, last = part.strip().partition('-')
+        if not dash or not (first.isdigit() or (not first and last.isdigit())) or (last and not last.isdigit()):
+            return None
+        if not first:
+            # Suffix range: the last N bytes
+            if int(last) > 0 and size > 0:
+                ranges.append((max(0, size - int(last)), size - 1))
+            continue
+        start, end = int(first), int(last) if last else None
+        if end is not None and end < start:
+            return None
+        if start < size:
+            ranges.append((start, size - 1 if end is None else min(end, size - 1)))
+
+    merged: List[Tuple[int, int]] = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged if len(merged) <= MAX_RANGES else None
+
+def read_ranges(source: Union[bytes, Path], ranges: List[Tuple[int, int]]) -> List[bytes]:
+    if isinstance(source, bytes):
+        return [source[start:end + 1] for start, end in ranges]
+    parts = []
+    with open(source, 'rb') as f:
+        for start, end in ranges:
+            f.seek(start)
+            parts.append(f.read(end - start + 1))
+    return parts
+
+def multipart_byteranges(parts: List[bytes], ranges: List[Tuple[int, int]], size: int,
+                         mimetype: str) -> Tuple[bytes, str]:
+    """multipart/byteranges body and its Content-Type"""
+    boundary = uuid.uuid4().hex
+    chunks = []
+    for data, (start, end) in zip(parts, ranges):
+        chunks.append(f'--{boundary}\r\nContent-Type: {mimetype}\r\n'
+                      f'Content-Range: bytes {start}-{end}/{size}\r\n\r\n'.encode('ascii'))
+        chunks.append(data)
+        chunks.append(b'\r\n')
+    chunks.append(f'--{boundary}--\r\n'.encode('ascii'))
+    return b''.join(chunks), f'multipart/byteranges; boundary={boundary}'
+
+def audio_response(request, source: Union[bytes, Path], validator: Validator, mimetype: str,
+                   cache_control: str) -> Response:
+    """200, 206, 304 or 416 for served audio; source is a file or its decoded bytes"""
+    headers = dict(validator.headers, **{'Cache-Control': cache_control})
+    if not_modified(request.headers, validator):
+        return Response(status=304, headers=headers)
+
+    size = len(source) if isinstance(source, bytes) else validator.size
+    ranges = parse_ranges(request.headers.get('Range'), size)
+    # If-Range: only serve the ranges if the client's copy is still current
+    if_range = request.headers.get('If-Range')
+    if ranges is not None and if_range and if_range.strip() not in (validator.etag, headers['Last-Modified']):
+        ranges = None
+
+    if ranges is None:
+        if isinstance(source, bytes):
+            return Response(source, mimetype=mimetype, headers=headers)
+        headers['Content-Length'] = str(size)
+        return Response(wrap_file(request.environ, open(source, 'rb')), mimetype=mimetype, headers=headers,
+                        direct_passthrough=True)
+    if not ranges:
+        headers['Content-Range'] = f'bytes */{size}'
+        return Response(status=416, headers=headers)
+
+    parts = read_ranges(source, ranges)
+    if len(ranges) == 1:
+        start, end = ranges[0]
+        headers['Content-Range'] = f'bytes {start}-{end}/{size}'
+        return Response(parts[0], status=206, mimetype=mimetype, headers=headers)
+    body, content_type = multipart_byteranges(parts, ranges, size, mimetype)
+    return Response(body, status=206, content_type=content_type, headers=headers)
+
+def main():
+    parser = argparse.ArgumentParser(description='Precompute strong ETags for the served audio')
+    parser.add_argument('--voices-dir', type=Path, default=Path(__file__).parent.parent / 'data' / 'voices',
+                        help='Voices directory (renditions in its dot-directories are included)')
+
+    args = parser.parse_args()
+
+    print(f"🔍 Hashing audio under {args.voices_dir}")
+    files, hashed = build_index(args.voices_dir)
+    print(f"✅ {files} file(s) in {args.voices_dir / '.etags.json'} ({hashed} hashed, {files - hashed} unchanged)")
+    print("   Restart the server so catalog URLs pick up the new versions")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Group-commit JSONL writer for results and session logs
+Request threads hand their line to a single writer thread and wait for it to be
+committed. The writer collects everything queued within RESULTS_BATCH_DELAY_MS (up
+to RESULTS_BATCH_MAX lines), appends the batch with one write under an exclusive
+flock, so several gunicorn workers can share the file, and fsyncs per policy:
+
+  RESULTS_FSYNC=always     fsync every commit (default; one fsync covers the whole batch)
+  RESULTS_FSYNC=interval   fsync at most every RESULTS_FSYNC_INTERVAL_MS
+  RESULTS_FSYNC=never      leave flushing to the OS
+"""
+
+import json
+import os
+import queue
+import threading
+import time
+from collections import deque
+from pathlib import Path
+from typing import Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-process serving only
+    fcntl = None
+
+FSYNC_POLICY = os.environ.get('RESULTS_FSYNC', 'always')
+FSYNC_INTERVAL = float(os.environ.get('RESULTS_FSYNC_INTERVAL_MS', '1000')) / 1000
+BATCH_MAX = int(os.environ.get('RESULTS_BATCH_MAX', '256'))
+BATCH_DELAY = float(os.environ.get('RESULTS_BATCH_DELAY_MS', '5')) / 1000
+WAIT_TIMEOUT = 10.0
+LATENCY_WINDOW = 1000
+
+class PendingLine:
+    """One queued line and the event its request thread waits on"""
+
+    def __init__(self, data: bytes):
+        self.data = data
+        self.queued_at = time.perf_counter()
+        self.done = threading.Event()
+        self.error: Optional[BaseException] = None
+
+class GroupCommitWriter:
+    """Batches appends from concurrent requests into single locked writes"""
+
+    def __init__(self, path: Path, fsync_policy: str = FSYNC_POLICY, batch_max: int = BATCH_MAX,
+                 batch_delay: float = BATCH_DELAY):
+        if fsync_policy not in ('always', 'interval', 'never'):
+            raise ValueError(f'Unknown fsync policy: {fsync_policy}')
+        self.path = Path(path)
+        self.fsync_policy = fsync_policy
+        self.batch_max = batch_max
+        self.batch_delay = batch_delay
+        self.queue: queue.Queue = queue.Queue()
+        self.last_fsync = 0.0
+        self.commits = 0
+        self.lines = 0
+        self.fsyncs = 0
+        self.largest_batch = 0
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+        self.stats_lock = threading.Lock()
+        self.thread = threading.Thread(target=self.run, name=f'writer-{self.path.name}', daemon=True)
+        self.thread.start()
+
+    def append(self, record: dict):
+        """Append one JSON line; returns once it is committed, raises if the commit failed"""
+        pending = PendingLine((json.dumps(record) + '\n').encode('utf-8'))
+        self.queue.put(pending)
+        if not pending.done.wait(WAIT_TIMEOUT):
+            raise TimeoutError(f'{self.path.name} commit did not finish within {WAIT_TIMEOUT:g}s')
+        if pending.error:
+            raise pending.error
+
+    def run(self):
+        while True:
+            batch = [self.queue.get()]
+            deadline = time.perf_counter() + self.batch_delay
+            while len(batch) < self.batch_max:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self.queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self.commit(batch)
+
+    def commit(self, batch):
+        error = None
+        synced = False
+        try:
+            with open(self.path, 'ab') as f:
+                if fcntl:
+                    fcntl.flock(f, fcntl.LOCK_EX)
+                try:
+                    f.write(b''.join(pending.data for pending in batch))
+                    f.flush()
+                    now = time.monotonic()
+                    if self.fsync_policy == 'always' or \
+                            (self.fsync_policy == 'interval' and now - self.last_fsync >= FSYNC_INTERVAL):
+                        os.fsync(f.fileno())
+                        self.last_fsync = now
+                        synced = True
+                finally:
+                    if fcntl:
+                        fcntl.flock(f, fcntl.LOCK_UN)
+        except OSError as e:
+            error = e
+
+        finished = time.perf_counter()
+        with self.stats_lock:
+            self.commits += 1
+            self.lines += len(batch)
+            self.fsyncs += synced
+            self.largest_batch = max(self.largest_batch, len(batch))
+            self.latencies.extend(finished - pending.queued_at for pending in batch)
+        for pending in batch:
+            pending.error = error
+            pending.done.set()
+
+    def stats(self) -> dict:
+        with self.stats_lock:
+            latencies = sorted(self.latencies)
+            commits, lines = self.commits, self.lines
+
+            def percentile(q):
+                return round(latencies[min(len(latencies) - 1, int(q * len(latencies)))] * 1000, 2) \
+                    if latencies else 0.0
+
+            return {
+                'commits': commits,
+                'lines': lines,
+                'avg_batch': round(lines / commits, 2) if commits else 0,
+                'max_batch': self.largest_batch,
+                'fsyncs': self.fsyncs,
+                'fsync_policy': self.fsync_policy,
+                'latency_ms': {'p50': percentile(0.5), 'p95': percentile(0.95), 'max': percentile(1.0)},
+            }
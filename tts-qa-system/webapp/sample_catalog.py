@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Immutable sample catalog for session creation
+Built once at startup from sample_metadata.json: every sample gets its audio,
+peaks and reference URLs and a prebuilt JSON fragment, and references are indexed
+per (voice, type). Sessions only pick indices (session_sampler.py) and splice the
+fragments together, so nothing shared is mutated. Audio URLs carry ?v=<content hash>
+when one is known, so clients may cache them as immutable (audio_http.py).
+"""
+
+import json
+from types import MappingProxyType
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+def reference_type(sample_type: str) -> str:
+    """Reference files are per emotion type; style samples use the 'styles' reference"""
+    return 'styles' if sample_type == 'style' else sample_type
+
+class SampleCatalog:
+    """Read-only samples with precomputed URLs, JSON fragments and a reference index"""
+
+    def __init__(self, samples: Sequence[Dict], version_of: Optional[Callable[[str], Optional[str]]] = None):
+        # (voice_id, reference type) -> reference filename
+        self.references: Dict[Tuple[str, str], str] = {}
+        for sample in samples:
+            if sample['type'] == 'reference':
+                ref_type = sample['filename'].rsplit('_ref_', 1)[-1].removesuffix('.wav')
+                self.references[(sample['voice_id'], ref_type)] = sample['filename']
+
+        def audio_url(filename: str) -> str:
+            version = version_of(filename) if version_of else None
+            return f'/audio/{filename}?v={version}' if version else f'/audio/{filename}'
+
+        entries, fragments = [], []
+        for sample in samples:
+            entry = dict(sample)
+            entry['audio_url'] = audio_url(sample['filename'])
+            entry['peaks_url'] = f'/peaks/{sample["filename"]}'
+            reference = self.reference_for(sample)
+            entry['reference_url'] = audio_url(reference) if reference else None
+            entries.append(MappingProxyType(entry))
+            # Object body without braces, so a session can append its own fields
+            fragments.append(json.dumps(entry, ensure_ascii=False)[1:-1])
+
+        self.samples = tuple(entries)
+        self.fragments = tuple(fragments)
+        self.filenames = tuple(sample['filename'] for sample in samples)
+        # Ratings identify samples by filename or by stem (src/ client)
+        self.positions = {name: i for i, filename in enumerate(self.filenames)
+                          for name in (filename, filename.removesuffix('.wav'))}
+
+    @classmethod
+    def from_metadata(cls, path, version_of=None) -> 'SampleCatalog':
+        with open(path, 'r', encoding='utf-8') as f:
+            return cls(json.load(f)['samples'], version_of)
+
+    def __len__(self) -> int:
+        return len(self.samples)
+
+    def reference_for(self, sample: Dict) -> Optional[str]:
+        """Reference filename for a sample, None for references themselves"""
+        if sample['type'] == 'reference':
+            return None
+        key = (sample['voice_id'], reference_type(sample['type']))
+        return self.references.get(key, f"{key[0]}_ref_{key[1]}.wav")
+
+    def index_of(self, sample_id: str) -> Optional[int]:
+        return self.positions.get(sample_id)
+
+    def audio_files(self, indices: Sequence[int]) -> List[str]:
+        """Target and reference filenames for a session, targets first"""
+        files = [self.filenames[i] for i in indices]
+        files += [self.reference_for(self.samples[i]) for i in indices if self.samples[i]['reference_url']]
+        return files
+
+    def session_json(self, session_id: str, indices: Sequence[int], **extra) -> str:
+        """Session response body: prebuilt fragments plus per-session ids, no per-sample encoding"""
+        samples = ','.join(f'{{{self.fragments[i]},"session_sample_id":"{session_id}_{n}"}}'
+                           for n, i in enumerate(indices))
+        fields = ''.join(f',{json.dumps(key)}:{json.dumps(value, ensure_ascii=False)}' for key, value in extra.items())
+        return f'{{"session_id":"{session_id}","samples":[{samples}],"total":{len(indices)}{fields}}}'
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Coverage-aware stratified session sampler
+Keeps rating counts per sample and per stratum (voice x emotion x scale, the design
+of TTSAnalyzerV3.mixed_effects_analysis) and fills each session from the least
+covered strata first, preferring the least rated samples inside them. Constraints:
+  - balance_voices: at most ceil(size / voices) samples per voice, so every session has both voices
+  - one_scale_per_cell: at most one scale of each voice x emotion x text cell per session
+"""
+
+import math
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from sample_catalog import SampleCatalog
+
+SESSION_SIZE = 25
+MAX_SESSIONS = 2000
+# A served-but-unrated sample counts as half a rating, so concurrent sessions spread out
+SERVED_WEIGHT = 0.5
+
+def stratum_of(sample) -> tuple:
+    return sample['voice_id'], sample.get('emotion') or sample['type'], sample['scale']
+
+def cell_of(sample) -> tuple:
+    return sample['voice_id'], sample.get('emotion') or sample['type'], sample.get('match_type')
+
+class SessionSampler:
+    """Draws sessions that even out ratings across samples and strata"""
+
+    def __init__(self, catalog: SampleCatalog, size: int = SESSION_SIZE, balance_voices: bool = True,
+                 one_scale_per_cell: bool = True, seed: Optional[int] = None):
+        self.catalog = catalog
+        self.size = size
+        self.balance_voices = balance_voices
+        self.one_scale_per_cell = one_scale_per_cell
+        self.rng = np.random.default_rng(seed)
+        self.lock = threading.Lock()
+
+        def codes(keys: List[tuple]) -> np.ndarray:
+            ids: Dict[tuple, int] = {}
+            return np.array([ids.setdefault(key, len(ids)) for key in keys], dtype=np.int64)
+
+        samples = catalog.samples
+        self.strata = codes([stratum_of(sample) for sample in samples])
+        self.cells = codes([cell_of(sample) for sample in samples])
+        self.voices = codes([(sample['voice_id'],) for sample in samples])
+        self.stratum_sizes = np.bincount(self.strata)
+        self.voice_count = int(self.voices.max()) + 1 if len(samples) else 0
+
+        self.rated = np.zeros(len(samples), dtype=np.int64)
+        self.served = np.zeros(len(samples), dtype=np.int64)
+        self.sessions: OrderedDict = OrderedDict()
+
+    def coverage(self) -> np.ndarray:
+        return self.rated + SERVED_WEIGHT * np.maximum(self.served - self.rated, 0)
+
+    def draw(self, session_id: str) -> List[int]:
+        """Sample indices for a new session, least covered strata and samples first"""
+        with self.lock:
+            coverage = self.coverage()
+            stratum_coverage = np.bincount(self.strata, weights=coverage) / self.stratum_sizes
+            order = np.lexsort((self.rng.random(len(coverage)), coverage, stratum_coverage[self.strata]))
+
+            voice_quota = math.ceil(self.size / self.voice_count) if self.balance_voices else self.size
+            per_voice = np.zeros(self.voice_count, dtype=np.int64)
+            strata_used, cells_used, chosen = set(), set(), []
+            # First pass takes one sample per stratum; later passes fill up if strata run out
+            for one_per_stratum in (True, False):
+                for i in order:
+                    if len(chosen) == self.size:
+                        break
+                    if i in chosen or per_voice[self.voices[i]] >= voice_quota:
+                        continue
+                    if one_per_stratum and self.strata[i] in strata_used:
+                        continue
+                    if self.one_scale_per_cell and self.cells[i] in cells_used:
+                        continue
+                    chosen.append(int(i))
+                    strata_used.add(self.strata[i])
+                    cells_used.add(self.cells[i])
+                    per_voice[self.voices[i]] += 1
+
+            self.served[chosen] += 1
+            self.sessions[session_id] = chosen
+            while len(self.sessions) > MAX_SESSIONS:
+                self.sessions.popitem(last=False)
+        return chosen
+
+    def resolve(self, session_id: str, sample_id: str) -> Optional[int]:
+        """Catalog index for a rated sample: filename, stem or <session_id>_<n>"""
+        index = self.catalog.index_of(sample_id)
+        if index is not None:
+            return index
+        prefix, _, position = sample_id.rpartition('_')
+        with self.lock:
+            indices = self.sessions.get(prefix or session_id)
+        if indices and position.isdigit() and int(position) < len(indices):
+            return indices[int(position)]
+        return None
+
+    def record_rating(self, index: int):
+        with self.lock:
+            self.rated[index] += 1
+
+    def load_ratings(self, counts: Dict[str, int]):
+        """Seed rating counts per sample_id from previously saved results"""
+        with self.lock:
+            for sample_id, count in counts.items():
+                index = self.catalog.index_of(sample_id)
+                if index is not None:
+                    self.rated[index] += count
+
+    def stats(self) -> dict:
+        with self.lock:
+            if not len(self.rated):
+                return {'strata': 0, 'unrated_samples': 0}
+            per_stratum = np.bincount(self.strata, weights=self.rated) / self.stratum_sizes
+            return {
+                'ratings_per_sample': {'min': int(self.rated.min()), 'median': float(np.median(self.rated)),
+                                       'max': int(self.rated.max())},
+                'strata': len(self.stratum_sizes),
+                'least_covered_stratum': round(float(per_stratum.min()), 2),
+                'unrated_samples': int((self.rated == 0).sum()),
+            }
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Incremental evaluation statistics for /api/stats
+Counters are advanced by tailing results.jsonl and session_log.jsonl from the last
+byte consumed, so each refresh only parses lines written since the previous one.
+They are snapshotted to disk periodically; on restart only the bytes written after
+the snapshot are read. A snapshot whose position no longer matches the file
+(truncated or rewritten) is discarded and that file is recounted from the start.
+"""
+
+import atexit
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Dict
+
+SNAPSHOT_EVERY_LINES = 200
+SNAPSHOT_EVERY_SECONDS = 60.0
+# Bytes before the consumed offset that must still match for a snapshot to be reused
+CHECK_BYTES = 256
+
+def tail_digest(path: Path, offset: int) -> str:
+    with open(path, 'rb') as f:
+        f.seek(max(0, offset - CHECK_BYTES))
+        return hashlib.sha1(f.read(min(offset, CHECK_BYTES))).hexdigest()
+
+def coverage_stats(total_samples: int, evaluated: int, evaluations: int, sessions: int) -> dict:
+    """The /api/stats payload from its four counters"""
+    return {
+        'total_samples': total_samples,
+        'sessions_completed': sessions,
+        'total_evaluations': evaluations,
+        'coverage': {
+            'evaluated_samples': evaluated,
+            'unevaluated_samples': total_samples - evaluated,
+            'percentage': round(evaluated / total_samples * 100, 1) if total_samples else 0,
+            'avg_evals_per_sample': round(evaluations / evaluated, 2) if evaluated > 0 else 0
+        }
+    }
+
+class StatsAggregator:
+    """Evaluation counters kept current from the append-only result and session logs"""
+
+    def __init__(self, results_file: Path, session_log_file: Path, snapshot_file: Path):
+        self.files = {'results': Path(results_file), 'sessions': Path(session_log_file)}
+        self.snapshot_file = Path(snapshot_file)
+        self.lock = threading.Lock()
+        self.reset()
+        self.load_snapshot()
+        self.refresh()
+        atexit.register(self.save_snapshot)
+
+    def reset(self, name: str = None):
+        if name in (None, 'results'):
+            self.sample_counts: Dict[str, int] = {}
+            self.total_evaluations = 0
+        if name in (None, 'sessions'):
+            self.sessions_logged = 0
+        if name is None:
+            self.offsets = {'results': 0, 'sessions': 0}
+            self.unsaved_lines = 0
+            self.saved_at = time.time()
+        else:
+            self.offsets[name] = 0
+
+    def load_snapshot(self):
+        if not self.snapshot_file.exists():
+            return
+        try:
+            with open(self.snapshot_file, 'r') as f:
+                snapshot = json.load(f)
+            self.sample_counts = snapshot['sample_counts']
+            self.total_evaluations = snapshot['total_evaluations']
+            self.sessions_logged = snapshot['sessions_logged']
+            self.offsets = snapshot['offsets']
+        except (OSError, ValueError, KeyError):
+            self.reset()
+            return
+        for name, path in self.files.items():
+            offset = self.offsets.get(name, 0)
+            valid = path.exists() and path.stat().st_size >= offset and \
+                tail_digest(path, offset) == snapshot.get('digests', {}).get(name)
+            if not valid:
+                self.reset(name)
+
+    def save_snapshot(self):
+        # Counters are copied together with their offsets under the lock; refresh() keeps
+        # changing the live objects while the copy is written
+        with self.lock:
+            snapshot = {
+                'sample_counts': dict(self.sample_counts),
+                'total_evaluations': self.total_evaluations,
+                'sessions_logged': self.sessions_logged,
+                'offsets': dict(self.offsets),
+                'digests': {name: tail_digest(path, self.offsets[name]) for name, path in self.files.items()
+                            if path.exists()},
+                'saved_at': time.time(),
+            }
+            self.unsaved_lines = 0
+            self.saved_at = time.time()
+        # Unique temp file: other workers (and threads) snapshot to the same file
+        with tempfile.NamedTemporaryFile('w', dir=self.snapshot_file.parent, prefix=self.snapshot_file.name,
+                                         suffix='.tmp', delete=False) as f:
+            json.dump(snapshot, f)
+        os.replace(f.name, self.snapshot_file)
+
+    def refresh(self):
+        """Consume complete lines appended since the last call"""
+        with self.lock:
+            for name, path in self.files.items():
+                if not path.exists() or path.stat().st_size <= self.offsets[name]:
+                    continue
+                with open(path, 'rb') as f:
+                    f.seek(self.offsets[name])
+                    chunk = f.read()
+                # A line still being written is picked up on the next refresh
+                complete = chunk[:chunk.rfind(b'\n') + 1]
+                self.offsets[name] += len(complete)
+                for line in complete.splitlines():
+                    if not line.strip():
+                        continue
+                    self.unsaved_lines += 1
+                    if name == 'sessions':
+                        self.sessions_logged += 1
+                        continue
+                    try:
+                        sample_id = json.loads(line).get('sample_id', '')
+                    except ValueError:
+                        continue
+                    self.sample_counts[sample_id] = self.sample_counts.get(sample_id, 0) + 1
+                    self.total_evaluations += 1
+            due = self.unsaved_lines >= SNAPSHOT_EVERY_LINES or \
+                (self.unsaved_lines and time.time() - self.saved_at >= SNAPSHOT_EVERY_SECONDS)
+        if due:
+            self.save_snapshot()
+
+    def stats(self, total_samples: int) -> dict:
+        """The /api/stats payload; constant time"""
+        with self.lock:
+            return coverage_stats(total_samples, len(self.sample_counts), self.total_evaluations,
+                                  self.sessions_logged)
@@ -0,0 +1,277 @@
+#!/usr/bin/env python3
+"""
+Pluggable storage for results, session logs and completed sessions
+  STORAGE_BACKEND=jsonl   results.jsonl / session_log.jsonl / session_<id>.json (default)
+  STORAGE_BACKEND=sqlite  evaluations.sqlite in WAL mode, indexed by sample, session and evaluator
+
+Both backends keep the same JSON API in app.py. The SQLite backend maintains per-sample
+and total counters with triggers, so /api/stats and coverage are index lookups.
+
+Usage:
+  python storage.py migrate                # one-shot import of the JSONL/JSON files into SQLite
+  python storage.py export results.csv     # results as CSV, same columns as current_evaluations.csv
+"""
+
+import argparse
+import csv
+import json
+import sqlite3
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from result_writer import GroupCommitWriter
+from stats_aggregator import StatsAggregator, coverage_stats
+
+DATA_DIR = Path(__file__).parent.parent / 'data'
+RESULTS_FILE = DATA_DIR / 'results.jsonl'
+SESSION_LOG_FILE = DATA_DIR / 'session_log.jsonl'
+STATS_SNAPSHOT_FILE = DATA_DIR / 'stats_snapshot.json'
+DATABASE_FILE = DATA_DIR / 'evaluations.sqlite'
+
+class JsonlStorage:
+    """Append-only JSONL logs plus one JSON file per completed session"""
+
+    name = 'jsonl'
+
+    def __init__(self, data_dir: Path = DATA_DIR):
+        self.data_dir = Path(data_dir)
+        # Appends from concurrent requests are grouped into locked batch commits
+        self.results_writer = GroupCommitWriter(self.data_dir / RESULTS_FILE.name)
+        self.session_log_writer = GroupCommitWriter(self.data_dir / SESSION_LOG_FILE.name)
+        # Evaluation counters, restored from the last snapshot plus the log lines written since
+        self.aggregator = StatsAggregator(self.data_dir / RESULTS_FILE.name, self.data_dir / SESSION_LOG_FILE.name,
+                                          self.data_dir / STATS_SNAPSHOT_FILE.name)
+
+    def save_result(self, record: dict):
+        self.results_writer.append(record)
+        self.aggregator.refresh()
+
+    def log_session(self, session_log: dict):
+        self.session_log_writer.append(session_log)
+        self.aggregator.refresh()
+
+    def session_samples(self, session_id: str) -> Optional[List[str]]:
+        """Sample filenames of a logged session, None if it was never logged"""
+        for session_log in read_jsonl(self.data_dir / SESSION_LOG_FILE.name):
+            if session_log['session_id'] == session_id:
+                return session_log.get('sample_ids', [])
+        return None
+
+    def save_session(self, data: dict) -> str:
+        session_file = self.data_dir / f"session_{data['session_id']}.json"
+        with open(session_file, 'w') as f:
+            json.dump(data, f, indent=2)
+        return str(session_file)
+
+    def sample_counts(self) -> Dict[str, int]:
+        return dict(self.aggregator.sample_counts)
+
+    def stats(self, total_samples: int) -> dict:
+        self.aggregator.refresh()
+        return self.aggregator.stats(total_samples)
+
+    def health(self) -> dict:
+        return {'backend': self.name, 'result_writer': self.results_writer.stats()}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    id INTEGER PRIMARY KEY,
+    session_id TEXT NOT NULL,
+    sample_id TEXT NOT NULL,
+    evaluator TEXT,
+    quality REAL,
+    emotion REAL,
+    similarity REAL,
+    timestamp TEXT,
+    payload TEXT NOT NULL,
+    UNIQUE (session_id, sample_id, timestamp)
+);
+CREATE INDEX IF NOT EXISTS idx_results_sample ON results (sample_id);
+CREATE INDEX IF NOT EXISTS idx_results_evaluator ON results (evaluator);
+
+CREATE TABLE IF NOT EXISTS session_log (
+    session_id TEXT PRIMARY KEY,
+    timestamp TEXT,
+    sample_count INTEGER,
+    sample_ids TEXT
+);
+
+CREATE TABLE IF NOT EXISTS sessions (
+    session_id TEXT PRIMARY KEY,
+    completed_at TEXT,
+    payload TEXT NOT NULL
+);
+
+-- Counters kept by triggers so stats never scan the results
+CREATE TABLE IF NOT EXISTS sample_counts (sample_id TEXT PRIMARY KEY, evaluations INTEGER NOT NULL);
+CREATE TABLE IF NOT EXISTS totals (name TEXT PRIMARY KEY, value INTEGER NOT NULL);
+INSERT OR IGNORE INTO totals VALUES ('evaluations', 0), ('evaluated_samples', 0), ('sessions', 0);
+
+CREATE TRIGGER IF NOT EXISTS results_count AFTER INSERT ON results BEGIN
+    UPDATE totals SET value = value + 1 WHERE name = 'evaluated_samples'
+        AND NOT EXISTS (SELECT 1 FROM sample_counts WHERE sample_id = NEW.sample_id);
+    INSERT INTO sample_counts VALUES (NEW.sample_id, 1)
+        ON CONFLICT (sample_id) DO UPDATE SET evaluations = evaluations + 1;
+    UPDATE totals SET value = value + 1 WHERE name = 'evaluations';
+END;
+CREATE TRIGGER IF NOT EXISTS session_log_count AFTER INSERT ON session_log BEGIN
+    UPDATE totals SET value = value + 1 WHERE name = 'sessions';
+END;
+"""
+
+INSERT_RESULT = ("INSERT OR IGNORE INTO results (session_id, sample_id, evaluator, quality, emotion, similarity, "
+                 "timestamp, payload) VALUES (?, ?, ?, ?, ?, ?, ?, ?)")
+INSERT_SESSION_LOG = "INSERT OR IGNORE INTO session_log VALUES (?, ?, ?, ?)"
+UPSERT_SESSION = "INSERT OR REPLACE INTO sessions VALUES (?, ?, ?)"
+
+def result_row(record: dict) -> tuple:
+    scores = record.get('scores') or {}
+    return (record['session_id'], str(record['sample_id']), record.get('evaluator_id') or record.get('evaluator'),
+            scores.get('quality'), scores.get('emotion'), scores.get('similarity'), record.get('timestamp'),
+            json.dumps(record, ensure_ascii=False))
+
+def session_log_row(session_log: dict) -> tuple:
+    return (session_log['session_id'], session_log.get('timestamp'), session_log.get('sample_count'),
+            json.dumps(session_log.get('sample_ids', [])))
+
+class SqliteStorage:
+    """WAL-mode SQLite; one connection per thread, statements reused from its cache"""
+
+    name = 'sqlite'
+
+    def __init__(self, path: Path = DATABASE_FILE):
+        self.path = Path(path)
+        self.local = threading.local()
+        connection = self.connection()
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.executescript(SCHEMA)
+
+    def connection(self) -> sqlite3.Connection:
+        connection = getattr(self.local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=30, cached_statements=64)
+            # NORMAL is durable across application crashes in WAL mode
+            connection.execute('PRAGMA synchronous=NORMAL')
+            self.local.connection = connection
+        return connection
+
+    def save_result(self, record: dict):
+        with self.connection() as connection:
+            connection.execute(INSERT_RESULT, result_row(record))
+
+    def log_session(self, session_log: dict):
+        with self.connection() as connection:
+            connection.execute(INSERT_SESSION_LOG, session_log_row(session_log))
+
+    def session_samples(self, session_id: str) -> Optional[List[str]]:
+        row = self.connection().execute('SELECT sample_ids FROM session_log WHERE session_id = ?',
+                                        (session_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def save_session(self, data: dict) -> str:
+        with self.connection() as connection:
+            connection.execute(UPSERT_SESSION, (data['session_id'], data.get('completed_at'),
+                                                json.dumps(data, ensure_ascii=False)))
+        return f"{self.path}#sessions/{data['session_id']}"
+
+    def sample_counts(self) -> Dict[str, int]:
+        return dict(self.connection().execute('SELECT sample_id, evaluations FROM sample_counts'))
+
+    def stats(self, total_samples: int) -> dict:
+        totals = dict(self.connection().execute('SELECT name, value FROM totals'))
+        return coverage_stats(total_samples, totals['evaluated_samples'], totals['evaluations'], totals['sessions'])
+
+    def results_for(self, column: str, value: str) -> List[dict]:
+        """Results for one sample_id, session_id or evaluator, through their index"""
+        if column not in ('sample_id', 'session_id', 'evaluator'):
+            raise ValueError(f'Not an indexed column: {column}')
+        rows = self.connection().execute(f'SELECT payload FROM results WHERE {column} = ? ORDER BY id', (value,))
+        return [json.loads(payload) for payload, in rows]
+
+    def iter_results(self) -> Iterator[Tuple[int, dict]]:
+        """(row id, record) in insertion order"""
+        for row_id, payload in self.connection().execute('SELECT id, payload FROM results ORDER BY id'):
+            yield row_id, json.loads(payload)
+
+    def health(self) -> dict:
+        return {'backend': self.name, 'database': str(self.path)}
+
+def create_storage(backend: str, data_dir: Path = DATA_DIR):
+    if backend == 'jsonl':
+        return JsonlStorage(data_dir)
+    if backend == 'sqlite':
+        return SqliteStorage(Path(data_dir) / DATABASE_FILE.name)
+    raise ValueError(f'Unknown STORAGE_BACKEND: {backend}')
+
+def read_jsonl(path: Path) -> Iterator[dict]:
+    if not path.exists():
+        return
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+def migrate(data_dir: Path = DATA_DIR) -> Dict[str, int]:
+    """Import the JSONL logs and session files; re-running skips rows already imported"""
+    storage = SqliteStorage(Path(data_dir) / DATABASE_FILE.name)
+    connection = storage.connection()
+    counts = {}
+
+    def rows(table):
+        return connection.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]
+
+    with connection:
+        before = rows('results')
+        connection.executemany(INSERT_RESULT, (result_row(r) for r in read_jsonl(Path(data_dir) / RESULTS_FILE.name)))
+        counts['results'] = rows('results') - before
+        before = rows('session_log')
+        connection.executemany(INSERT_SESSION_LOG,
+                               (session_log_row(s) for s in read_jsonl(Path(data_dir) / SESSION_LOG_FILE.name)))
+        counts['session_log'] = rows('session_log') - before
+        sessions = []
+        for path in sorted(Path(data_dir).glob('session_*.json')):
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            sessions.append((data['session_id'], data.get('completed_at'), json.dumps(data, ensure_ascii=False)))
+        connection.executemany(UPSERT_SESSION, sessions)
+        counts['sessions'] = len(sessions)
+    return counts
+
+def export_csv(output: Path, data_dir: Path = DATA_DIR) -> int:
+    storage = SqliteStorage(Path(data_dir) / DATABASE_FILE.name)
+    count = 0
+    with open(output, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        # Same columns and scores encoding as current_evaluations.csv (read by audio_corpus.load_evaluations)
+        writer.writerow(['id', 'session_id', 'sample_id', 'scores', 'comment', 'timestamp', 'duration_ms'])
+        for row_id, record in storage.iter_results():
+            scores = json.dumps(record.get('scores', {}), ensure_ascii=False, separators=(',', ':'), sort_keys=True)
+            writer.writerow([row_id, record['session_id'], record['sample_id'], scores,
+                             record.get('comment', ''), record.get('timestamp', ''), record.get('duration_ms', '')])
+            count += 1
+    return count
+
+def main():
+    parser = argparse.ArgumentParser(description='Migrate or export evaluation storage')
+    parser.add_argument('command', choices=['migrate', 'export'])
+    parser.add_argument('output', nargs='?', type=Path, help='CSV path for export')
+    parser.add_argument('--data-dir', type=Path, default=DATA_DIR, help='Webapp data directory')
+
+    args = parser.parse_args()
+
+    if args.command == 'migrate':
+        started = datetime.now()
+        counts = migrate(args.data_dir)
+        print(f"✅ Migrated into {args.data_dir / DATABASE_FILE.name}: {counts['results']} new result(s), "
+              f"{counts['session_log']} session log entr(ies), {counts['sessions']} completed session(s) "
+              f"in {(datetime.now() - started).total_seconds():.1f}s")
+        print("   Start the server with STORAGE_BACKEND=sqlite to use it")
+    else:
+        if not args.output:
+            parser.error('export needs an output CSV path')
+        print(f"💾 Exported {export_csv(args.output, args.data_dir)} result(s) to {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Concurrency check for StatsAggregator snapshots
+Several threads append results and refresh while every refresh snapshots
+(SNAPSHOT_EVERY_LINES=1). No refresh may raise, the live counters must match the log,
+and a fresh aggregator restored from the last snapshot must count every line once.
+
+Usage:
+  python test_stats_aggregator.py
+  python test_stats_aggregator.py --threads 16 --lines 500
+"""
+
+import argparse
+import atexit
+import json
+import sys
+import tempfile
+import threading
+from pathlib import Path
+
+import stats_aggregator
+from stats_aggregator import StatsAggregator
+
+def test_concurrent_snapshots(threads: int = 8, lines: int = 200):
+    every_lines, stats_aggregator.SNAPSHOT_EVERY_LINES = stats_aggregator.SNAPSHOT_EVERY_LINES, 1
+    try:
+        check_snapshots(threads, lines)
+    finally:
+        stats_aggregator.SNAPSHOT_EVERY_LINES = every_lines
+
+def check_snapshots(threads: int, lines: int):
+    with tempfile.TemporaryDirectory() as data_dir:
+        data_dir = Path(data_dir)
+        results_file = data_dir / 'results.jsonl'
+        results_file.touch()
+        aggregator = StatsAggregator(results_file, data_dir / 'session_log.jsonl', data_dir / 'stats_snapshot.json')
+        # The temporary directory is gone by exit time
+        atexit.unregister(aggregator.save_snapshot)
+        write_lock = threading.Lock()
+        errors = []
+
+        def worker(n):
+            for i in range(lines):
+                with write_lock, open(results_file, 'a') as f:
+                    # A new sample id per line, so the counts dict grows while snapshots serialize it
+                    f.write(json.dumps({'session_id': f's{n}', 'sample_id': f'sample_{n}_{i}'}) + '\n')
+                try:
+                    aggregator.refresh()
+                except Exception as e:
+                    errors.append(repr(e))
+
+        pool = [threading.Thread(target=worker, args=(n,)) for n in range(threads)]
+        for thread in pool:
+            thread.start()
+        for thread in pool:
+            thread.join()
+        aggregator.refresh()
+        aggregator.save_snapshot()
+
+        total = threads * lines
+        assert not errors, f"{len(errors)} refresh error(s), first: {errors[0]}"
+        assert aggregator.total_evaluations == total, f"{aggregator.total_evaluations} != {total}"
+        restored = StatsAggregator(results_file, data_dir / 'session_log.jsonl', data_dir / 'stats_snapshot.json')
+        atexit.unregister(restored.save_snapshot)
+        assert restored.total_evaluations == total, f"restored {restored.total_evaluations} != {total}"
+        assert len(restored.sample_counts) == total
+        assert not list(data_dir.glob('*.tmp')), 'temp snapshot files left behind'
+
+def main():
+    parser = argparse.ArgumentParser(description='Check StatsAggregator snapshots under concurrent refreshes')
+    parser.add_argument('--threads', type=int, default=8, help='Writer threads')
+    parser.add_argument('--lines', type=int, default=200, help='Result lines per thread')
+
+    args = parser.parse_args()
+
+    try:
+        test_concurrent_snapshots(args.threads, args.lines)
+    except AssertionError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+    print(f"✅ {args.threads} threads x {args.lines} lines: no errors, counts survive a restart")
+
+if __name__ == "__main__":
+    main()